@@ -29,10 +29,10 @@ def info_plat():
     return _info_plat()
 
 
-def server():
+def server(save_path="./", **options):
     from .communicate.tcpip.server import server as _server
 
-    return _server()
+    return _server(save_path, **options)
 
 
 def client(server_ip, server_port=12345, file_path="./README.md", prg=False):
@@ -41,10 +41,10 @@ def client(server_ip, server_port=12345, file_path="./README.md", prg=False):
     return _client(server_ip, server_port, file_path, prg)
 
 
-def clientd(server_ip, server_port=12345, parentdir="./", prg=True):
+def clientd(server_ip, server_port=12345, parentdir="./", prg=True, **options):
     from .communicate.tcpip.client import clientd as _clientd
 
-    return _clientd(server_ip, server_port, parentdir, prg)
+    return _clientd(server_ip, server_port, parentdir, prg, **options)
 
 
 def whoish():
@@ -20,9 +20,41 @@ def build_parser() -> argparse.ArgumentParser:
     )
 
     subparsers.add_parser("upload", help="start streaming upload server")
-    subparsers.add_parser("server", help="start TCP file server")
+    tcp_server = subparsers.add_parser("server", help="start TCP file server")
+    tcp_server.add_argument(
+        "--concurrent",
+        action="store_true",
+        help="accept many uploaders at once (asyncio) instead of one connection at a time",
+    )
+    tcp_server.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=256,
+        metavar="MIB",
+        help="with --concurrent, cap on received-but-unwritten bytes across all connections",
+    )
 
-    subparsers.add_parser("cld", help="upload top-level files to server")
+    cld = subparsers.add_parser("cld", help="upload top-level files to server")
+    cld.add_argument(
+        "-j",
+        "--connections",
+        type=int,
+        default=4,
+        help="parallel connections to the server (default: 4)",
+    )
+    cld.add_argument(
+        "-r",
+        "--recursive",
+        action="store_true",
+        help="also upload subdirectories, recreated on the server",
+    )
+    cld.add_argument(
+        "--protocol",
+        type=int,
+        choices=(1, 2),
+        default=1,
+        help="wire protocol: 1 (default) or 2 (handshake, CRC32, batched small files)",
+    )
 
     return parser
 
@@ -77,6 +109,12 @@ def main(argv=None) -> int:
         return 0
 
     if command == "server":
+        if getattr(args, "concurrent", False):
+            from .communicate.tcpip.aserver import serve
+
+            serve(max_in_flight=args.max_in_flight * 1024 * 1024)
+            return 0
+
         from .communicate.tcpip.server import server
 
         server()
@@ -89,7 +127,12 @@ def main(argv=None) -> int:
 
         from .communicate.tcpip.client import clientd
 
-        clientd(iphost)
+        clientd(
+            iphost,
+            connections=getattr(args, "connections", 4),
+            recursive=getattr(args, "recursive", False),
+            protocol=getattr(args, "protocol", 1),
+        )
         return 0
 
     parser.error(f"Unknown command: {command}")
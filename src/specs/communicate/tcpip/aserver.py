@@ -0,0 +1,283 @@
+"""Concurrent file server: many uploaders at once on one asyncio loop.
+
+Speaks the same formats as ``server.server``: v1 headers (see
+``protocol``) and v2 sessions (see ``framing``), so ``client.send_file``
+and ``clientd`` work with either ``protocol``. Each connection
+is one coroutine; memory stays bounded in two ways:
+
+* per connection, the ``StreamReader`` buffers at most about
+  ``2 * stream_limit`` bytes before asyncio pauses reading the socket,
+  so TCP flow control pushes back on a sender that outruns the disk,
+* across connections, every body chunk takes its size from a shared
+  ``max_in_flight`` byte budget before it is read off the stream and
+  returns it once the chunk is written to disk. When the budget is
+  exhausted, readers wait, their socket buffers fill and the senders
+  stall, instead of the collector buffering the whole cluster's output.
+
+File writes run on the loop's default thread pool so a slow disk does
+not block the other connections. Received names may contain ``/``
+(``clientd(recursive=True)``) and are resolved with
+``protocol.safe_join``, so a peer cannot write outside ``save_path``.
+"""
+import asyncio
+import os
+import signal
+import zlib
+
+from . import framing
+from .protocol import safe_join
+from .server import find_local_ip
+
+DEFAULT_MAX_IN_FLIGHT = 256 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 1024 * 1024
+DEFAULT_STREAM_LIMIT = 256 * 1024
+
+
+class ByteBudget:
+    """Counting semaphore over bytes, shared by all connections."""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.available = capacity
+        self._cond = asyncio.Condition()
+
+    async def acquire(self, n):
+        n = min(n, self.capacity)
+        async with self._cond:
+            while self.available < n:
+                await self._cond.wait()
+            self.available -= n
+        return n
+
+    async def release(self, n):
+        async with self._cond:
+            self.available += n
+            self._cond.notify_all()
+
+
+async def read_prefix(reader, length=4):
+    """Read the first bytes of a header, or return None on a clean end of stream."""
+    try:
+        return await reader.readexactly(length)
+    except asyncio.IncompleteReadError as e:
+        if not e.partial:
+            return None
+        raise EOFError("Socket closed before receiving all data")
+
+
+async def read_file_header(reader, name_size=None):
+    """Return ``(file_name, file_size)``, or None on a clean end of stream.
+
+    Pass ``name_size`` if the 4 length bytes were already read.
+    """
+    if name_size is None:
+        name_size = await read_prefix(reader)
+        if name_size is None:
+            return None
+    try:
+        name = await reader.readexactly(int.from_bytes(name_size, "big"))
+        size = await reader.readexactly(8)
+    except asyncio.IncompleteReadError:
+        raise EOFError("Socket closed before receiving all data")
+    return name.decode("utf-8"), int.from_bytes(size, "big")
+
+
+def _open_for_write(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    return open(path, "wb")
+
+
+class AsyncFileServer:
+    """Accept uploads from many clients concurrently into ``save_path``.
+
+    ``stats`` counts ``connections``, ``active``, ``files``, ``bytes``
+    and ``errors``.
+    """
+
+    def __init__(
+        self,
+        save_path="./",
+        host=None,
+        port=12345,
+        max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        stream_limit=DEFAULT_STREAM_LIMIT,
+        verbose=True,
+    ):
+        self.save_path = save_path
+        self.host = host
+        self.port = port
+        self.max_in_flight = max_in_flight
+        self.chunk_size = min(chunk_size, max_in_flight)
+        self.stream_limit = stream_limit
+        self.verbose = verbose
+        self.stats = dict.fromkeys(("connections", "active", "files", "bytes", "errors"), 0)
+        self.budget = None
+        self._server = None
+        self._handlers = set()
+
+    def _log(self, message):
+        if self.verbose:
+            print(message)
+
+    async def start(self):
+        """Bind and start accepting; return the bound ``(host, port)``."""
+        os.makedirs(self.save_path, exist_ok=True)
+        self.budget = ByteBudget(self.max_in_flight)
+        host = self.host if self.host is not None else find_local_ip()
+        self._server = await asyncio.start_server(
+            self._accept, host, self.port, limit=self.stream_limit, backlog=128
+        )
+        address = self._server.sockets[0].getsockname()[:2]
+        self._log(f"Listening on {address}")
+        return address
+
+    async def close(self):
+        """Stop accepting, cancel the open connections and wait for them."""
+        if self._server is None:
+            return
+        self._server.close()
+        # Let connections accepted just before close() start their handlers.
+        await asyncio.sleep(0)
+        handlers = list(self._handlers)
+        for task in handlers:
+            task.cancel()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        await self._server.wait_closed()
+        self._server = None
+
+    def _accept(self, reader, writer):
+        # A plain callback, so the handler task is tracked before it runs.
+        task = asyncio.ensure_future(self._handle(reader, writer))
+        self._handlers.add(task)
+        task.add_done_callback(self._handlers.discard)
+
+    async def _handle(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        self.stats["connections"] += 1
+        self.stats["active"] += 1
+        self._log(f"Connection from {peer}")
+        try:
+            prefix = await read_prefix(reader)
+            if prefix == framing.MAGIC:
+                await self._session(reader, writer)
+                prefix = None
+            while prefix is not None:
+                header = await read_file_header(reader, prefix)
+                await self._receive(reader, *header)
+                self._count_file(*header)
+                prefix = await read_prefix(reader)
+        except Exception as e:
+            self.stats["errors"] += 1
+            self._log(f"Error from {peer}: {e}")
+        finally:
+            self.stats["active"] -= 1
+            writer.close()
+            if hasattr(writer, "wait_closed"):  # Python 3.7+
+                try:
+                    await writer.wait_closed()
+                except OSError:
+                    pass
+
+    async def _session(self, reader, writer):
+        """Serve a v2 session (see ``framing``) after its magic bytes."""
+        version, offered = framing.HELLO_TAIL.unpack(
+            await reader.readexactly(framing.HELLO_TAIL.size)
+        )
+        accepted = framing.negotiate(version, offered)
+        writer.write(framing.HELLO.pack(framing.MAGIC, framing.VERSION, accepted))
+        await writer.drain()
+        checksum = bool(accepted & framing.CAP_CRC32)
+        files = nbytes = 0
+        while True:
+            head = await reader.readexactly(1)
+            kind = head[0]
+            if kind == framing.FRAME_FILE:
+                head += await reader.readexactly(framing.FILE_HEAD.size - 1)
+                name_len, size = framing.FILE_HEAD.unpack(head)[1:]
+                name = (await reader.readexactly(name_len)).decode("utf-8")
+                crc = await self._receive(reader, name, size, checksum)
+                if checksum:
+                    expected = framing.CRC.unpack(await reader.readexactly(framing.CRC.size))[0]
+                    framing.check_crc(safe_join(self.save_path, name), expected, crc)
+                self._count_file(name, size)
+                files += 1
+                nbytes += size
+            elif kind == framing.FRAME_BATCH and accepted & framing.CAP_BATCH:
+                head += await reader.readexactly(framing.BATCH_HEAD.size - 1)
+                count, table_len, body_len = framing.BATCH_HEAD.unpack(head)[1:]
+                table = await reader.readexactly(table_len)
+                entries = framing.parse_batch_table(table, count, body_len)
+                for name, size, expected in entries:
+                    crc = await self._receive(reader, name, size, checksum, quiet=True)
+                    if checksum:
+                        framing.check_crc(safe_join(self.save_path, name), expected, crc)
+                    self.stats["files"] += 1
+                files += count
+                nbytes += body_len
+                self._log(f"Batch of {count} files ({body_len} bytes) has been received and saved.")
+            elif kind == framing.FRAME_END:
+                writer.write(framing.ACK.pack(framing.FRAME_ACK, files, nbytes))
+                await writer.drain()
+                return
+            else:
+                raise framing.ProtocolError(f"Unexpected frame type {kind}")
+
+    def _count_file(self, file_name, file_size):
+        self.stats["files"] += 1
+        self._log(f"File {file_name} has been received and saved.")
+
+    async def _receive(self, reader, file_name, file_size, checksum=False, quiet=False):
+        """Write one body to disk; return its crc32 when ``checksum``.
+
+        The caller counts the file (``_count_file``) once it is verified.
+        """
+        loop = asyncio.get_event_loop()
+        full_path = safe_join(self.save_path, file_name)
+        if not quiet:
+            self._log(f"***receiving*** {file_name:<40} - {file_size:<10}")
+        f = await loop.run_in_executor(None, _open_for_write, full_path)
+        crc = 0
+        try:
+            remaining = file_size
+            while remaining:
+                granted = await self.budget.acquire(min(self.chunk_size, remaining))
+                try:
+                    chunk = await reader.read(granted)
+                    if not chunk:
+                        raise EOFError(
+                            f"Socket closed with {remaining} of {file_size} bytes missing"
+                        )
+                    await loop.run_in_executor(None, f.write, chunk)
+                finally:
+                    await self.budget.release(granted)
+                if checksum:
+                    crc = zlib.crc32(chunk, crc)
+                remaining -= len(chunk)
+                self.stats["bytes"] += len(chunk)
+        finally:
+            await loop.run_in_executor(None, f.close)
+        return crc
+
+
+def serve(save_path="./", host=None, port=12345, **options):
+    """Run an ``AsyncFileServer`` until SIGINT / SIGTERM."""
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    server = AsyncFileServer(save_path, host, port, **options)
+    stop = asyncio.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # Windows: Ctrl-C raises KeyboardInterrupt instead
+    try:
+        loop.run_until_complete(server.start())
+        loop.run_until_complete(stop.wait())
+        print("\nReceived interrupt signal, shutting down server...")
+    except KeyboardInterrupt:
+        print("\nReceived interrupt signal, shutting down server...")
+    finally:
+        loop.run_until_complete(server.close())
+        loop.close()
+    return server.stats
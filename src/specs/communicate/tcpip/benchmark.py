@@ -0,0 +1,197 @@
+"""Loopback throughput of the TCP client's file transfer paths.
+
+Run as ``python -m specs.communicate.tcpip.benchmark``. For each size
+(default 1 MiB, 1 GiB and 10 GiB) a sparse temporary file is sent over
+``127.0.0.1`` to a receiver thread that drains the socket with
+``recv_into`` into one reused buffer, and the best of ``--repeat`` runs
+is reported in GB/s (10^9 bytes per second, from the first byte sent
+until the receiver has read the last one):
+
+``sendfile``
+    ``client.send_body`` with ``socket.sendfile`` (``sendfile(2)``).
+``buffered``
+    ``client.send_body`` with ``use_sendfile=False``: ``readinto`` one
+    ``CHUNK_SIZE`` buffer and ``sendall`` a view of it.
+``legacy``
+    The previous loop: ``f.read(1024)`` + ``sendall`` per chunk (slow;
+    not run by default).
+
+``--receiver`` picks the receiving side: ``drain`` (default) only
+counts bytes, ``server`` runs the server's ``protocol.receive_body``
+into ``os.devnull`` with a ``RECV_BUFFER_SIZE`` buffer, and ``legacy``
+the previous ``recv(1024)`` + ``write`` loop.
+
+The files are sparse, so they take no disk space and are read from the
+page cache; the numbers measure the transfer path, not the disk.
+"""
+import argparse
+import os
+import socket
+import tempfile
+import threading
+import time
+
+from .client import CHUNK_SIZE, send_body
+from .protocol import RECV_BUFFER_SIZE, receive_body
+
+MODES = ("sendfile", "buffered", "legacy")
+RECEIVERS = ("drain", "server", "legacy")
+
+_UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+
+def parse_size(text):
+    """Parse ``"512K"``, ``"1M"``, ``"10G"`` or a plain byte count."""
+    text = text.strip().upper().rstrip("IB")
+    if text and text[-1] in _UNITS:
+        return int(float(text[:-1]) * _UNITS[text[-1]])
+    return int(text)
+
+
+def _format_size(size):
+    for unit in ("G", "M", "K"):
+        if size >= _UNITS[unit] and size % _UNITS[unit] == 0:
+            return f"{size // _UNITS[unit]} {unit}iB"
+    return f"{size} B"
+
+
+def _send_legacy(sock, f, size):
+    while True:
+        data = f.read(1024)
+        if not data:
+            break
+        sock.sendall(data)
+
+
+def _receive_legacy(conn, f, expected):
+    received = 0
+    while received < expected:
+        data = conn.recv(1024)
+        if not data:
+            break
+        f.write(data)
+        received += len(data)
+    return received
+
+
+def _drain(listener, expected, done, result, receiver="drain"):
+    conn, _ = listener.accept()
+    buf = bytearray(RECV_BUFFER_SIZE)
+    view = memoryview(buf)
+    received = 0
+    try:
+        if receiver == "server":
+            with open(os.devnull, "wb") as f:
+                received = receive_body(conn, f, expected, buf)
+        elif receiver == "legacy":
+            with open(os.devnull, "wb") as f:
+                received = _receive_legacy(conn, f, expected)
+        else:
+            while received < expected:
+                n = conn.recv_into(view)
+                if not n:
+                    break
+                received += n
+    finally:
+        conn.close()
+        result.append((received, time.perf_counter()))
+        done.set()
+
+
+def _transfer(path, size, mode, chunk_size, receiver="drain"):
+    """Send ``path`` once over loopback; return elapsed seconds."""
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(1)
+    done = threading.Event()
+    result = []
+    thread = threading.Thread(
+        target=_drain, args=(listener, size, done, result, receiver), daemon=True
+    )
+    thread.start()
+    try:
+        with socket.create_connection(listener.getsockname()) as sock, open(path, "rb") as f:
+            start = time.perf_counter()
+            if mode == "legacy":
+                _send_legacy(sock, f, size)
+            else:
+                send_body(sock, f, size, chunk_size=chunk_size, use_sendfile=mode == "sendfile")
+            done.wait()
+    finally:
+        thread.join()
+        listener.close()
+    received, finished = result[0]
+    if received != size:
+        raise RuntimeError(f"receiver got {received} of {size} bytes")
+    return finished - start
+
+
+def bench_transfer(
+    sizes,
+    modes=("sendfile", "buffered"),
+    repeat=3,
+    chunk_size=CHUNK_SIZE,
+    work_dir=None,
+    receiver="drain",
+):
+    """Return ``{(size, mode): best seconds}`` for every size and mode."""
+    results = {}
+    for size in sizes:
+        fd, path = tempfile.mkstemp(prefix="tcpip-bench-", dir=work_dir)
+        try:
+            os.ftruncate(fd, size)
+            os.close(fd)
+            for mode in modes:
+                results[(size, mode)] = min(
+                    _transfer(path, size, mode, chunk_size, receiver) for _ in range(repeat)
+                )
+        finally:
+            os.remove(path)
+    return results
+
+
+def _print_transfer(results, sizes, modes, receiver="drain"):
+    print(f"loopback file transfer, {receiver} receiver (best run, GB/s):")
+    print("  " + f"{'size':>10}" + "".join(f"{mode:>12}" for mode in modes))
+    for size in sizes:
+        cells = "".join(f"{size / results[(size, mode)] / 1e9:>12.2f}" for mode in modes)
+        print(f"  {_format_size(size):>10}{cells}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCP file transfer loopback benchmark")
+    parser.add_argument(
+        "--sizes",
+        default="1M,1G,10G",
+        help="Comma-separated file sizes (K/M/G suffixes). Default: 1M,1G,10G",
+    )
+    parser.add_argument(
+        "--modes",
+        default="sendfile,buffered",
+        help=f"Comma-separated transfer paths out of {', '.join(MODES)}. Default: sendfile,buffered",
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--chunk-size", type=parse_size, default=CHUNK_SIZE)
+    parser.add_argument("--work-dir", default=None, help="Where the sparse test files go")
+    parser.add_argument(
+        "--receiver",
+        choices=RECEIVERS,
+        default="drain",
+        help="Receiving side: count bytes only, the server's receive_body, or the legacy loop",
+    )
+    args = parser.parse_args()
+
+    sizes = [parse_size(size) for size in args.sizes.split(",")]
+    modes = [mode.strip() for mode in args.modes.split(",")]
+    for mode in modes:
+        if mode not in MODES:
+            parser.error(f"unknown mode {mode!r}; choose from {', '.join(MODES)}")
+    results = bench_transfer(
+        sizes, modes, args.repeat, args.chunk_size, args.work_dir, args.receiver
+    )
+    _print_transfer(results, sizes, modes, args.receiver)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,5 +1,7 @@
 import socket
 import os
+import queue
+import threading
 import time
 
 from .protocol import send_file_header
@@ -12,62 +14,341 @@ def get_progress():
     except ModuleNotFoundError:
         return None
 
-def send_file(client_socket, file_path, prg=False):
+# Bytes per sendfile(2) call / buffered read. Large enough that the
+# per-call overhead vanishes, small enough for a smooth progress bar.
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+def _sendfile_supported(sock):
+    # socket.sendfile() silently degrades to 8 KiB send() calls where
+    # os.sendfile is missing (Windows) or the socket is wrapped (SSL).
+    return hasattr(os, "sendfile") and type(sock) is socket.socket
+
+
+def _send_buffered(sock, f, size, chunk_size, progress=None):
+    """Send ``size`` bytes of ``f`` through one reused buffer."""
+    buf = bytearray(min(chunk_size, size) or 1)
+    view = memoryview(buf)
+    sent = 0
+    while sent < size:
+        n = f.readinto(view[:min(len(buf), size - sent)])
+        if not n:
+            break
+        sock.sendall(view[:n])
+        sent += n
+        if progress is not None:
+            progress(n)
+    return sent
+
+
+def _send_sendfile(sock, f, size, chunk_size, progress=None):
+    """Send ``size`` bytes of ``f`` with the kernel's sendfile(2)."""
+    if progress is None:
+        return sock.sendfile(f, 0, size) if size else 0
+    sent = 0
+    while sent < size:
+        n = sock.sendfile(f, sent, min(chunk_size, size - sent))
+        if not n:
+            break
+        sent += n
+        progress(n)
+    return sent
+
+
+def send_body(sock, f, size, chunk_size=CHUNK_SIZE, progress=None, use_sendfile=True):
+    """Send the first ``size`` bytes of the open binary file ``f``.
+
+    Uses ``socket.sendfile`` (zero-copy ``sendfile(2)``) when the
+    platform and socket allow it, else a buffered loop over one
+    ``chunk_size`` buffer. ``progress(n)`` is called after each chunk.
+    Raises ``EOFError`` if the file ends early, since the receiver
+    expects exactly ``size`` bytes.
+    """
+    if use_sendfile and _sendfile_supported(sock):
+        sent = _send_sendfile(sock, f, size, chunk_size, progress)
+    else:
+        sent = _send_buffered(sock, f, size, chunk_size, progress)
+    if sent < size:
+        raise EOFError(f"File shrank while sending: {sent} of {size} bytes sent")
+    return sent
+
+
+def send_file(
+    client_socket,
+    file_path,
+    prg=False,
+    use_sendfile=True,
+    chunk_size=CHUNK_SIZE,
+    file_name=None,
+    progress=None,
+    verbose=True,
+):
+    """Send one file: header, then body.
+
+    ``file_name`` overrides the name the server saves it under (see
+    ``protocol.send_file_header``). ``progress(n)`` replaces the
+    per-file tqdm bar that ``prg`` enables. Returns the body size.
+    """
     # Send the file name
-    file_name = os.path.basename(file_path)
-    file_size = send_file_header(client_socket, file_path)
+    file_size = send_file_header(client_socket, file_path, file_name)
+    if file_name is None:
+        file_name = os.path.basename(file_path)
 
     # Send the file content
     tqdm = get_progress()
     tqdm_progress = None
-    if prg and tqdm is not None:
+    if progress is None and prg and tqdm is not None:
         tqdm_progress = tqdm(total=file_size, unit="B", unit_scale=True, desc=f"Sending {file_name}")
+        progress = tqdm_progress.update
 
-    with open(file_path, 'rb') as f:
-        while True:
-            data = f.read(1024)
-            if not data:
-                break
-            client_socket.sendall(data)
-            if tqdm_progress is not None:
-                tqdm_progress.update(len(data))
-
-    if tqdm_progress is not None:
-        tqdm_progress.close()
-    print(f"File {file_name:<35} has been sent.")
+    try:
+        with open(file_path, 'rb') as f:
+            send_body(
+                client_socket,
+                f,
+                file_size,
+                chunk_size=chunk_size,
+                progress=progress,
+                use_sendfile=use_sendfile,
+            )
+    finally:
+        if tqdm_progress is not None:
+            tqdm_progress.close()
+    if verbose:
+        print(f"File {file_name:<35} has been sent.")
+    return file_size
 
-def client(server_ip, server_port=12345, file_path="./README.md", prg=False):
+def client(server_ip, server_port=12345, file_path="./README.md", prg=False, protocol=1):
     client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     client_socket.connect((server_ip, server_port))
     try:
-        send_file(client_socket, file_path, prg)
+        if protocol == 2:
+            from .framing import FrameWriter
+
+            writer = FrameWriter(client_socket)
+            writer.send(file_path)
+            writer.close()
+            print(f"File {os.path.basename(file_path):<35} has been sent.")
+        else:
+            send_file(client_socket, file_path, prg)
     except Exception as e:
         print(f"Error: {e}")
     finally:
         client_socket.close()
     return None
 
-def clientd(server_ip, server_port=12345, parentdir="./", prg=True):
-    """
-    client upload top level files in the cwd
+def iter_upload_files(parentdir, recursive=False):
+    """Yield ``(path, name)`` for the files to upload from ``parentdir``.
+
+    ``name`` is the path relative to ``parentdir`` with ``/`` separators,
+    which is what the server saves the file under. Without
+    ``recursive`` only the top-level files are listed.
     """
-    # Create socket
-    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client_socket.connect((server_ip, server_port))
+    for dirpath, dirnames, files in os.walk(parentdir):
+        rel_dir = os.path.relpath(dirpath, parentdir)
+        for file in sorted(files):
+            path = os.path.join(dirpath, file)
+            if not os.path.isfile(path):
+                continue
+            name = file if rel_dir == "." else "/".join(rel_dir.split(os.sep) + [file])
+            yield path, name
+        if not recursive:
+            break
+        dirnames.sort()
+
+
+class _Uploader:
+    """Worker threads that each keep one connection and drain a bounded queue."""
+
+    def __init__(
+        self, server_ip, server_port, connections, queue_size, progress, use_sendfile, protocol=1
+    ):
+        self.address = (server_ip, server_port)
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.progress = progress
+        self.use_sendfile = use_sendfile
+        self.protocol = protocol
+        # Set once any worker completes a v2 handshake: the server speaks
+        # v2, so a slow handshake means it is busy, not that it is v1-only.
+        self.v2_server = threading.Event()
+        self.lock = threading.Lock()
+        self.stats = {"files": 0, "bytes": 0, "errors": 0}
+        self.threads = [
+            threading.Thread(target=self._work, name=f"clientd-{i}", daemon=True)
+            for i in range(max(1, connections))
+        ]
+
+    def _progress(self, n):
+        with self.lock:
+            self.stats["bytes"] += n
+            if self.progress is not None:
+                self.progress(n)
+
+    def _count(self, key, n=1):
+        with self.lock:
+            self.stats[key] += n
+
+    def _work(self):
+        if self.protocol == 2:
+            return self._work_v2()
+        sock = None
+        try:
+            while True:
+                job = self.jobs.get()
+                if job is None:
+                    return
+                path, name = job
+                try:
+                    if sock is None:
+                        sock = socket.create_connection(self.address)
+                    send_file(
+                        sock,
+                        path,
+                        use_sendfile=self.use_sendfile,
+                        file_name=name,
+                        progress=self._progress,
+                        verbose=False,
+                    )
+                    self._count("files")
+                except Exception as e:
+                    # The stream is out of step after a failed file:
+                    # drop the connection and reconnect for the next one.
+                    print(f"Error: {path}: {e}")
+                    self._count("errors")
+                    if sock is not None:
+                        sock.close()
+                        sock = None
+        finally:
+            if sock is not None:
+                sock.close()
+
+    def _work_v2(self):
+        # Files count once the server's ACK confirms them; when a session
+        # fails (including its connect or handshake), every file it had
+        # not confirmed counts as an error.
+        from .framing import FrameWriter
+
+        sock = writer = None
+        unconfirmed = 0
+        try:
+            while True:
+                job = self.jobs.get()
+                try:
+                    if job is None:
+                        if writer is not None:
+                            files, _nbytes = writer.close()
+                            self._count("files", files)
+                            unconfirmed = 0
+                        return
+                    path, name = job
+                    unconfirmed += 1
+                    if writer is None:
+                        sock = socket.create_connection(self.address)
+                        writer = FrameWriter(
+                            sock,
+                            use_sendfile=self.use_sendfile,
+                            progress=self._progress,
+                            keep_waiting=self.v2_server.is_set,
+                        )
+                        self.v2_server.set()
+                    writer.send(path, name)
+                except Exception as e:
+                    print(f"Error: {path if job else 'END'}: {e}")
+                    self._count("errors", unconfirmed)
+                    unconfirmed = 0
+                    if sock is not None:
+                        sock.close()
+                    sock = writer = None
+                    if job is None:
+                        return
+        finally:
+            if sock is not None:
+                sock.close()
+
+
+def upload_files(
+    server_ip,
+    jobs,
+    server_port=12345,
+    connections=4,
+    queue_size=256,
+    prg=False,
+    use_sendfile=True,
+    protocol=1,
+):
+    """Send ``(path, name)`` jobs over ``connections`` parallel sockets.
 
+    A producer feeds a queue of at most ``queue_size`` jobs, so a huge
+    directory is listed while it is uploaded, not before. Each worker
+    keeps its connection open for all of its files. With ``protocol=2``
+    each connection is a ``framing`` session: small files travel in
+    batches and ``files`` counts what the server acknowledged. Returns
+    ``{"files", "bytes", "errors", "seconds"}``.
+    """
+    tqdm = get_progress() if prg else None
+    bar = tqdm(unit="B", unit_scale=True, desc="Uploading") if tqdm is not None else None
+    uploader = _Uploader(
+        server_ip,
+        server_port,
+        connections,
+        queue_size,
+        bar.update if bar is not None else None,
+        use_sendfile,
+        protocol,
+    )
+    start = time.perf_counter()
+    for thread in uploader.threads:
+        thread.start()
     try:
-        for chiddir, foldernames, files in os.walk(parentdir):
-            if chiddir == parentdir:
-                for file in files:
-                    file_path = os.path.join(chiddir, file)
-                    # print(f"***Preparing*** {file_path}")
-                    send_file(client_socket, file_path, prg)
-                    # print(f"***Done*** {file_path}")
-                    time.sleep(1)
-    except Exception as e:
-        print(f"Error: {e}")
+        for job in jobs:
+            uploader.jobs.put(job)
     finally:
-        client_socket.close()
+        for _ in uploader.threads:
+            uploader.jobs.put(None)
+        for thread in uploader.threads:
+            thread.join()
+        if bar is not None:
+            bar.close()
+    stats = dict(uploader.stats)
+    stats["seconds"] = time.perf_counter() - start
+    return stats
+
+
+def clientd(
+    server_ip,
+    server_port=12345,
+    parentdir="./",
+    prg=True,
+    connections=4,
+    recursive=False,
+    queue_size=256,
+    protocol=1,
+):
+    """
+    client upload top level files in the cwd
+
+    Files are sent over ``connections`` parallel sockets fed from a
+    bounded queue; ``recursive=True`` also uploads subdirectories,
+    which the server recreates. ``protocol=2`` uses the batched,
+    checksummed framing (see ``framing``). Prints and returns aggregate
+    throughput (see ``upload_files``).
+    """
+    stats = upload_files(
+        server_ip,
+        iter_upload_files(parentdir, recursive),
+        server_port,
+        connections=connections,
+        queue_size=queue_size,
+        prg=prg,
+        protocol=protocol,
+    )
+    seconds = stats["seconds"] or 1e-9
+    print(
+        f"Sent {stats['files']} files, {stats['bytes'] / 1e6:.1f} MB in {seconds:.2f} s: "
+        f"{stats['bytes'] / seconds / 1e6:.1f} MB/s, {stats['files'] / seconds:.1f} files/s"
+        + (f", {stats['errors']} errors" if stats["errors"] else "")
+    )
+    return stats
 
 # Uncomment to run the server
 # server()
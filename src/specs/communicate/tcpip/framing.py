@@ -0,0 +1,362 @@
+"""Version 2 framing for the TCP file transfer (v1 stays the default).
+
+A v2 session opens with a handshake, carries frames and ends with an
+explicit END frame that the server acknowledges, so neither side has to
+treat a closed socket as "done":
+
+    client -> server  HELLO  b"NSP2" version:u16 capabilities:u32
+    server -> client  HELLO  b"NSP2" version:u16 accepted:u32
+    client -> server  FILE   0x01 name_len:u32 size:u64 name body [crc32:u32]
+                      BATCH  0x02 count:u32 table_len:u32 body_len:u64
+                             table: count * (name_len:u32 size:u64 crc32:u32 name)
+                             bodies, concatenated in table order
+                      END    0x03
+    server -> client  ACK    0x04 files:u32 bytes:u64
+
+Integers are big-endian. Capabilities are a bit mask; the server
+answers with the bits both sides support:
+
+* ``CAP_CRC32`` -- every file carries a ``zlib.crc32`` that the server
+  checks before it counts the file (a mismatch deletes the file and
+  ends the session). Without it, FILE frames have no trailer and the
+  BATCH table's crc fields are 0.
+* ``CAP_BATCH`` -- the client may pack many small files into one BATCH
+  frame: one vectored write (``sendmsg``) for the frame head, the table
+  and all bodies instead of two writes per file.
+
+Servers tell the versions apart by the first four bytes: a v1 stream
+starts with the name length, and ``b"NSP2"`` read as a length would be
+a 1.3 GB file name. ``server.receive_files`` and
+``aserver.AsyncFileServer`` accept both.
+
+FILE bodies go out with ``sendfile(2)`` unless ``CAP_CRC32`` is in use,
+in which case they are read once through a buffer that feeds both the
+socket and the checksum.
+"""
+import os
+import socket
+import struct
+import zlib
+
+from .client import CHUNK_SIZE, send_body
+from .protocol import recv_all, safe_join
+
+MAGIC = b"NSP2"
+VERSION = 2
+
+CAP_CRC32 = 0x1
+CAP_BATCH = 0x2
+SUPPORTED_CAPABILITIES = CAP_CRC32 | CAP_BATCH
+
+FRAME_FILE = 0x01
+FRAME_BATCH = 0x02
+FRAME_END = 0x03
+FRAME_ACK = 0x04
+
+HELLO = struct.Struct("!4sHI")
+HELLO_TAIL = struct.Struct("!HI")  # HELLO after the magic
+FILE_HEAD = struct.Struct("!BIQ")
+BATCH_HEAD = struct.Struct("!BIIQ")
+ENTRY = struct.Struct("!IQI")
+CRC = struct.Struct("!I")
+ACK = struct.Struct("!BIQ")
+
+# Files up to SMALL_FILE bytes are batched; a batch is sent once it
+# holds BATCH_BYTES of bodies or BATCH_FILES files.
+SMALL_FILE = 256 * 1024
+BATCH_BYTES = 4 * 1024 * 1024
+BATCH_FILES = 1024
+
+HANDSHAKE_TIMEOUT = 10.0
+
+try:
+    _IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    _IOV_MAX = 1024
+
+
+class ProtocolError(Exception):
+    """The peer sent something v2 does not allow (bad handshake, frame or checksum)."""
+
+
+def negotiate(version, capabilities, supported=SUPPORTED_CAPABILITIES):
+    """Server side: return the accepted capability bits for a client HELLO."""
+    if version != VERSION:
+        raise ProtocolError(f"Unsupported protocol version {version}")
+    return capabilities & supported
+
+
+def send_buffers(sock, buffers):
+    """Write ``buffers`` in order with as few syscalls as possible (``sendmsg``)."""
+    sendmsg = getattr(sock, "sendmsg", None)
+    if sendmsg is None:
+        sock.sendall(b"".join(buffers))
+        return
+    views = [memoryview(b) for b in buffers if len(b)]
+    first = 0
+    while first < len(views):
+        sent = sendmsg(views[first:first + _IOV_MAX])
+        while sent:
+            head = views[first]
+            if sent >= len(head):
+                sent -= len(head)
+                first += 1
+            else:
+                views[first] = head[sent:]
+                sent = 0
+
+
+def parse_batch_table(table, count, body_len):
+    """Return the ``(name, size, crc)`` entries of a BATCH table.
+
+    Raises ``ProtocolError`` unless the table holds exactly ``count``
+    entries whose sizes add up to the frame's ``body_len``.
+    """
+    entries = []
+    offset = 0
+    try:
+        for _ in range(count):
+            name_len, size, crc = ENTRY.unpack_from(table, offset)
+            offset += ENTRY.size
+            name = bytes(table[offset:offset + name_len]).decode("utf-8")
+            offset += name_len
+            entries.append((name, size, crc))
+    except (struct.error, UnicodeDecodeError):
+        raise ProtocolError("Malformed batch table")
+    if offset != len(table):
+        raise ProtocolError("Malformed batch table")
+    total = sum(size for _name, size, _crc in entries)
+    if total != body_len:
+        raise ProtocolError(f"Batch sizes add up to {total} bytes, frame says {body_len}")
+    return entries
+
+
+def check_crc(path, expected, actual):
+    """Delete ``path`` and raise ``ProtocolError`` if the checksums differ."""
+    if expected != actual:
+        os.remove(path)
+        raise ProtocolError(f"CRC mismatch for {path}: expected {expected:08x}, got {actual:08x}")
+
+
+class FrameWriter:
+    """Client side of a v2 session on a connected socket.
+
+    The handshake runs in the constructor; ``capabilities`` holds the
+    accepted bits. ``send()`` each file, then ``close()`` to send END
+    and wait for the server's ACK. ``progress(n)`` is called as body
+    bytes are sent (for batched files, when their batch is sent).
+
+    The server's HELLO must arrive within ``HANDSHAKE_TIMEOUT`` seconds,
+    else ``ProtocolError`` (a v1-only server never answers). A serial
+    ``server.server`` that is busy with another session answers late,
+    too: if ``keep_waiting()`` returns true when a timeout expires, the
+    writer waits another period instead of giving up.
+    """
+
+    def __init__(
+        self,
+        sock,
+        capabilities=SUPPORTED_CAPABILITIES,
+        small_file=SMALL_FILE,
+        batch_bytes=BATCH_BYTES,
+        batch_files=BATCH_FILES,
+        use_sendfile=True,
+        chunk_size=CHUNK_SIZE,
+        progress=None,
+        keep_waiting=None,
+    ):
+        self.sock = sock
+        self.small_file = small_file
+        self.batch_bytes = batch_bytes
+        self.batch_files = batch_files
+        self.use_sendfile = use_sendfile
+        self.chunk_size = chunk_size
+        self.progress = progress
+        self.files = 0
+        self.bytes = 0
+        self._batch = []  # (encoded name, data, crc)
+        self._batch_size = 0
+        self.capabilities = self._handshake(capabilities, keep_waiting)
+
+    def _handshake(self, capabilities, keep_waiting=None):
+        timeout = self.sock.gettimeout()
+        self.sock.sendall(HELLO.pack(MAGIC, VERSION, capabilities))
+        self.sock.settimeout(HANDSHAKE_TIMEOUT)
+        reply = b""
+        try:
+            while len(reply) < HELLO.size:
+                try:
+                    chunk = self.sock.recv(HELLO.size - len(reply))
+                except socket.timeout:
+                    if keep_waiting is not None and keep_waiting():
+                        continue
+                    raise ProtocolError("No v2 handshake reply; the server may only speak v1")
+                if not chunk:
+                    raise EOFError("Socket closed during the v2 handshake")
+                reply += chunk
+        finally:
+            self.sock.settimeout(timeout)
+        magic, version, accepted = HELLO.unpack(reply)
+        if magic != MAGIC or version != VERSION:
+            raise ProtocolError("Server answered with an unknown handshake")
+        return accepted & capabilities
+
+    @property
+    def checksums(self):
+        return bool(self.capabilities & CAP_CRC32)
+
+    def send(self, file_path, file_name=None):
+        """Queue or send one file under ``file_name`` (default: its base name)."""
+        if file_name is None:
+            file_name = os.path.basename(file_path)
+        encoded = file_name.encode("utf-8")
+        if self.capabilities & CAP_BATCH and os.path.getsize(file_path) <= self.small_file:
+            with open(file_path, "rb") as f:
+                data = f.read()
+            crc = zlib.crc32(data) if self.checksums else 0
+            self._batch.append((encoded, data, crc))
+            self._batch_size += len(data)
+            if self._batch_size >= self.batch_bytes or len(self._batch) >= self.batch_files:
+                self.flush()
+            return
+        self.flush()
+        self._send_file_frame(file_path, encoded)
+
+    def _send_file_frame(self, file_path, encoded):
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self.sock.sendall(FILE_HEAD.pack(FRAME_FILE, len(encoded), size) + encoded)
+            if self.checksums:
+                crc = self._send_with_crc(f, size)
+                self.sock.sendall(CRC.pack(crc))
+            else:
+                send_body(
+                    self.sock,
+                    f,
+                    size,
+                    chunk_size=self.chunk_size,
+                    progress=self.progress,
+                    use_sendfile=self.use_sendfile,
+                )
+        self.files += 1
+        self.bytes += size
+
+    def _send_with_crc(self, f, size):
+        buf = bytearray(min(self.chunk_size, size) or 1)
+        view = memoryview(buf)
+        crc = 0
+        sent = 0
+        while sent < size:
+            n = f.readinto(view[:min(len(buf), size - sent)])
+            if not n:
+                raise EOFError(f"File shrank while sending: {sent} of {size} bytes sent")
+            chunk = view[:n]
+            crc = zlib.crc32(chunk, crc)
+            self.sock.sendall(chunk)
+            sent += n
+            if self.progress is not None:
+                self.progress(n)
+        return crc
+
+    def flush(self):
+        """Send the pending batch, if any, as one BATCH frame."""
+        if not self._batch:
+            return
+        batch, self._batch = self._batch, []
+        body_len, self._batch_size = self._batch_size, 0
+        table = b"".join(
+            ENTRY.pack(len(name), len(data), crc) + name for name, data, crc in batch
+        )
+        head = BATCH_HEAD.pack(FRAME_BATCH, len(batch), len(table), body_len)
+        send_buffers(self.sock, [head, table] + [data for _name, data, _crc in batch])
+        self.files += len(batch)
+        self.bytes += body_len
+        if self.progress is not None:
+            self.progress(body_len)
+
+    def close(self):
+        """Flush, send END and return the server's ``(files, bytes)`` acknowledgement.
+
+        Raises ``ProtocolError`` if the server saved a different number
+        of files or bytes than were sent.
+        """
+        self.flush()
+        self.sock.sendall(bytes([FRAME_END]))
+        kind, files, nbytes = ACK.unpack(recv_all(self.sock, ACK.size))
+        if kind != FRAME_ACK:
+            raise ProtocolError(f"Expected ACK, got frame type {kind}")
+        if (files, nbytes) != (self.files, self.bytes):
+            raise ProtocolError(
+                f"Server saved {files} files / {nbytes} bytes, sent {self.files} / {self.bytes}"
+            )
+        return files, nbytes
+
+
+def _receive_checked(sock, f, size, buffer, checksum):
+    """``protocol.receive_body`` that also returns the crc32 of the bytes when ``checksum``."""
+    view = memoryview(buffer)
+    crc = 0
+    remaining = size
+    while remaining:
+        n = sock.recv_into(view, min(len(view), remaining))
+        if not n:
+            raise EOFError(f"Socket closed with {remaining} of {size} bytes missing")
+        chunk = view[:n]
+        f.write(chunk)
+        if checksum:
+            crc = zlib.crc32(chunk, crc)
+        remaining -= n
+    return crc
+
+
+def _receive_into(sock, save_path, name, size, buffer, checksum):
+    full_path = safe_join(save_path, name)
+    os.makedirs(os.path.dirname(full_path), exist_ok=True)
+    with open(full_path, "wb") as f:
+        crc = _receive_checked(sock, f, size, buffer, checksum)
+    return full_path, crc
+
+
+def receive_session(sock, save_path, buffer, capabilities=SUPPORTED_CAPABILITIES, verbose=True):
+    """Serve one v2 session whose 4 magic bytes were already read.
+
+    Returns ``(files, bytes)`` once the client's END has been
+    acknowledged.
+    """
+    version, offered = HELLO_TAIL.unpack(recv_all(sock, HELLO_TAIL.size))
+    accepted = negotiate(version, offered, capabilities)
+    sock.sendall(HELLO.pack(MAGIC, VERSION, accepted))
+    checksum = bool(accepted & CAP_CRC32)
+    files = nbytes = 0
+    while True:
+        kind = recv_all(sock, 1)[0]
+        if kind == FRAME_FILE:
+            name_len, size = FILE_HEAD.unpack(bytes([kind]) + recv_all(sock, FILE_HEAD.size - 1))[1:]
+            name = recv_all(sock, name_len).decode("utf-8")
+            if verbose:
+                print(f"***receiving*** {name:<40} - {size:<10}")
+            path, crc = _receive_into(sock, save_path, name, size, buffer, checksum)
+            if checksum:
+                check_crc(path, CRC.unpack(recv_all(sock, CRC.size))[0], crc)
+            files += 1
+            nbytes += size
+            if verbose:
+                print(f"File {name} has been received and saved.")
+        elif kind == FRAME_BATCH and accepted & CAP_BATCH:
+            count, table_len, body_len = BATCH_HEAD.unpack(
+                bytes([kind]) + recv_all(sock, BATCH_HEAD.size - 1)
+            )[1:]
+            entries = parse_batch_table(recv_all(sock, table_len), count, body_len)
+            for name, size, expected in entries:
+                path, crc = _receive_into(sock, save_path, name, size, buffer, checksum)
+                if checksum:
+                    check_crc(path, expected, crc)
+            files += count
+            nbytes += body_len
+            if verbose:
+                print(f"Batch of {count} files ({body_len} bytes) has been received and saved.")
+        elif kind == FRAME_END:
+            sock.sendall(ACK.pack(FRAME_ACK, files, nbytes))
+            return files, nbytes
+        else:
+            raise ProtocolError(f"Unexpected frame type {kind}")
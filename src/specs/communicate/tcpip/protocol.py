@@ -1,29 +1,57 @@
 import os
 
+# Receive buffer for file bodies: big enough that a multi-gigabit
+# stream costs few recv_into / write calls per second.
+RECV_BUFFER_SIZE = 4 * 1024 * 1024
 
-def send_file_header(sock, file_path: str) -> int:
-    file_name = os.path.basename(file_path)
-    file_name_size = len(file_name.encode("utf-8")).to_bytes(4, "big")
-    sock.sendall(file_name_size)
-    sock.sendall(file_name.encode("utf-8"))
 
+def send_file_header(sock, file_path: str, file_name=None) -> int:
+    """Send the header for ``file_path``; return the announced size.
+
+    ``file_name`` is the name the receiver saves the file under
+    (default: the base name). It may be a relative ``/``-separated
+    path, which receivers resolve with ``safe_join``.
+    """
+    if file_name is None:
+        file_name = os.path.basename(file_path)
+    encoded = file_name.encode("utf-8")
     file_size = os.path.getsize(file_path)
-    sock.sendall(file_size.to_bytes(8, "big"))
+    # One buffer, one send: length, name and size leave in one segment.
+    sock.sendall(len(encoded).to_bytes(4, "big") + encoded + file_size.to_bytes(8, "big"))
     return file_size
 
 
-def recv_all(sock, length: int) -> bytes:
-    data = b""
-    while len(data) < length:
-        more = sock.recv(length - len(data))
-        if not more:
+def recv_exact_into(sock, buffer) -> None:
+    """Fill ``buffer`` (a writable bytes-like object) completely from ``sock``."""
+    view = memoryview(buffer)
+    received = 0
+    while received < len(view):
+        n = sock.recv_into(view[received:])
+        if not n:
             raise EOFError("Socket closed before receiving all data")
-        data += more
-    return data
+        received += n
+
+
+def recv_all(sock, length: int) -> bytes:
+    data = bytearray(length)
+    recv_exact_into(sock, data)
+    return bytes(data)
+
+
+def recv_all_or_eof(sock, length: int):
+    """Like ``recv_all``, but return None if the peer closed before sending anything."""
+    first = sock.recv(length)
+    if not first:
+        return None
+    if len(first) == length:
+        return first
+    return first + recv_all(sock, length - len(first))
 
 
-def receive_file_header(sock):
-    file_name_size_data = recv_all(sock, 4)
+def receive_file_header(sock, file_name_size_data=None):
+    """Read a v1 header; pass the 4 length bytes if the caller already read them."""
+    if file_name_size_data is None:
+        file_name_size_data = recv_all(sock, 4)
     file_name_size = int.from_bytes(file_name_size_data, "big")
 
     file_name_data = recv_all(sock, file_name_size)
@@ -32,3 +60,34 @@ def receive_file_header(sock):
     file_size_data = recv_all(sock, 8)
     file_size = int.from_bytes(file_size_data, "big")
     return file_name, file_size
+
+
+def receive_body(sock, f, size: int, buffer) -> int:
+    """Copy ``size`` bytes from ``sock`` to the binary file ``f`` through ``buffer``.
+
+    ``buffer`` is a preallocated ``bytearray`` reused for every chunk:
+    ``recv_into`` fills it and a ``memoryview`` slice of it is written
+    to ``f``, so no per-chunk ``bytes`` object is created.
+    """
+    view = memoryview(buffer)
+    remaining = size
+    while remaining:
+        n = sock.recv_into(view, min(len(view), remaining))
+        if not n:
+            raise EOFError(f"Socket closed with {remaining} of {size} bytes missing")
+        f.write(view[:n])
+        remaining -= n
+    return size
+
+
+def safe_join(save_path: str, file_name: str) -> str:
+    """Resolve a received ``/``-separated name below ``save_path``.
+
+    Raises ``ValueError`` for absolute names and names with ``..``
+    components, so a peer cannot write outside ``save_path``.
+    """
+    name = file_name.replace("\\", "/")
+    parts = [part for part in name.split("/") if part not in ("", ".")]
+    if not parts or name.startswith("/") or ".." in parts or ":" in parts[0]:
+        raise ValueError(f"Refusing to save {file_name!r} outside the target directory")
+    return os.path.join(save_path, *parts)
@@ -3,7 +3,14 @@ import os
 import signal
 import sys
 
-from .protocol import recv_all, receive_file_header
+from . import framing
+from .protocol import (
+    RECV_BUFFER_SIZE,
+    receive_body,
+    receive_file_header,
+    recv_all_or_eof,
+    safe_join,
+)
 
 # Global variable to track the server socket
 server_socket = None
@@ -14,21 +21,61 @@ def handle_signal(sig, frame):
         server_socket.close()
     sys.exit(0)
 
-def server(save_path='./'):
+def find_local_ip():
+    # Creating a dummy socket to find the local IP address
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect(("8.8.8.8", 80))  # Google's DNS server
+        return s.getsockname()[0]
+
+
+def receive_files(client_socket, save_path, buffer):
+    """Save every file sent on ``client_socket`` until the peer is done.
+
+    ``buffer`` is a preallocated ``bytearray`` reused for every file
+    body (see ``protocol.receive_body``). A v2 client (see ``framing``)
+    is recognised by its first bytes and served until its END frame; a
+    v1 client until it disconnects between files.
+    """
+    prefix = recv_all_or_eof(client_socket, 4)
+    if prefix == framing.MAGIC:
+        framing.receive_session(client_socket, save_path, buffer)
+        return
+    while prefix is not None:
+        file_name, file_size = receive_file_header(client_socket, prefix)
+        full_path = safe_join(save_path, file_name)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        print(f"***receiving*** {file_name:<40} - {file_size:<10}")
+        # Receive the file content
+        with open(full_path, 'wb') as f:
+            receive_body(client_socket, f, file_size, buffer)
+
+        print(f"File {file_name} has been received and saved.")
+        prefix = recv_all_or_eof(client_socket, 4)
+
+
+def server(save_path='./', buffer_size=RECV_BUFFER_SIZE, rcvbuf=None):
+    """Receive files on port 12345 and save them under ``save_path``.
+
+    ``buffer_size`` is the size of the receive buffer reused for every
+    file body; ``rcvbuf`` optionally sets the kernel's ``SO_RCVBUF`` of
+    the connections (useful on high bandwidth-delay links).
+    """
     global server_socket
     
     # Ensure the directory for saving files exists
     os.makedirs(save_path, exist_ok=True)
 
-    # Creating a dummy socket to find the local IP address
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-        s.connect(("8.8.8.8", 80))  # Google's DNS server
-        local_ip = s.getsockname()[0]
+    local_ip = find_local_ip()
 
     # Create server socket
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    if rcvbuf:
+        # Set before listen() so accepted sockets inherit it and the
+        # TCP window scale is negotiated for it.
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
     server_socket.bind((local_ip, 12345))  # Bind to the local IP address found
-    server_socket.listen(1)
+    # Parallel uploaders (clientd) queue here until their turn.
+    server_socket.listen(128)
     server_socket.settimeout(1)  # Set a timeout to make the socket non-blocking
     print("Listening on", server_socket.getsockname())
 
@@ -36,27 +83,14 @@ def server(save_path='./'):
     signal.signal(signal.SIGINT, handle_signal)
     signal.signal(signal.SIGTERM, handle_signal)
 
+    buffer = bytearray(buffer_size)
     while True:
         try:
             client_socket, addr = server_socket.accept()
             print('Connection from', addr)
 
             try:
-                while True:
-                    file_name, file_size = receive_file_header(client_socket)
-                    full_path = os.path.join(save_path, file_name)
-                    print(f"***receiving*** {file_name:<40} - {file_size:<10}")
-                    # Receive the file content
-                    with open(full_path, 'wb') as f:
-                        received = 0
-                        while received < file_size:
-                            data = client_socket.recv(1024)
-                            if not data:
-                                break
-                            f.write(data)
-                            received += len(data)
-
-                    print(f"File {file_name} has been received and saved.")
+                receive_files(client_socket, save_path, buffer)
             except Exception as e:
                 print(f"Error: {e}")
             finally:
@@ -0,0 +1,127 @@
+"""Streaming file-age histograms for capacity planning and tiering.
+
+Pass ``FileIndexer(histograms=AgeHistograms())`` and every walk counts
+each file into fixed age buckets as its record is produced, so nothing
+needs to be re-read from the ``files`` table afterwards:
+
+* two clocks: ``mtime`` (last write) and ``atime`` (last access; only
+  as good as the mount's ``relatime`` / ``noatime`` policy),
+* three dimensions: ``all`` files, per ``extension`` and per
+  ``top_dir`` (first path component under the walked root, ``.`` for
+  files directly in it),
+* per bucket: file count, logical bytes and on-disk bytes.
+
+Memory is a fixed number of counters per (clock, dimension, key), never
+per file. Ages are measured from the start of the walk; bucket ``i``
+holds files younger than ``buckets_days[i]`` days and the last bucket
+everything older. Like ``total_size``, a hardlinked file counts once
+per path. Records reused by ``index_incremental`` carry no atime, so an
+incremental run's atime histogram covers re-stat'd files only.
+
+Exports write the counters to the ``histograms`` table;
+``SQLiteIndexReader.age_histogram`` reads them back.
+"""
+import time
+from bisect import bisect_right
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .filters import relative_path
+
+AGE_BUCKETS_DAYS = (1, 7, 30, 90, 180, 365, 730, 1825)
+
+_DAY = 86400.0
+
+
+def _mtime_seconds(record: dict) -> Optional[float]:
+    if "mtime_ns" in record:
+        ns = record["mtime_ns"]
+        return None if ns is None else ns / 1e9
+    value = record.get("last_modified")
+    return None if value is None else value.timestamp()
+
+
+class AgeHistograms:
+    """Per-bucket file, byte and on-disk counters by mtime and atime age."""
+
+    def __init__(self, buckets_days: Sequence[float] = AGE_BUCKETS_DAYS):
+        self.buckets_days = tuple(buckets_days)
+        self._edges = [days * _DAY for days in self.buckets_days]
+        self.reset()
+
+    def reset(self, root_key: str = ".", now: Optional[float] = None) -> None:
+        """Clear the counters for a walk of ``root_key`` starting at ``now``."""
+        self.now = time.time() if now is None else now
+        self.root = root_key
+        # (clock, dimension, key) -> [files, size, on_disk], one list
+        # entry per bucket.
+        self.counters: Dict[Tuple[str, str, str], List[List[int]]] = {}
+
+    def _top_dir(self, path: str) -> str:
+        head, sep, _ = relative_path(self.root, path).partition("/")
+        return head if sep else "."
+
+    def add(self, record: dict) -> None:
+        """Count one file record (records without timestamps are skipped)."""
+        mtime = _mtime_seconds(record)
+        atime_ns = record.get("atime_ns")
+        if mtime is None and atime_ns is None:
+            return
+        size = record["size"] or 0
+        on_disk = record["on_disk"] or 0
+        keys = (
+            ("all", ""),
+            ("extension", record["extension"]),
+            ("top_dir", self._top_dir(record["filepath"])),
+        )
+        counters = self.counters
+        slots = len(self._edges) + 1
+        for clock, seconds in (
+            ("mtime", mtime),
+            ("atime", None if atime_ns is None else atime_ns / 1e9),
+        ):
+            if seconds is None:
+                continue
+            bucket = bisect_right(self._edges, self.now - seconds)
+            for dimension, key in keys:
+                row = counters.get((clock, dimension, key))
+                if row is None:
+                    row = counters[(clock, dimension, key)] = [
+                        [0] * slots, [0] * slots, [0] * slots
+                    ]
+                row[0][bucket] += 1
+                row[1][bucket] += size
+                row[2][bucket] += on_disk
+
+    def rows(self) -> Iterator[tuple]:
+        """Yield ``(clock, dimension, key, bucket, max_age_days, files, size, on_disk)``.
+
+        Empty buckets are skipped; ``max_age_days`` is None for the
+        last, open-ended bucket.
+        """
+        limits = self.buckets_days + (None,)
+        for (clock, dimension, key), (files, size, on_disk) in sorted(self.counters.items()):
+            for bucket, count in enumerate(files):
+                if count:
+                    yield (
+                        clock, dimension, key, bucket, limits[bucket],
+                        count, size[bucket], on_disk[bucket],
+                    )
+
+    def bucket_labels(self) -> List[str]:
+        """Return ``["<1d", "1-7d", ..., ">=1825d"]`` for the configured buckets."""
+        labels = []
+        lower = 0
+        for days in self.buckets_days:
+            labels.append(f"<{days:g}d" if not lower else f"{lower:g}-{days:g}d")
+            lower = days
+        labels.append(f">={lower:g}d")
+        return labels
+
+    def write(self, cursor) -> None:
+        """Replace the ``histograms`` table with the current counters."""
+        cursor.execute("DELETE FROM histograms")
+        cursor.executemany(
+            "INSERT INTO histograms (clock, dimension, key, bucket, max_age_days, "
+            "files, size, on_disk) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self.rows(),
+        )
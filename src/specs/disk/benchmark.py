@@ -0,0 +1,188 @@
+"""Microbenchmarks for the disk indexer.
+
+Run as ``python -m specs.disk.benchmark <name>``. Each benchmark builds
+a synthetic tree in a temporary directory, so results measure the
+indexer rather than whatever disk it is pointed at.
+
+``records``
+    Per-file cost of ``FileIndexer._record_file`` in the default layout
+    versus ``fast_records=True``, over the same cached ``DirEntry``
+    objects (the ``stat`` result is cached by the first pass, so the
+    difference is the record building itself), plus full
+    ``index_directory`` walks in both modes.
+
+``export``
+    Rows per second of ``export_to_sqlite`` into a fresh database, in
+    the default mode and with ``bulk=True``, over synthetic records
+    (no disk walk). Flattening records into rows costs the same in
+    both modes and is timed separately, so the SQLite share of each
+    run is visible as well.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, List
+
+from .indexer import FileIndexer, _file_row, _perf_ns
+
+
+def _make_tree(root: Path, files: int, per_dir: int = 500) -> None:
+    """Create ``files`` small files spread over directories of ``per_dir``."""
+    for i in range(files):
+        d = root / f"d{i // per_dir:04d}"
+        if i % per_dir == 0:
+            d.mkdir()
+        with open(d / f"file_{i:07d}.dat", "wb") as f:
+            f.write(b"x" * (i % 64))
+
+
+def _best_ns(func: Callable[[], None], repeat: int) -> int:
+    best = None
+    for _ in range(repeat):
+        start = _perf_ns()
+        func()
+        elapsed = _perf_ns() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_records(files: int = 20000, repeat: int = 5) -> dict:
+    """Return per-file nanoseconds for both record layouts and both walks."""
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _make_tree(root, files)
+        entries: List[os.DirEntry] = []
+        for d in sorted(os.scandir(tmp), key=lambda e: e.name):
+            entries.extend(os.scandir(d.path))
+        # Warm the DirEntry stat caches so both layouts see cached stats.
+        for entry in entries:
+            entry.stat(follow_symlinks=False)
+
+        results = {"files": len(entries)}
+        for label, fast in (("default", False), ("fast", True)):
+            indexer = FileIndexer(fast_records=fast)
+            record = indexer._record_file
+
+            def build() -> None:
+                for entry in entries:
+                    record(entry.path, entry, False)
+
+            results[f"record_{label}_ns"] = _best_ns(build, repeat) / len(entries)
+            results[f"walk_{label}_ns"] = _best_ns(
+                lambda: FileIndexer(fast_records=fast).index_directory(tmp), repeat
+            ) / len(entries)
+    return results
+
+
+def _synthetic_indexer(rows: int, seed: int = 0) -> FileIndexer:
+    """Return a ``FileIndexer`` holding ``rows`` made-up records in walk-like order."""
+    rng = random.Random(seed)
+    extensions = (".txt", ".py", ".jpg", ".log", ".dat", "")
+    now = datetime.now()
+    indexer = FileIndexer()
+    files = indexer.files
+    for i in range(rows):
+        # Random directory names keep the key order far from sorted,
+        # as a real walk's insertion order is.
+        directory = f"/data/{rng.getrandbits(32):08x}/{i % 97:02d}"
+        ext = extensions[i % len(extensions)]
+        name = f"file_{i:08d}{ext}"
+        size = rng.randrange(1 << 20)
+        files[f"{directory}/{name}"] = {
+            "filepath": f"{directory}/{name}",
+            "filename": name,
+            "extension": ext,
+            "size": size,
+            "on_disk": (size + 4095) // 4096 * 4096,
+            "blocks": (size + 4095) // 4096 * 8,
+            "nlinks": 1,
+            "inode": i + 1,
+            "device": 2049,
+            "last_modified": now,
+            "indexed_at": now,
+        }
+        indexer.stats["total_files"] += 1
+        indexer.stats["total_size"] += size
+        indexer.stats["extensions"][ext] += 1
+    indexer._finalize_stats()
+    return indexer
+
+
+def bench_export(rows: int = 1_000_000, chunk_size: int = 50000) -> dict:
+    """Return seconds and rows/s for a default and a bulk export of ``rows`` records."""
+    indexer = _synthetic_indexer(rows)
+    results = {"rows": rows}
+    start = time.perf_counter()
+    for info in indexer.files.values():
+        _file_row(info)
+    results["row_build_seconds"] = time.perf_counter() - start
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, bulk in (("default", False), ("bulk", True)):
+            db = os.path.join(tmp, f"{label}.db")
+            start = time.perf_counter()
+            ok, err = indexer.export_to_sqlite(db, bulk=bulk, chunk_size=chunk_size)
+            elapsed = time.perf_counter() - start
+            if not ok:
+                raise RuntimeError(err)
+            results[f"{label}_seconds"] = elapsed
+            results[f"{label}_rows_per_second"] = rows / elapsed
+    return results
+
+
+def _print_export(results: dict) -> None:
+    rows = results["rows"]
+    build = results["row_build_seconds"]
+    print(f"export_to_sqlite of {rows:,} synthetic rows into a new database:")
+    for label in ("default", "bulk"):
+        seconds = results[f"{label}_seconds"]
+        print(
+            f"  {label:<8} {seconds:>8.2f} s  "
+            f"{results[f'{label}_rows_per_second']:>12,.0f} rows/s  "
+            f"(SQLite share {seconds - build:>6.2f} s)"
+        )
+    print(f"  row building, both modes: {build:.2f} s")
+    print(
+        f"  bulk speedup: {results['default_seconds'] / results['bulk_seconds']:.2f}x "
+        f"overall, {(results['default_seconds'] - build) / (results['bulk_seconds'] - build):.2f}x "
+        "in SQLite"
+    )
+
+
+def _print_records(results: dict) -> None:
+    n = results["files"]
+    print(f"record building over {n:,} files (ns per file, best run):")
+    for kind in ("record", "walk"):
+        default = results[f"{kind}_default_ns"]
+        fast = results[f"{kind}_fast_ns"]
+        saved = default - fast
+        print(
+            f"  {kind:<7} default {default:>8.0f}  fast {fast:>8.0f}  "
+            f"saved {saved:>7.0f} ({saved / default:.0%})"
+        )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Disk indexer microbenchmarks")
+    sub = parser.add_subparsers(dest="name")
+    sub.required = True  # add_subparsers(required=) is 3.7+
+    records = sub.add_parser("records", help="fast_records vs default record building")
+    records.add_argument("--files", type=int, default=20000)
+    records.add_argument("--repeat", type=int, default=5)
+    export = sub.add_parser("export", help="default vs bulk export_to_sqlite rows/s")
+    export.add_argument("--rows", type=int, default=1_000_000)
+    export.add_argument("--chunk-size", type=int, default=50000)
+    args = parser.parse_args()
+
+    if args.name == "records":
+        _print_records(bench_records(args.files, args.repeat))
+    elif args.name == "export":
+        _print_export(bench_export(args.rows, args.chunk_size))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,261 @@
+"""Write ``FileIndexer`` records to columnar and line-oriented files.
+
+SQLite is a good query store but a slow way to hand ten million rows
+to pandas, polars or DuckDB. These writers produce files those tools
+read directly:
+
+* ``"parquet"`` -- one Parquet row group per ``row_group_size`` rows,
+* ``"arrow"`` -- an Arrow IPC file (``.arrow`` / ``.feather`` v2),
+  which ``pyarrow.memory_map`` + ``pyarrow.ipc.open_file`` read
+  without copying,
+* ``"ndjson"`` and ``"csv"`` -- pure-Python fallbacks written with
+  ``json`` / ``csv``, streamed the same way.
+
+The Arrow formats need ``pyarrow``, which is installed on demand by
+``ensure_lib`` like the other optional dependencies; ``"auto"`` picks
+Parquet when ``pyarrow`` is already importable and NDJSON otherwise.
+
+``stream_columnar`` writes rows while the tree is walked (one row group
+in memory at a time), ``export_columnar`` writes an already indexed
+``FileIndexer``. Columns are ``_FILE_COLUMNS``; the two timestamps are
+Arrow ``timestamp[us]`` values or ISO 8601 strings in the text formats.
+Output goes to ``<path>.tmp`` first and is renamed into place, so a
+failed run never leaves a truncated file under the final name.
+"""
+import csv
+import importlib.util
+import json
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ..hardware.deps import ensure_lib
+from .indexer import _FILE_COLUMNS, FileIndexer, _inode_key, _isoformat, _last_modified
+
+FORMATS = ("parquet", "arrow", "ndjson", "csv")
+
+_SUFFIXES = {
+    ".parquet": "parquet",
+    ".arrow": "arrow",
+    ".feather": "arrow",
+    ".ipc": "arrow",
+    ".ndjson": "ndjson",
+    ".jsonl": "ndjson",
+    ".csv": "csv",
+}
+
+DEFAULT_ROW_GROUP_SIZE = 65536
+
+
+def format_for_path(path: str) -> str:
+    """Return the format implied by ``path``'s suffix, or ``"auto"``."""
+    return _SUFFIXES.get(os.path.splitext(path)[1].lower(), "auto")
+
+
+def _resolve_format(fmt: str, path: str) -> str:
+    if fmt == "auto":
+        fmt = format_for_path(path)
+    if fmt == "auto":
+        fmt = "parquet" if importlib.util.find_spec("pyarrow") else "ndjson"
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of auto, {', '.join(FORMATS)}, not {fmt!r}")
+    return fmt
+
+
+def _row(info: dict) -> tuple:
+    """A record in ``_FILE_COLUMNS`` order with the timestamps as datetimes."""
+    return (
+        info["filepath"],
+        info["filename"],
+        info["extension"],
+        info["size"],
+        info["on_disk"],
+        info["blocks"],
+        info["nlinks"],
+        info["inode"],
+        info["device"],
+        _last_modified(info),
+        info["indexed_at"],
+    )
+
+
+class _NDJSONWriter:
+    def __init__(self, path: str):
+        self._file = open(path, "w", encoding="utf-8", newline="\n")
+
+    def write_rows(self, rows: List[tuple]) -> None:
+        dumps = json.dumps
+        lines = []
+        for row in rows:
+            record = dict(zip(_FILE_COLUMNS, row))
+            record["last_modified"] = _isoformat(row[9])
+            record["indexed_at"] = _isoformat(row[10])
+            lines.append(dumps(record, ensure_ascii=False))
+        if lines:
+            self._file.write("\n".join(lines) + "\n")
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _CSVWriter:
+    def __init__(self, path: str):
+        self._file = open(path, "w", encoding="utf-8", newline="")
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(_FILE_COLUMNS)
+
+    def write_rows(self, rows: List[tuple]) -> None:
+        self._writer.writerows(
+            row[:9] + (_isoformat(row[9]), _isoformat(row[10])) for row in rows
+        )
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class _ArrowWriter:
+    """Parquet or Arrow IPC writer; every ``write_rows`` call is one row group / batch."""
+
+    @ensure_lib("pyarrow")
+    def __init__(self, path: str, fmt: str):
+        import pyarrow as pa
+
+        self._pa = pa
+        self.schema = pa.schema([
+            ("filepath", pa.string()),
+            ("filename", pa.string()),
+            ("extension", pa.string()),
+            ("size", pa.int64()),
+            ("on_disk", pa.int64()),
+            ("blocks", pa.int64()),
+            ("nlinks", pa.int64()),
+            ("inode", pa.uint64()),
+            ("device", pa.uint64()),
+            ("last_modified", pa.timestamp("us")),
+            ("indexed_at", pa.timestamp("us")),
+        ])
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+
+            self._writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self._sink = pa.OSFile(path, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write_rows(self, rows: List[tuple]) -> None:
+        if not rows:
+            return
+        columns = [list(column) for column in zip(*rows)]
+        batch = self._pa.RecordBatch.from_arrays(
+            [
+                self._pa.array(column, type=field.type)
+                for column, field in zip(columns, self.schema)
+            ],
+            schema=self.schema,
+        )
+        self._writer.write_batch(batch)
+
+    def close(self) -> None:
+        self._writer.close()
+        sink = getattr(self, "_sink", None)
+        if sink is not None:
+            sink.close()
+
+
+def _open_writer(path: str, fmt: str):
+    if fmt == "ndjson":
+        return _NDJSONWriter(path)
+    if fmt == "csv":
+        return _CSVWriter(path)
+    return _ArrowWriter(path, fmt)
+
+
+def write_records(
+    records: Iterable[dict],
+    path: str,
+    fmt: str = "auto",
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> Tuple[bool, Optional[str]]:
+    """Write ``records`` to ``path`` in row groups of ``row_group_size``.
+
+    Returns ``(success, error_message)`` like
+    ``FileIndexer.export_to_sqlite``.
+    """
+    try:
+        fmt = _resolve_format(fmt, path)
+    except ValueError as e:
+        return False, str(e)
+    tmp_path = f"{path}.tmp"
+    try:
+        writer = _open_writer(tmp_path, fmt)
+    except Exception as e:
+        return False, f"Could not open {fmt} writer: {e}"
+    try:
+        group: List[tuple] = []
+        for record in records:
+            group.append(_row(record))
+            if len(group) >= row_group_size:
+                writer.write_rows(group)
+                group = []
+        writer.write_rows(group)
+        writer.close()
+        os.replace(tmp_path, path)
+        return True, None
+    except Exception as e:
+        try:
+            writer.close()
+        except Exception:
+            pass
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return False, f"Export error: {str(e)}"
+
+
+def stream_columnar(
+    indexer: FileIndexer,
+    root_path: str,
+    path: str,
+    fmt: str = "auto",
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+    workers: int = 1,
+) -> Tuple[bool, Optional[str]]:
+    """Walk ``root_path`` with ``indexer`` and write each row group as it fills.
+
+    Like ``stream_to_sqlite``, ``indexer.files`` stays empty and
+    ``get_statistics()`` reflects the walk. The dedup keeps one
+    ``(device, inode)`` key per file in memory: hardlinks and symlinked
+    files both repeat their target's inode.
+    """
+    indexer.files = indexer._new_store()
+    records = _deduped_totals(indexer, indexer.iter_records(root_path, workers))
+    return write_records(records, path, fmt, row_group_size)
+
+
+def _deduped_totals(indexer: FileIndexer, records: Iterable[dict]) -> Iterator[dict]:
+    """Pass ``records`` through, filling the inode-deduped counters at the end."""
+    seen = set()
+    unique = on_disk = logical = 0
+    for i, record in enumerate(records):
+        key = _inode_key(record["device"], record["inode"], i)
+        if key in seen:
+            yield record
+            continue
+        seen.add(key)
+        unique += 1
+        on_disk += record["on_disk"] or 0
+        logical += record["size"] or 0
+        yield record
+    stats = indexer.stats
+    stats["unique_files"] = unique
+    stats["on_disk_size"] = on_disk
+    stats["logical_size"] = logical
+    stats["hardlink_extra_paths"] = stats["total_files"] - unique
+
+
+def export_columnar(
+    indexer: FileIndexer,
+    path: str,
+    fmt: str = "auto",
+    row_group_size: int = DEFAULT_ROW_GROUP_SIZE,
+) -> Tuple[bool, Optional[str]]:
+    """Write the records of an indexed ``indexer`` to ``path``."""
+    return write_records(indexer.files.values(), path, fmt, row_group_size)
@@ -0,0 +1,317 @@
+"""Compare two exported index databases without loading either into memory.
+
+Run as ``python -m specs.disk.diff OLD.db NEW.db`` or use ``IndexDiff``:
+
+* both ``files`` tables are read in ``filepath`` order (the ``UNIQUE``
+  index makes that a plain index scan) and merge-joined, so a path
+  present in both is compared once and memory stays constant,
+* paths only in OLD or only in NEW are spilled to a temporary SQLite
+  database; a removed and an added path with the same ``(device,
+  inode)`` are reported as a move instead (several hardlinks of one
+  inode are paired in path order),
+* per-extension deltas are kept in memory (one entry per extension),
+* per-directory deltas merge-join the ``dirs`` tables, whose subtree
+  rollups already hold du-style totals, and keep only the ``n``
+  largest changes in a heap.
+
+Both databases are opened read-only. Rows recorded without an inode
+(``metadata="size"`` / ``"names"``) are never matched as moves, rows
+without a size (``"names"``) are never reported as grown or shrunk, and a
+file created in a deleted file's recycled inode is reported as a move.
+"""
+import argparse
+import heapq
+import os
+import sqlite3
+import sys
+import tempfile
+from collections import defaultdict
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from .reader import SQLiteIndexReader
+
+CHANGE_KINDS = ("added", "removed", "grown", "shrunk", "moved")
+
+
+class FileChange(NamedTuple):
+    """One difference between the two indexes.
+
+    ``path`` is the path in NEW (in OLD for ``removed``); ``old_path``
+    is set for ``moved`` only. Sizes are ``None`` on the side where the
+    path does not exist, and for moves between indexes that recorded no
+    size. ``grown`` / ``shrunk`` always have both sizes.
+    """
+
+    kind: str
+    path: str
+    old_path: Optional[str]
+    old_size: Optional[int]
+    new_size: Optional[int]
+
+
+def _next(rows: Iterator[tuple]) -> Optional[tuple]:
+    return next(rows, None)
+
+
+def _file_rows(conn: sqlite3.Connection) -> Iterator[tuple]:
+    """Yield ``(filepath, extension, size, device, inode)`` in filepath order."""
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(files)")}
+    device = "device" if "device" in columns else "NULL"
+    inode = "inode" if "inode" in columns else "NULL"
+    return conn.execute(
+        f"SELECT filepath, extension, size, {device}, {inode} FROM files ORDER BY filepath"
+    )
+
+
+def _dir_rows(conn: sqlite3.Connection) -> Iterator[tuple]:
+    """Yield ``(path, size, on_disk, file_count)`` in path order, or nothing."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+    if "dirs" not in tables:
+        return iter(())
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(dirs)")}
+    if "on_disk" not in columns:
+        return iter(())
+    return conn.execute(
+        "SELECT path, COALESCE(size, 0), COALESCE(on_disk, 0), "
+        "COALESCE(file_count, 0) FROM dirs ORDER BY path"
+    )
+
+
+class IndexDiff:
+    """Stream the differences between the ``old_db`` and ``new_db`` indexes.
+
+    Iterate ``changes()`` once; it fills ``counts``, ``bytes`` (net
+    logical size change per kind) and ``extensions`` (extension ->
+    ``[file count delta, size delta]``) as it goes. ``work_dir`` holds
+    the temporary spill database (default: the system temp dir).
+    """
+
+    def __init__(self, old_db: str, new_db: str, work_dir: Optional[str] = None):
+        self.old_db = old_db
+        self.new_db = new_db
+        self.work_dir = work_dir
+        self.counts: Dict[str, int] = dict.fromkeys(CHANGE_KINDS, 0)
+        self.bytes: Dict[str, int] = dict.fromkeys(CHANGE_KINDS, 0)
+        self.extensions: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+
+    def _count(self, change: FileChange, old_ext: Optional[str], new_ext: Optional[str]) -> FileChange:
+        old_size = change.old_size or 0
+        new_size = change.new_size or 0
+        self.counts[change.kind] += 1
+        self.bytes[change.kind] += new_size - old_size
+        # Unknown sizes (names-level indexes) still move the file counts.
+        if change.kind != "added":
+            entry = self.extensions[old_ext]
+            entry[0] -= 1
+            entry[1] -= old_size
+        if change.kind != "removed":
+            entry = self.extensions[new_ext]
+            entry[0] += 1
+            entry[1] += new_size
+        return change
+
+    def changes(self) -> Iterator[FileChange]:
+        """Yield every ``FileChange``: same-path changes in path order, then moves, removals and additions."""
+        fd, spill_path = tempfile.mkstemp(suffix=".db", prefix="index-diff-", dir=self.work_dir)
+        os.close(fd)
+        old = SQLiteIndexReader(self.old_db)
+        new = SQLiteIndexReader(self.new_db)
+        spill = sqlite3.connect(spill_path)
+        try:
+            spill.execute("PRAGMA journal_mode=OFF")
+            spill.execute("PRAGMA synchronous=OFF")
+            for side in ("removed", "added"):
+                spill.execute(
+                    f"CREATE TABLE {side} (filepath TEXT, extension TEXT, "
+                    "size INTEGER, device INTEGER, inode INTEGER)"
+                )
+            yield from self._merge_join(_file_rows(old.conn), _file_rows(new.conn), spill)
+            spill.commit()
+            yield from self._spilled(spill)
+        finally:
+            old.close()
+            new.close()
+            spill.close()
+            os.remove(spill_path)
+
+    def _merge_join(
+        self, old_rows: Iterator[tuple], new_rows: Iterator[tuple], spill: sqlite3.Connection
+    ) -> Iterator[FileChange]:
+        insert = "INSERT INTO {} VALUES (?, ?, ?, ?, ?)"
+        removed, added = [], []
+        o, n = _next(old_rows), _next(new_rows)
+        while o is not None or n is not None:
+            if n is None or (o is not None and o[0] < n[0]):
+                removed.append(o)
+                o = _next(old_rows)
+            elif o is None or n[0] < o[0]:
+                added.append(n)
+                n = _next(new_rows)
+            else:
+                old_size, new_size = o[2], n[2]
+                # A path without a recorded size on either side (e.g. a
+                # ``metadata="names"`` index) cannot be called grown or shrunk.
+                if old_size is not None and new_size is not None and new_size != old_size:
+                    kind = "grown" if new_size > old_size else "shrunk"
+                    yield self._count(FileChange(kind, n[0], None, o[2], n[2]), o[1], n[1])
+                o, n = _next(old_rows), _next(new_rows)
+            if len(removed) + len(added) >= 10000:
+                spill.executemany(insert.format("removed"), removed)
+                spill.executemany(insert.format("added"), added)
+                removed, added = [], []
+        spill.executemany(insert.format("removed"), removed)
+        spill.executemany(insert.format("added"), added)
+
+    def _spilled(self, spill: sqlite3.Connection) -> Iterator[FileChange]:
+        """Pair spilled rows by ``(device, inode)`` into moves; the rest are removals / additions."""
+        for side in ("removed", "added"):
+            spill.execute(
+                f"""
+                CREATE TABLE {side}_ranked AS
+                SELECT rowid AS rid, device, inode, ROW_NUMBER() OVER (
+                    PARTITION BY device, inode ORDER BY filepath
+                ) AS nth
+                FROM {side} WHERE inode IS NOT NULL AND inode != 0
+            """
+            )
+            spill.execute(f"CREATE INDEX idx_{side}_ranked ON {side}_ranked(device, inode, nth)")
+        spill.execute(
+            """
+            CREATE TABLE moves AS
+            SELECT r.rid AS removed_id, a.rid AS added_id
+            FROM removed_ranked r
+            JOIN added_ranked a
+              ON a.device = r.device AND a.inode = r.inode AND a.nth = r.nth
+        """
+        )
+        spill.execute("CREATE UNIQUE INDEX idx_moves_removed ON moves(removed_id)")
+        spill.execute("CREATE UNIQUE INDEX idx_moves_added ON moves(added_id)")
+
+        for old_path, old_ext, old_size, new_path, new_ext, new_size in spill.execute(
+            """
+            SELECT r.filepath, r.extension, r.size, a.filepath, a.extension, a.size
+            FROM moves m
+            JOIN removed r ON r.rowid = m.removed_id
+            JOIN added a ON a.rowid = m.added_id
+            ORDER BY a.filepath
+        """
+        ):
+            yield self._count(
+                FileChange("moved", new_path, old_path, old_size, new_size), old_ext, new_ext
+            )
+        for side, kind in (("removed", "removed"), ("added", "added")):
+            id_column = "removed_id" if side == "removed" else "added_id"
+            for path, ext, size in spill.execute(
+                f"SELECT filepath, extension, size FROM {side} "
+                f"WHERE rowid NOT IN (SELECT {id_column} FROM moves) ORDER BY filepath"
+            ):
+                if kind == "removed":
+                    change = FileChange(kind, path, None, size or 0, None)
+                    yield self._count(change, ext, None)
+                else:
+                    change = FileChange(kind, path, None, None, size or 0)
+                    yield self._count(change, None, ext)
+
+    def top_dirs(self, n: int = 20) -> List[Tuple[str, int, int, int]]:
+        """Return the ``n`` directories whose subtree on-disk usage changed most.
+
+        Rows are ``(path, size delta, on_disk delta, file_count delta)``
+        from the ``dirs`` rollups, largest absolute on-disk change
+        first. Directories present on one side only count in full.
+        """
+        old = SQLiteIndexReader(self.old_db)
+        new = SQLiteIndexReader(self.new_db)
+        try:
+            return heapq.nlargest(
+                n,
+                self._dir_deltas(_dir_rows(old.conn), _dir_rows(new.conn)),
+                key=lambda row: (abs(row[2]), abs(row[1])),
+            )
+        finally:
+            old.close()
+            new.close()
+
+    @staticmethod
+    def _dir_deltas(old_rows: Iterator[tuple], new_rows: Iterator[tuple]) -> Iterator[tuple]:
+        o, n = _next(old_rows), _next(new_rows)
+        while o is not None or n is not None:
+            if n is None or (o is not None and o[0] < n[0]):
+                delta = (o[0], -o[1], -o[2], -o[3])
+                o = _next(old_rows)
+            elif o is None or n[0] < o[0]:
+                delta = n
+                n = _next(new_rows)
+            else:
+                delta = (n[0], n[1] - o[1], n[2] - o[2], n[3] - o[3])
+                o, n = _next(old_rows), _next(new_rows)
+            if delta[1] or delta[2] or delta[3]:
+                yield tuple(delta)
+
+
+_MARKERS = {"added": "+", "removed": "-", "grown": ">", "shrunk": "<", "moved": "R"}
+
+
+def _print_change(change: FileChange) -> None:
+    marker = _MARKERS[change.kind]
+    if change.kind == "moved":
+        print(f"{marker} {change.old_path} -> {change.path}")
+    elif change.kind in ("grown", "shrunk"):
+        print(f"{marker} {change.path} ({change.new_size - change.old_size:+,} bytes)")
+    else:
+        print(f"{marker} {change.path}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compare two index databases written by specs.disk.drive: "
+            "added, removed, grown, shrunk and moved files, plus "
+            "per-extension and per-directory deltas"
+        )
+    )
+    parser.add_argument("old_db", help="Earlier index database")
+    parser.add_argument("new_db", help="Later index database")
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="Print every changed path (+ added, - removed, > grown, < shrunk, R moved)",
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=10,
+        metavar="N",
+        help="Extensions and directories to show in the delta tables. Default: 10",
+    )
+    args = parser.parse_args()
+
+    try:
+        diff = IndexDiff(args.old_db, args.new_db)
+        for change in diff.changes():
+            if args.list:
+                _print_change(change)
+        dirs = diff.top_dirs(args.top)
+    except (OSError, sqlite3.Error) as e:
+        print(f"Diff failed: {e}", file=sys.stderr)
+        return 1
+
+    print("\nFiles:")
+    for kind in CHANGE_KINDS:
+        print(f"  {kind:<8} {diff.counts[kind]:>12,}  {diff.bytes[kind]:>+18,} bytes")
+    extensions = sorted(
+        ((ext, delta) for ext, delta in diff.extensions.items() if delta[0] or delta[1]),
+        key=lambda item: (-abs(item[1][1]), item[0] or ""),
+    )[:args.top]
+    if extensions:
+        print("\nExtensions (file count, bytes):")
+        for ext, (count, size) in extensions:
+            print(f"  {ext or '(none)':<12} {count:>+10,}  {size:>+18,}")
+    if dirs:
+        print("\nDirectories (subtree on-disk bytes, files):")
+        for path, _size, on_disk, file_count in dirs:
+            print(f"  {on_disk:>+18,}  {file_count:>+10,}  {path}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -12,12 +12,24 @@ gap (filesystem metadata, snapshots, unread subtrees) is visible
 instead of hidden.
 """
 import argparse
+import json
 import os
 import shutil
 import sys
 from pathlib import Path
+from typing import Optional
 
-from .indexer import FileIndexer
+from .ages import AgeHistograms
+from .columnar import FORMATS as COLUMNAR_FORMATS
+from .columnar import stream_columnar
+from .dupes import DuplicateFinder
+from .filters import PathFilter, read_patterns
+from .hashcache import HashCache
+from .indexer import METADATA_LEVELS, FileIndexer
+from .multiroot import MultiRootIndexer, discover_roots
+from .progress import ProgressPrinter, WalkMetrics
+from .sparse import analyze_allocation
+from .watch import IndexWatcher
 
 # Default to F:\\ on Windows (legacy behavior, used by the maintainer)
 # and the current working directory everywhere else so the CLI is
@@ -60,43 +72,524 @@ def main() -> int:
     )
     parser.add_argument(
         "--dir",
-        dest="root_dir",
-        default=str(DEFAULT_ROOT_DIR),
+        dest="root_dirs",
+        action="append",
+        default=None,
         help=(
-            "Root directory to index. "
+            "Root directory to index; repeat to index several roots "
+            "into one --db, one process per device. "
             f"Default: {DEFAULT_ROOT_DIR}"
         ),
     )
+    parser.add_argument(
+        "--all-mounts",
+        action="store_true",
+        help=(
+            "Index every real data filesystem of this host (requires "
+            "psutil), one process per device"
+        ),
+    )
+    parser.add_argument(
+        "--processes",
+        type=int,
+        default=None,
+        help=(
+            "Maximum worker processes for several roots. "
+            "Default: one per device"
+        ),
+    )
+    parser.add_argument(
+        "--one-filesystem",
+        action="store_true",
+        help=(
+            "Do not descend into directories on other devices (like du -x). "
+            "Always on with several roots: each device is walked by its "
+            "own process"
+        ),
+    )
+    parser.add_argument(
+        "--exclude",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help=(
+            "Gitignore-style glob of files or directories to skip; excluded "
+            "directories are never listed (repeatable, e.g. --exclude .git "
+            "--exclude node_modules/ --exclude '*.pyc')"
+        ),
+    )
+    parser.add_argument(
+        "--exclude-from",
+        action="append",
+        default=[],
+        metavar="FILE",
+        help="Read --exclude patterns from FILE, one per line (e.g. a .gitignore)",
+    )
+    parser.add_argument(
+        "--include",
+        action="append",
+        default=[],
+        metavar="PATTERN",
+        help="Only record files matching PATTERN (repeatable); directories are still walked",
+    )
+    parser.add_argument(
+        "--max-depth",
+        type=int,
+        default=None,
+        metavar="N",
+        help="Do not descend more than N directory levels below --dir",
+    )
+    parser.add_argument(
+        "--min-size",
+        type=int,
+        default=None,
+        metavar="BYTES",
+        help="Skip files smaller than BYTES",
+    )
     parser.add_argument(
         "--db",
         dest="db_path",
         default=None,
         help="Optional SQLite database file path. Defaults to <dir>/file_index.db",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help=(
+            "Number of threads scanning directories in parallel. "
+            "Values above 1 help on network mounts and fast SSD arrays. "
+            "Default: 1 (serial walk)"
+        ),
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help=(
+            "Update an existing --db in place: directories whose mtime "
+            "is unchanged since the last run are not re-listed, and only "
+            "added, changed or removed rows are written. A file rewritten "
+            "in place does not move its directory's mtime, so such edits "
+            "are missed until the next full run"
+        ),
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        help=(
+            "Keep the in-memory index in compact columnar storage "
+            "(much lower RAM on multi-million-file trees)"
+        ),
+    )
+    parser.add_argument(
+        "--fast-records",
+        action="store_true",
+        help=(
+            "Build lighter per-file records (raw mtime_ns, one indexed_at "
+            "per run, no per-file path normalization on POSIX)"
+        ),
+    )
+    parser.add_argument(
+        "--metadata",
+        choices=METADATA_LEVELS,
+        default="full",
+        help=(
+            "How much to record per file: 'names' needs no stat at all, "
+            "'size' skips inode/device/link data, 'full' is everything. "
+            "Default: full"
+        ),
+    )
+    parser.add_argument(
+        "--bulk-load",
+        action="store_true",
+        help=(
+            "Tune the SQLite export for large trees: relaxed journal and "
+            "sync, big page cache, secondary indexes built after the load"
+        ),
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help=(
+            "Write rows to --db in batches while walking instead of "
+            "holding the whole index in memory first"
+        ),
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10000,
+        help="Rows per committed transaction with --stream. Default: 10000",
+    )
+    parser.add_argument(
+        "--columnar",
+        default=None,
+        metavar="PATH",
+        help=(
+            "Stream the rows to PATH instead of SQLite: Parquet or Arrow "
+            "IPC (needs pyarrow), NDJSON or CSV, picked from the suffix "
+            "or --format"
+        ),
+    )
+    parser.add_argument(
+        "--format",
+        dest="columnar_format",
+        choices=("auto",) + COLUMNAR_FORMATS,
+        default="auto",
+        help=(
+            "Format for --columnar. Default: auto (from the suffix, else "
+            "Parquet when pyarrow is installed, else NDJSON)"
+        ),
+    )
+    parser.add_argument(
+        "--dupes",
+        action="store_true",
+        help=(
+            "After indexing, hash same-size files to find duplicate "
+            "content, store the digests in --db and report reclaimable bytes"
+        ),
+    )
+    parser.add_argument(
+        "--top",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Print the N directories with the largest subtree on-disk "
+            "usage (du-style, from the dirs table of --db)"
+        ),
+    )
+    parser.add_argument(
+        "--watch",
+        action="store_true",
+        help=(
+            "After indexing, keep running and apply file changes to the "
+            "index and --db as inotify reports them (Linux; Ctrl-C stops)"
+        ),
+    )
+    parser.add_argument(
+        "--sparse",
+        type=int,
+        default=0,
+        metavar="N",
+        help=(
+            "Report sparse and cluster-slack bytes and the N files with "
+            "the most unallocated bytes"
+        ),
+    )
+    parser.add_argument(
+        "--probe",
+        type=int,
+        default=0,
+        metavar="K",
+        help=(
+            "With --sparse, map holes of the K largest files with "
+            "SEEK_DATA/SEEK_HOLE (Linux, macOS, FreeBSD)"
+        ),
+    )
+    parser.add_argument(
+        "--ages",
+        action="store_true",
+        help=(
+            "Count files and bytes per mtime and atime age bucket (overall, "
+            "per extension, per top-level directory), store them in the "
+            "histograms table of --db and print the overall histograms"
+        ),
+    )
+    parser.add_argument(
+        "--progress",
+        action="store_true",
+        help="Show a live files/s, dirs/s and queue depth line on stderr",
+    )
+    parser.add_argument(
+        "--metrics-json",
+        default=None,
+        metavar="PATH",
+        help=(
+            "Write walk metrics (rates, stat latency histogram, queue "
+            "depth, slowest directories, errors) to PATH as JSON"
+        ),
+    )
     args = parser.parse_args()
+    if args.stream and args.incremental:
+        parser.error("--stream and --incremental cannot be combined")
+    if args.stream and args.dupes:
+        parser.error("--dupes needs the in-memory index and cannot be combined with --stream")
+    if args.bulk_load and (args.stream or args.incremental or args.watch or args.columnar):
+        parser.error("--bulk-load only applies to the default SQLite export")
+    if args.sparse and (args.stream or args.columnar):
+        parser.error("--sparse needs the in-memory index and cannot be combined with --stream or --columnar")
+    if args.watch and (args.stream or args.incremental or args.dupes):
+        parser.error("--watch cannot be combined with --stream, --incremental or --dupes")
+    if args.columnar and (
+        args.stream or args.incremental or args.dupes or args.watch or args.top or args.db_path
+    ):
+        parser.error(
+            "--columnar replaces the SQLite output and cannot be combined with "
+            "--db, --stream, --incremental, --dupes, --watch or --top"
+        )
+
+    if args.min_size is not None and args.metadata == "names":
+        parser.error("--min-size needs file sizes and cannot be combined with --metadata names")
+    try:
+        args.path_filter = _path_filter(args)
+    except OSError as e:
+        parser.error(f"cannot read --exclude-from file: {e}")
 
-    root_dir = Path(args.root_dir)
+    if args.all_mounts or (args.root_dirs and len(args.root_dirs) > 1):
+        return _main_multiroot(parser, args)
+
+    root_dir = Path(args.root_dirs[0] if args.root_dirs else DEFAULT_ROOT_DIR)
     if not root_dir.exists() or not root_dir.is_dir():
         print(f"Directory does not exist: {root_dir}", file=sys.stderr)
         return 2
 
-    indexer = FileIndexer()
-    indexer.index_directory(str(root_dir))
-
     db_path = Path(args.db_path) if args.db_path else root_dir / "file_index.db"
-    success, error = indexer.export_to_sqlite(str(db_path))
+    observer = None
+    if args.progress:
+        observer = ProgressPrinter()
+    elif args.metrics_json:
+        observer = WalkMetrics()
+    indexer = FileIndexer(
+        compact=args.compact,
+        observer=observer,
+        fast_records=args.fast_records,
+        metadata=args.metadata,
+        one_filesystem=args.one_filesystem,
+        path_filter=args.path_filter,
+        histograms=AgeHistograms() if args.ages else None,
+    )
+    if args.watch:
+        return _watch(indexer, root_dir, db_path, args.workers)
+    if args.columnar:
+        success, error = stream_columnar(
+            indexer,
+            str(root_dir),
+            args.columnar,
+            fmt=args.columnar_format,
+            workers=args.workers,
+        )
+        if args.metrics_json:
+            _write_metrics(observer, args.metrics_json)
+        if not success:
+            print(f"Export failed: {error}", file=sys.stderr)
+            return 1
+        print(f"Successfully exported to {args.columnar}")
+        _print_stats(indexer.get_statistics())
+        if args.ages:
+            _print_ages(indexer.histograms)
+        return 0
+    if args.incremental:
+        success, error = indexer.index_incremental(
+            str(root_dir), str(db_path), workers=args.workers
+        )
+    elif args.stream:
+        success, error = indexer.stream_to_sqlite(
+            str(root_dir),
+            str(db_path),
+            batch_size=args.batch_size,
+            workers=args.workers,
+        )
+    else:
+        indexer.index_directory(str(root_dir), workers=args.workers)
+        success, error = indexer.export_to_sqlite(str(db_path), bulk=args.bulk_load)
+    if args.metrics_json:
+        _write_metrics(observer, args.metrics_json)
     if not success:
         print(f"Export failed: {error}", file=sys.stderr)
         return 1
 
     print(f"Successfully exported to SQLite database: {db_path}")
+    if args.incremental:
+        changes = indexer.changes
+        print(
+            f"Incremental update: {changes['added']} added, "
+            f"{changes['changed']} changed, {changes['removed']} removed "
+            f"({changes['reused_dirs']} unchanged directories reused)"
+        )
     _print_comparison(indexer, root_dir)
+    if args.top > 0:
+        _print_top_dirs(db_path, args.top)
+    if args.sparse > 0:
+        _print_allocation(analyze_allocation(indexer, top=args.sparse, probe=args.probe))
+    if args.ages:
+        _print_ages(indexer.histograms)
+    if args.dupes:
+        return _report_duplicates(indexer, db_path, args.workers)
     return 0
 
 
-def _print_comparison(indexer: FileIndexer, root_dir: Path) -> None:
-    """Print indexer stats and the OS-reported disk usage side by side."""
-    stats = indexer.get_statistics()
+def _main_multiroot(parser: argparse.ArgumentParser, args) -> int:
+    """Index several roots (``--dir`` repeated or ``--all-mounts``) into one ``--db``."""
+    if not args.db_path:
+        parser.error("--db is required when indexing several roots")
+    for flag, used in (
+        ("--incremental", args.incremental),
+        ("--stream", args.stream),
+        ("--dupes", args.dupes),
+        ("--progress", args.progress),
+        ("--metrics-json", args.metrics_json),
+        ("--watch", args.watch),
+        ("--columnar", args.columnar),
+        ("--ages", args.ages),
+    ):
+        if used:
+            parser.error(f"{flag} cannot be combined with several roots")
+
+    roots = list(args.root_dirs or [])
+    if args.all_mounts:
+        roots.extend(discover_roots())
+    indexer = MultiRootIndexer(
+        roots,
+        processes=args.processes,
+        workers=args.workers,
+        compact=args.compact,
+        fast_records=args.fast_records,
+        metadata=args.metadata,
+        path_filter=args.path_filter,
+    )
+    success, error = indexer.index_to_sqlite(args.db_path)
+    for message in indexer.errors:
+        print(message, file=sys.stderr)
+    if not success:
+        print(f"Export failed: {error}", file=sys.stderr)
+        return 1
+
+    print(f"Successfully exported to SQLite database: {args.db_path}")
+    _print_stats(indexer.get_statistics())
+    if args.top > 0:
+        _print_top_dirs(Path(args.db_path), args.top)
+    return 0
+
+
+def _path_filter(args) -> Optional[PathFilter]:
+    """Build the ``PathFilter`` for the filter flags, or None if none was given."""
+    exclude = list(args.exclude)
+    for path in args.exclude_from:
+        exclude.extend(read_patterns(path))
+    if not (exclude or args.include) and args.max_depth is None and args.min_size is None:
+        return None
+    return PathFilter(
+        exclude=exclude,
+        include=args.include,
+        max_depth=args.max_depth,
+        min_size=args.min_size,
+    )
+
+
+def _watch(indexer: FileIndexer, root_dir: Path, db_path: Path, workers: int) -> int:
+    """Index ``root_dir`` once, then apply inotify events until interrupted."""
+    watcher = IndexWatcher(str(root_dir), str(db_path), indexer=indexer)
+    success, error = watcher.start(workers=workers)
+    if not success:
+        watcher.close()
+        print(f"Export failed: {error}", file=sys.stderr)
+        return 1
+    print(f"Successfully exported to SQLite database: {db_path}")
+    _print_comparison(indexer, root_dir)
+    print(f"\nWatching {watcher.root} for changes (Ctrl-C to stop)")
+    try:
+        while True:
+            applied = watcher.poll(timeout=1.0)
+            if applied:
+                print(f"Applied {applied} changes")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.close()
+    changes = watcher.changes
+    print(
+        f"\nStopped watching: {changes['upserted']} paths updated, "
+        f"{changes['removed']} removed, {changes['overflows']} queue overflows"
+    )
+    return 0
+
+
+def _write_metrics(metrics: WalkMetrics, path: str) -> None:
+    """Dump ``metrics.to_dict()`` to ``path`` as indented JSON."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metrics.to_dict(), f, indent=2)
+        f.write("\n")
+
+
+def _print_allocation(report: dict) -> None:
+    """Print the sparse / slack summary of ``analyze_allocation``."""
+    print(
+        f"\nAllocation ({report['files']:,} unique files, "
+        f"logical / on-disk = {report['efficiency']:.3f}):"
+    )
+    print(
+        f"  sparse:          {_format_bytes(report['sparse_bytes'])} bytes never "
+        f"allocated in {report['sparse_files']:,} files"
+    )
+    print(
+        f"  cluster slack:   {_format_bytes(report['slack_bytes'])} bytes beyond "
+        f"the logical size in {report['slack_files']:,} files"
+    )
+    for path, size, on_disk, ratio in report["top_sparse"]:
+        print(f"  {_format_bytes(size - on_disk)} bytes  {ratio:>6.1%} sparse  {path}")
+    if report["probed"]:
+        print("\nLargest files (SEEK_DATA / SEEK_HOLE):")
+        for probed in report["probed"]:
+            print(
+                f"  {_format_bytes(probed['holes'])} bytes in holes  "
+                f"{probed['data_runs']:>6,} data runs  {probed['path']}"
+            )
+
+
+def _print_ages(histograms: AgeHistograms) -> None:
+    """Print the all-files mtime and atime histograms."""
+    labels = histograms.bucket_labels()
+    for clock in ("mtime", "atime"):
+        counters = histograms.counters.get((clock, "all", ""))
+        if counters is None:
+            continue
+        files, _size, on_disk = counters
+        print(f"\nAge by {clock} (files, on-disk bytes):")
+        for label, count, used in zip(labels, files, on_disk):
+            print(f"  {label:>10}  {count:>12,}  {_format_bytes(used)} bytes")
+
+
+def _print_top_dirs(db_path: Path, n: int) -> None:
+    """Print the ``n`` heaviest subtrees recorded in ``db_path``."""
+    with FileIndexer.open(str(db_path)) as index:
+        rows = index.top_dirs(n)
+    print("\nLargest directories (subtree totals, deduped by inode):")
+    for path, _size, on_disk, file_count in rows:
+        print(f"  {_format_bytes(on_disk)} bytes  {file_count:>10,} files  {path}")
+
+
+def _report_duplicates(indexer: FileIndexer, db_path: Path, workers: int) -> int:
+    """Run the duplicate finder, store digests in ``db_path`` and print a summary."""
+    with HashCache(str(db_path)) as cache:
+        finder = DuplicateFinder(indexer, workers=max(4, workers), cache=cache)
+        groups = finder.find()
+        # The export keeps rows of deleted files, so prune against the walk.
+        cache.prune(indexer._iter_fields("device", "inode"))
+    success, error = finder.write_digests(str(db_path))
+    if not success:
+        print(f"Storing digests failed: {error}", file=sys.stderr)
+        return 1
+    copies = sum(group["inodes"] - 1 for group in groups)
+    print(
+        f"\nDuplicates: {len(groups)} groups, {copies} redundant copies, "
+        f"{len(finder.errors)} unreadable files, "
+        f"{cache.hits} digests reused from the hash cache"
+    )
+    print(
+        f"  reclaimable:     "
+        f"{_format_bytes(DuplicateFinder.reclaimable_bytes(groups))} bytes"
+    )
+    for group in groups[:10]:
+        print(
+            f"  {_format_bytes(group['reclaimable'])} bytes  "
+            f"{group['inodes']} x {group['paths'][0]}"
+        )
+    return 0
+
+
+def _print_stats(stats: dict) -> None:
+    """Print the file counts and size totals of ``get_statistics()``."""
     print(
         f"Indexed {stats['total_files']} files "
         f"({stats['unique_files']} unique inodes)"
@@ -114,6 +607,12 @@ def _print_comparison(indexer: FileIndexer, root_dir: Path) -> None:
         f"  skipped:         {_format_bytes(stats['skipped_paths'])} "
         "(permission / access errors during walk)"
     )
+
+
+def _print_comparison(indexer: FileIndexer, root_dir: Path) -> None:
+    """Print indexer stats and the OS-reported disk usage side by side."""
+    stats = indexer.get_statistics()
+    _print_stats(stats)
     try:
         du = shutil.disk_usage(str(root_dir))
     except (OSError, AttributeError) as e:
@@ -0,0 +1,258 @@
+"""Find files with identical content across different inodes.
+
+``FileIndexer`` already collapses hardlinks by ``(st_dev, st_ino)``;
+this module finds the other kind of waste, separate inodes holding the
+same bytes. Candidates are narrowed in three stages so that most files
+are never read in full:
+
+1. group ``FileIndexer.files`` by size (one representative per inode,
+   empty files ignored); sizes seen once cannot have a duplicate,
+2. hash the first and last ``partial_bytes`` of every remaining
+   candidate and regroup by ``(size, partial hash)``; a file no longer
+   than ``2 * partial_bytes`` is hashed in full here and skips stage 3,
+3. hash the survivors in full through ``mmap`` in ``chunk_bytes``
+   slices, so large reads go straight from the page cache into
+   ``hashlib``.
+
+Stages 2 and 3 run on a thread pool; ``hashlib`` releases the GIL while
+hashing large buffers, so hashing overlaps with I/O. Digests are
+BLAKE2b-256 hex strings, which ``write_digests`` stores in the
+``digest`` column of the ``files`` table.
+"""
+import hashlib
+import mmap
+import os
+import sqlite3
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .hashcache import HashCache
+from .indexer import FileIndexer
+
+# ``HashCache`` kind of the full-content digest.
+FULL_KIND = "blake2b-256"
+
+
+def _new_hash() -> "hashlib.blake2b":
+    return hashlib.blake2b(digest_size=32)
+
+
+class DuplicateFinder:
+    """Size -> partial hash -> full hash duplicate detection over an index.
+
+    ``find()`` returns one dict per set of identical files::
+
+        {"digest": str, "size": int, "paths": [str, ...],
+         "inodes": int, "reclaimable": int}
+
+    ``paths`` lists every indexed path with that content, hardlinks
+    included. ``reclaimable`` is the on-disk bytes freed by keeping a
+    single inode, i.e. the summed ``on_disk`` of all other inodes.
+    Files that cannot be read, or whose size changed since they were
+    indexed, are skipped and listed in ``errors``.
+
+    With a ``HashCache``, partial and full digests of files whose
+    inode, size and mtime are unchanged are taken from the cache, so a
+    repeat run only reads files that changed.
+    """
+
+    def __init__(
+        self,
+        indexer: FileIndexer,
+        workers: int = 4,
+        partial_bytes: int = 64 * 1024,
+        chunk_bytes: int = 16 * 1024 * 1024,
+        cache: Optional[HashCache] = None,
+    ):
+        self.indexer = indexer
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.partial_bytes = partial_bytes
+        self.chunk_bytes = chunk_bytes
+        # filepath -> full-content digest of every file hashed in full.
+        self.digests: Dict[str, str] = {}
+        self.errors: List[Tuple[str, str]] = []
+        # inode representative -> every indexed path of that inode.
+        self._links: Dict[str, List[str]] = {}
+
+    # -- hashing --------------------------------------------------------
+
+    def _hashed_whole(self, size: int) -> bool:
+        return size <= 2 * self.partial_bytes
+
+    @staticmethod
+    def _stat(path: str, fd: Optional[int], size: int) -> "os.stat_result":
+        st = os.stat(path) if fd is None else os.fstat(fd)
+        if st.st_size != size:
+            raise OSError("size changed since indexing")
+        return st
+
+    def _cached(self, path: str, size: int, kind: str) -> Optional[str]:
+        if self.cache is None:
+            return None
+        return self.cache.get(self._stat(path, None, size), kind)
+
+    def _partial_hash(self, path: str, size: int) -> str:
+        """Hash the head and tail of ``path`` (all of it if ``_hashed_whole``)."""
+        whole = self._hashed_whole(size)
+        kind = FULL_KIND if whole else f"{FULL_KIND}:head-tail-{self.partial_bytes}"
+        digest = self._cached(path, size, kind)
+        if digest is not None:
+            return digest
+        h = _new_hash()
+        with open(path, "rb") as f:
+            st = self._stat(path, f.fileno(), size)
+            if whole:
+                h.update(f.read())
+            else:
+                h.update(f.read(self.partial_bytes))
+                f.seek(size - self.partial_bytes)
+                h.update(f.read(self.partial_bytes))
+        digest = h.hexdigest()
+        if self.cache is not None:
+            self.cache.put(st, kind, digest)
+        return digest
+
+    def _full_hash(self, path: str, size: int) -> str:
+        digest = self._cached(path, size, FULL_KIND)
+        if digest is not None:
+            return digest
+        h = _new_hash()
+        with open(path, "rb") as f:
+            st = self._stat(path, f.fileno(), size)
+            try:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Filesystems without mmap support: plain large reads.
+                for chunk in iter(lambda: f.read(self.chunk_bytes), b""):
+                    h.update(chunk)
+            else:
+                with mapped:
+                    view = memoryview(mapped)
+                    try:
+                        for offset in range(0, size, self.chunk_bytes):
+                            h.update(view[offset:offset + self.chunk_bytes])
+                    finally:
+                        view.release()
+        digest = h.hexdigest()
+        if self.cache is not None:
+            self.cache.put(st, FULL_KIND, digest)
+        return digest
+
+    def _run(self, func, jobs: List[Tuple[str, int]]) -> Iterable[Tuple[str, object]]:
+        """Apply ``func(path, size)`` to ``jobs`` on the pool, dropping failures."""
+        def call(job):
+            try:
+                return job[0], func(*job), None
+            except OSError as e:
+                return job[0], None, str(e)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for path, result, error in pool.map(call, jobs):
+                if error is not None:
+                    self.errors.append((path, error))
+                    continue
+                yield path, result
+
+    # -- pipeline -------------------------------------------------------
+
+    def _size_groups(self) -> Tuple[Dict[int, List[str]], Dict[str, List[str]], Dict[str, int]]:
+        """Stage 1: size -> inode representatives, plus hardlink and on_disk maps."""
+        by_inode: Dict[tuple, List[str]] = {}
+        on_disk: Dict[str, int] = {}
+        sizes: Dict[int, List[str]] = defaultdict(list)
+        fields = self.indexer._iter_fields("filepath", "size", "on_disk", "device", "inode")
+        for i, (path, size, disk, device, inode) in enumerate(fields):
+            if not size:
+                continue
+            key = (device, inode, None) if inode else (device, None, i)
+            paths = by_inode.get(key)
+            if paths is not None:
+                paths.append(path)
+                continue
+            by_inode[key] = [path]
+            on_disk[path] = disk if disk is not None else size
+            sizes[size].append(path)
+        links = {paths[0]: paths for paths in by_inode.values()}
+        return (
+            {size: reps for size, reps in sizes.items() if len(reps) > 1},
+            links,
+            on_disk,
+        )
+
+    def find(self) -> List[dict]:
+        """Run the three stages and return duplicate groups, largest waste first."""
+        self.digests = {}
+        self.errors = []
+        candidates, self._links, on_disk = self._size_groups()
+        size_of = {path: size for size, reps in candidates.items() for path in reps}
+
+        partial: Dict[tuple, List[str]] = defaultdict(list)
+        jobs = [(path, size) for size, reps in candidates.items() for path in reps]
+        for path, digest in self._run(self._partial_hash, jobs):
+            if self._hashed_whole(size_of[path]):
+                self.digests[path] = digest
+            partial[(size_of[path], digest)].append(path)
+
+        full: Dict[tuple, List[str]] = defaultdict(list)
+        jobs = []
+        for (size, digest), reps in partial.items():
+            if len(reps) < 2:
+                continue
+            if self._hashed_whole(size):
+                full[(size, digest)].extend(reps)
+            else:
+                jobs.extend((path, size) for path in reps)
+        for path, digest in self._run(self._full_hash, jobs):
+            self.digests[path] = digest
+            full[(size_of[path], digest)].append(path)
+        if self.cache is not None:
+            self.cache.flush()
+
+        groups = []
+        for (size, digest), reps in full.items():
+            if len(reps) < 2:
+                continue
+            reps.sort()
+            groups.append({
+                "digest": digest,
+                "size": size,
+                "paths": sorted(p for rep in reps for p in self._links[rep]),
+                "inodes": len(reps),
+                "reclaimable": sum(on_disk[rep] for rep in reps[1:]),
+            })
+        groups.sort(key=lambda g: (-g["reclaimable"], g["digest"]))
+        return groups
+
+    @staticmethod
+    def reclaimable_bytes(groups: List[dict]) -> int:
+        """Total on-disk bytes freed by collapsing every group to one inode."""
+        return sum(group["reclaimable"] for group in groups)
+
+    def write_digests(self, db_path: str) -> Tuple[bool, Optional[str]]:
+        """Store the digests from the last ``find()`` in the ``digest`` column.
+
+        Every path sharing an inode with a hashed file gets the same
+        digest. Returns ``(success, error_message)`` like
+        ``FileIndexer.export_to_sqlite``.
+        """
+        rows = [
+            (digest, path)
+            for rep, digest in self.digests.items()
+            for path in self._links.get(rep, [rep])
+        ]
+        try:
+            conn = sqlite3.connect(db_path)
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+        try:
+            cursor = conn.cursor()
+            FileIndexer._ensure_schema(cursor)
+            cursor.executemany("UPDATE files SET digest = ? WHERE filepath = ?", rows)
+            conn.commit()
+            return True, None
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+        finally:
+            conn.close()
@@ -0,0 +1,181 @@
+"""Include / exclude rules that prune the walk before directories are scanned.
+
+``FileIndexer(path_filter=PathFilter(...))`` checks every directory entry
+against the rules while its parent is listed, so an excluded
+``node_modules`` or ``.git`` is never opened, and an excluded file is
+never stat'd:
+
+* ``exclude`` -- gitignore-style globs. A pattern without a ``/``
+  (``*.pyc``, ``node_modules``) matches the entry name at any depth; one
+  with a leading or inner ``/`` (``/build``, ``docs/*.tmp``) matches the
+  path relative to the root; a trailing ``/`` (``cache/``) matches
+  directories only; ``**`` spans directories. ``!pattern`` re-includes
+  an entry that an exclude matched (regardless of order), but nothing
+  below an excluded directory, which is never listed,
+* ``include`` -- if given, only files matching one of these globs are
+  recorded; directories are still descended,
+* ``max_depth`` -- directories deeper than this many levels below the
+  root are not descended (0 records only the root's own files),
+* ``min_size`` -- files smaller than this many bytes are dropped after
+  their ``stat`` (needs ``metadata="full"`` or ``"size"``),
+* ``one_filesystem`` -- same as ``FileIndexer(one_filesystem=True)``.
+
+Rules are compiled once: literal names go into sets and all globs of a
+kind into one alternation regex, so the cost per entry does not grow
+with the number of rules. ``index_incremental`` reuses the stored
+listing of unchanged directories, so changing the rules needs a full
+run.
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+
+_GLOB_CHARS = re.compile(r"[*?\[]")
+
+
+def relative_path(root: str, path: str) -> str:
+    """Return ``path`` relative to the walk ``root`` (both index keys); ``""`` for the root."""
+    if path == root:
+        return ""
+    if root == ".":
+        return path[2:] if path.startswith("./") else path
+    if path.startswith(root):
+        return path[len(root):].lstrip("/")
+    return path
+
+
+def _translate(glob: str) -> str:
+    """Translate one glob into a regex body; ``*`` and ``?`` never match ``/``."""
+    out = []
+    i, n = 0, len(glob)
+    while i < n:
+        c = glob[i]
+        if glob.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif glob.startswith("/**", i) and i + 3 == n:
+            out.append("/.*")
+            i += 3
+        elif glob.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif c == "*":
+            out.append("[^/]*")
+            i += 1
+        elif c == "?":
+            out.append("[^/]")
+            i += 1
+        elif c == "[":
+            end = glob.find("]", i + 2)
+            if end == -1:
+                out.append(re.escape(c))
+                i += 1
+            else:
+                body = glob[i + 1:end]
+                if body.startswith("!"):
+                    body = "^" + body[1:]
+                out.append(f"[{body}]")
+                i = end + 1
+        else:
+            out.append(re.escape(c))
+            i += 1
+    return "".join(out)
+
+
+def _compile(globs: List[str]) -> Optional["re.Pattern"]:
+    if not globs:
+        return None
+    return re.compile("|".join(f"(?:{_translate(g)})" for g in globs) + r"\Z")
+
+
+class _RuleSet:
+    """Compiled matcher for a list of gitignore-style patterns."""
+
+    def __init__(self, patterns: Iterable[str]):
+        # Index 0: any entry, index 1: directories only.
+        names: Tuple[set, set] = (set(), set())
+        name_globs: Tuple[List[str], List[str]] = ([], [])
+        path_globs: Tuple[List[str], List[str]] = ([], [])
+        self.empty = True
+        for pattern in patterns:
+            dir_only = pattern.endswith("/")
+            pattern = pattern.rstrip("/")
+            anchored = "/" in pattern
+            pattern = pattern.lstrip("/")
+            if pattern.startswith("**/") and "/" not in pattern[3:]:
+                pattern, anchored = pattern[3:], False
+            if not pattern:
+                continue
+            self.empty = False
+            slot = 1 if dir_only else 0
+            if anchored:
+                path_globs[slot].append(pattern)
+            elif _GLOB_CHARS.search(pattern):
+                name_globs[slot].append(pattern)
+            else:
+                names[slot].add(pattern)
+        self.names, self.dir_names = names
+        self.name_re, self.dir_name_re = (_compile(globs) for globs in name_globs)
+        self.path_re, self.dir_path_re = (_compile(globs) for globs in path_globs)
+
+    def matches(self, rel: str, name: str, is_dir: bool) -> bool:
+        if name in self.names:
+            return True
+        if self.name_re is not None and self.name_re.match(name):
+            return True
+        if self.path_re is not None and self.path_re.match(rel):
+            return True
+        if not is_dir:
+            return False
+        if name in self.dir_names:
+            return True
+        if self.dir_name_re is not None and self.dir_name_re.match(name):
+            return True
+        return self.dir_path_re is not None and self.dir_path_re.match(rel) is not None
+
+
+def read_patterns(path: str) -> List[str]:
+    """Read gitignore-style patterns from ``path`` (blank lines and ``#`` comments skipped)."""
+    with open(path, encoding="utf-8") as f:
+        lines = [line.rstrip("\n").rstrip() for line in f]
+    return [line for line in lines if line and not line.startswith("#")]
+
+
+class PathFilter:
+    """Precompiled include / exclude, depth, size and device rules for a walk."""
+
+    def __init__(
+        self,
+        exclude: Iterable[str] = (),
+        include: Iterable[str] = (),
+        max_depth: Optional[int] = None,
+        min_size: Optional[int] = None,
+        one_filesystem: bool = False,
+    ):
+        exclude = list(exclude)
+        self._exclude = _RuleSet(p for p in exclude if not p.startswith("!"))
+        self._negate = _RuleSet(p[1:] for p in exclude if p.startswith("!"))
+        self._include = _RuleSet(include)
+        self.max_depth = max_depth
+        self.min_size = min_size
+        self.one_filesystem = one_filesystem
+
+    def _excluded(self, rel: str, name: str, is_dir: bool) -> bool:
+        if self._exclude.empty or not self._exclude.matches(rel, name, is_dir):
+            return False
+        return self._negate.empty or not self._negate.matches(rel, name, is_dir)
+
+    def prune_dir(self, rel: str, name: str, depth: int) -> bool:
+        """True if the directory at ``rel`` (``depth`` levels below the root) must not be scanned."""
+        if self.max_depth is not None and depth > self.max_depth:
+            return True
+        return self._excluded(rel, name, True)
+
+    def skip_file(self, rel: str, name: str) -> bool:
+        """True if the file at ``rel`` is filtered out by its path alone (no ``stat`` needed)."""
+        if self._excluded(rel, name, False):
+            return True
+        return not self._include.empty and not self._include.matches(rel, name, False)
+
+    def skip_size(self, size: Optional[int]) -> bool:
+        """True if a file of ``size`` bytes is below ``min_size``."""
+        return self.min_size is not None and (size or 0) < self.min_size
@@ -0,0 +1,171 @@
+"""Persistent content-hash cache stored next to the ``files`` table.
+
+Hashing a multi-terabyte tree is dominated by reading the bytes, and
+almost all of them are unchanged between runs. ``HashCache`` remembers
+digests in a ``hash_cache`` table of the index database, keyed by
+``(device, inode, size, mtime_ns, kind)``: a file whose inode, size and
+modification time are unchanged gets its digest back without a read.
+``kind`` names the hash (e.g. the full BLAKE2b digest and the
+head/tail partial digest of ``DuplicateFinder``), so several passes can
+share one table.
+
+Lookups and inserts go through an in-memory LRU of ``capacity``
+entries; misses fall through to an indexed SQLite lookup and inserts
+are written in batches of ``flush_every``.
+
+The table is created by ``FileIndexer._ensure_schema`` together with
+two triggers on ``files``: deleting the last row that references an
+inode (``index_incremental`` removals, ``stream_to_sqlite`` stale-row
+cleanup) evicts its cache entries, and an update that changes a row's
+size, mtime or inode evicts the entries of the old inode. Indexes
+refreshed with ``export_to_sqlite`` never delete rows, so
+``prune(live)`` drops the entries of every inode the current walk no
+longer has; ``python -m specs.disk.drive --dupes`` calls it after each
+run.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Tuple
+
+from .indexer import FileIndexer
+
+_Key = Tuple[int, int, int, int, str]
+
+
+class HashCache:
+    """LRU-fronted ``(device, inode, size, mtime_ns, kind) -> digest`` cache.
+
+    Safe to share between threads. Entries are only cached for files
+    with a real inode number (``st_ino != 0``). Use as a context
+    manager, or call ``close()``, so pending inserts are written.
+    """
+
+    def __init__(self, db_path: str, capacity: int = 65536, flush_every: int = 1000):
+        self.capacity = capacity
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        self._lru: "OrderedDict[_Key, str]" = OrderedDict()
+        self._pending: List[tuple] = []
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        cursor = self.conn.cursor()
+        FileIndexer._ensure_schema(cursor)
+        self.conn.commit()
+
+    @staticmethod
+    def _key(st: "os.stat_result", kind: str) -> Optional[_Key]:
+        if not st.st_ino:
+            return None
+        return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, kind)
+
+    def _remember(self, key: _Key, digest: str) -> None:
+        self._lru[key] = digest
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.capacity:
+            self._lru.popitem(last=False)
+
+    def get(self, st: "os.stat_result", kind: str) -> Optional[str]:
+        """Return the cached ``kind`` digest for the file described by ``st``."""
+        key = self._key(st, kind)
+        if key is None:
+            return None
+        with self._lock:
+            digest = self._lru.get(key)
+            if digest is None:
+                row = self.conn.execute(
+                    "SELECT digest FROM hash_cache WHERE device = ? AND inode = ? "
+                    "AND size = ? AND mtime_ns = ? AND kind = ?",
+                    key,
+                ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                digest = row[0]
+            self._remember(key, digest)
+            self.hits += 1
+            return digest
+
+    def put(self, st: "os.stat_result", kind: str, digest: str) -> None:
+        """Cache ``digest`` for the file described by ``st`` (an ``fstat`` of the hashed fd)."""
+        key = self._key(st, kind)
+        if key is None:
+            return
+        with self._lock:
+            self._remember(key, digest)
+            self._pending.append(key + (digest,))
+            if len(self._pending) >= self.flush_every:
+                self._flush()
+
+    def _flush(self) -> None:
+        if not self._pending:
+            return
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO hash_cache "
+            "(device, inode, size, mtime_ns, kind, digest) VALUES (?, ?, ?, ?, ?, ?)",
+            self._pending,
+        )
+        self.conn.commit()
+        self._pending = []
+
+    def flush(self) -> None:
+        """Write pending inserts to the database."""
+        with self._lock:
+            self._flush()
+
+    def prune(self, live: Optional[Iterable[Tuple[int, int]]] = None) -> int:
+        """Delete entries for inodes that left the index; return the count.
+
+        Without ``live``, an inode has left when no ``files`` row
+        references it. ``export_to_sqlite`` never deletes rows, so after
+        a plain export pass the ``(device, inode)`` pairs of the current
+        walk as ``live`` instead.
+        """
+        with self._lock:
+            self._flush()
+            if live is None:
+                cursor = self.conn.execute(
+                    """
+                    DELETE FROM hash_cache WHERE NOT EXISTS (
+                        SELECT 1 FROM files
+                        WHERE files.device = hash_cache.device
+                          AND files.inode = hash_cache.inode
+                    )
+                """
+                )
+            else:
+                self.conn.execute(
+                    "CREATE TEMP TABLE live_inodes (device INTEGER NOT NULL, "
+                    "inode INTEGER NOT NULL, PRIMARY KEY (device, inode)) WITHOUT ROWID"
+                )
+                try:
+                    self.conn.executemany(
+                        "INSERT OR IGNORE INTO live_inodes VALUES (?, ?)",
+                        ((device, inode) for device, inode in live if inode),
+                    )
+                    cursor = self.conn.execute(
+                        """
+                        DELETE FROM hash_cache WHERE NOT EXISTS (
+                            SELECT 1 FROM live_inodes
+                            WHERE live_inodes.device = hash_cache.device
+                              AND live_inodes.inode = hash_cache.inode
+                        )
+                    """
+                    )
+                finally:
+                    self.conn.execute("DROP TABLE live_inodes")
+            self.conn.commit()
+            self._lru.clear()
+            return cursor.rowcount
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def __enter__(self) -> "HashCache":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -26,12 +26,37 @@ contribute to "used" but never to a file walk. The CLI in
 ``specs.disk.drive`` prints both numbers so the gap is visible.
 """
 import os
-import re
+import queue
 import sqlite3
+import threading
+import time
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from .ages import AgeHistograms
+from .filters import PathFilter, relative_path
+from .progress import WalkObserver
+from .reader import SQLiteIndexReader
+from .search import SearchIndex, compile_pattern
+from .store import CompactFileStore, _ns_to_datetime
+
+# Paths built with ``os.path.join`` are already posix on these hosts.
+_POSIX_PATHS = os.sep == "/" and os.altsep is None
+
+# Directory mtimes have a coarse granularity on some filesystems (the
+# kernel tick on ext4, 2 s on FAT, 1 s on some NFS servers). An mtime
+# within this much of the walk's start, or later, is "racy", as in git:
+# an entry created just after the listing, in the same tick, leaves it
+# unchanged, so such directories are stored without an mtime and the
+# next incremental run rescans them.
+RACY_MTIME_NS = 2 * 10 ** 9
+
+
+def _perf_ns() -> int:
+    """``time.perf_counter()`` in integer nanoseconds (no ``_ns`` on 3.6)."""
+    return int(time.perf_counter() * 1e9)
 
 
 def _on_disk_bytes(st: "os.stat_result") -> int:
@@ -50,14 +75,361 @@ def _on_disk_bytes(st: "os.stat_result") -> int:
     return blocks * 512
 
 
+def _parent_key(path: str) -> str:
+    """Return the posix key of the directory containing ``path``.
+
+    Equivalent to ``Path(path).parent.as_posix()`` for the keys the
+    walker produces (``/a`` -> ``/``, ``F:/a`` -> ``F:/``, ``a`` ->
+    ``.``) without building a ``Path`` per file.
+    """
+    head, sep, _ = path.rpartition("/")
+    if not sep:
+        return "."
+    if not head or head.endswith(":"):
+        return head + sep
+    return head
+
+
+def _inode_key(device, inode, fallback) -> tuple:
+    """Return the key that identifies the file behind a record.
+
+    Every nonzero ``(device, inode)`` is a key, not only those with
+    ``nlinks > 1``: a symlinked file is recorded with its target's
+    inode, so it shares the key of the target's own record. Records
+    with no usable inode (``0`` / ``None``) get a unique key built
+    from ``fallback`` and are each counted on their own.
+    """
+    if not inode:
+        return (device, None, fallback)
+    return (device, inode)
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a ``datetime.isoformat()`` string written by ``export_to_sqlite``.
+
+    ``datetime.fromisoformat`` is 3.7+, so use ``strptime`` with and
+    without the fractional part (``isoformat`` omits it when zero).
+    """
+    if value is None:
+        return None
+    for fmt in ("%Y-%m-%dT%H:%M:%S.%f", "%Y-%m-%dT%H:%M:%S"):
+        try:
+            return datetime.strptime(value, fmt)
+        except ValueError:
+            continue
+    return None
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+# Columns added to ``files`` after the original 6-column schema. Used by
+# the idempotent ``PRAGMA table_info`` + ``ALTER TABLE`` migration.
+_NEW_FILE_COLUMNS = {
+    "on_disk": "INTEGER",
+    "blocks":  "INTEGER",
+    "nlinks":  "INTEGER",
+    "inode":   "INTEGER",
+    "device":  "INTEGER",
+    # Content hash filled in by ``specs.disk.dupes.DuplicateFinder``.
+    "digest":  "TEXT",
+}
+
+# Columns added to ``dirs`` after the original (path, mtime_ns) schema:
+# the parent pointer and the recursive rollups from ``dir_totals``.
+_NEW_DIR_COLUMNS = {
+    "parent":     "TEXT",
+    "size":       "INTEGER",
+    "on_disk":    "INTEGER",
+    "file_count": "INTEGER",
+}
+
+# ``FileIndexer(metadata=...)`` levels, cheapest first.
+METADATA_LEVELS = ("names", "size", "full")
+
+# Column order shared by every writer of the ``files`` table.
+_FILE_COLUMNS = (
+    "filepath", "filename", "extension", "size", "on_disk", "blocks",
+    "nlinks", "inode", "device", "last_modified", "indexed_at",
+)
+
+
+def _last_modified(info: dict) -> Optional[datetime]:
+    """Return a record's mtime as a ``datetime``, for either record layout.
+
+    ``fast_records`` records carry the raw ``mtime_ns`` instead of a
+    ``last_modified`` datetime; convert it only when it is needed.
+    """
+    if "mtime_ns" in info:
+        return _ns_to_datetime(info["mtime_ns"])
+    return info["last_modified"]
+
+
+def _file_row(info: dict) -> tuple:
+    """Flatten a record into a ``files`` row in ``_FILE_COLUMNS`` order."""
+    return (
+        info["filepath"],
+        info["filename"],
+        info["extension"],
+        info["size"],
+        info["on_disk"],
+        info["blocks"],
+        info["nlinks"],
+        info["inode"],
+        info["device"],
+        _isoformat(_last_modified(info)),
+        _isoformat(info["indexed_at"]),
+    )
+
+
+# Identity columns whose change invalidates a row's ``digest``.
+_DIGEST_KEYS = ("size", "last_modified", "device", "inode")
+
+# ``INSERT OR REPLACE`` would delete the old row and with it the
+# ``digest`` stored by ``DuplicateFinder.write_digests``; rows are
+# updated in place instead, keeping the digest while the identity holds.
+_UPSERT_FILES = (
+    f"INSERT INTO files ({', '.join(_FILE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_FILE_COLUMNS))}) "
+    "ON CONFLICT(filepath) DO UPDATE SET "
+    + ", ".join(f"{c} = excluded.{c}" for c in _FILE_COLUMNS[1:])
+    + ", digest = CASE WHEN "
+    + " AND ".join(f"files.{c} IS excluded.{c}" for c in _DIGEST_KEYS)
+    + " THEN files.digest END"
+)
+
+# SQLite < 3.24 has no UPSERT: update existing rows with numbered
+# parameters (``?1`` is the filepath), then insert the missing ones.
+_UPDATE_FILES = (
+    "UPDATE files SET "
+    + ", ".join(f"{c} = ?{i + 1}" for i, c in enumerate(_FILE_COLUMNS) if i)
+    + ", digest = CASE WHEN "
+    + " AND ".join(f"{c} IS ?{_FILE_COLUMNS.index(c) + 1}" for c in _DIGEST_KEYS)
+    + " THEN digest END WHERE filepath = ?1"
+)
+_INSERT_NEW_FILES = (
+    f"INSERT OR IGNORE INTO files ({', '.join(_FILE_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(_FILE_COLUMNS))})"
+)
+
+
+def _upsert_files(cursor: sqlite3.Cursor, rows: List[tuple]) -> None:
+    """Insert or update ``_file_row`` rows, keeping still-valid digests."""
+    if sqlite3.sqlite_version_info >= (3, 24, 0):
+        cursor.executemany(_UPSERT_FILES, rows)
+    else:
+        cursor.executemany(_UPDATE_FILES, rows)
+        cursor.executemany(_INSERT_NEW_FILES, rows)
+
+
+class _DirScan:
+    """Result of scanning one directory: file records, subdirs, errors.
+
+    ``mtime_ns`` is the directory's own mtime, taken *before* listing
+    it. A change after the listing moves the mtime only if the
+    filesystem clock has ticked since; ``iter_records`` therefore
+    drops mtimes that are racy (see ``RACY_MTIME_NS``) before they
+    reach ``dirs``. ``reused`` is set when the
+    listing came from the previous index instead of the disk.
+    ``elapsed_ns`` and ``stat_ns`` (per-file stat latencies) are only
+    measured when the indexer has an ``observer``. ``other_device`` marks
+    a mount point skipped by ``one_filesystem``.
+    """
+
+    __slots__ = (
+        "dirpath", "dirkey", "mtime_ns", "records", "subdirs", "errors",
+        "reused", "elapsed_ns", "stat_ns", "other_device",
+    )
+
+    def __init__(self, dirpath: str, normalize: bool = True):
+        self.dirpath = dirpath
+        self.dirkey = Path(dirpath).as_posix() if normalize else dirpath
+        self.mtime_ns: Optional[int] = None
+        self.records: List[dict] = []
+        self.subdirs: List[str] = []
+        self.errors: List[str] = []
+        self.reused = False
+        self.elapsed_ns = 0
+        self.stat_ns: List[int] = []
+        self.other_device = False
+
+
+class _PreviousIndex:
+    """Read-only view of an earlier export, grouped for directory reuse.
+
+    ``dirs`` maps directory key -> mtime_ns recorded by the last run
+    (``None`` if that directory was not fully read). ``files_by_dir``
+    and ``subdirs`` let ``_scan_dir`` rebuild an unchanged directory's
+    listing without touching the disk.
+    """
+
+    def __init__(self, files: Dict[str, dict], dirs: Dict[str, Optional[int]]):
+        self.files = files
+        self.dirs = dirs
+        self.files_by_dir: Dict[str, List[dict]] = defaultdict(list)
+        for path, info in files.items():
+            self.files_by_dir[_parent_key(path)].append(info)
+        self.subdirs: Dict[str, List[str]] = defaultdict(list)
+        for key in dirs:
+            parent = _parent_key(key)
+            if parent != key:
+                self.subdirs[parent].append(key)
+
+    @classmethod
+    def load(cls, db_path: str) -> "_PreviousIndex":
+        """Load the ``files`` and ``dirs`` tables; empty if the DB is new."""
+        files: Dict[str, dict] = {}
+        dirs: Dict[str, Optional[int]] = {}
+        if not os.path.exists(db_path):
+            return cls(files, dirs)
+        conn = sqlite3.connect(db_path)
+        try:
+            tables = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = 'table'"
+                )
+            }
+            if "files" in tables:
+                columns = {
+                    row[1] for row in conn.execute("PRAGMA table_info(files)")
+                }
+                select = ", ".join(
+                    c if c in columns else "NULL" for c in _FILE_COLUMNS
+                )
+                for row in conn.execute(f"SELECT {select} FROM files"):
+                    info = dict(zip(_FILE_COLUMNS, row))
+                    info["last_modified"] = _parse_timestamp(info["last_modified"])
+                    info["indexed_at"] = _parse_timestamp(info["indexed_at"])
+                    files[info["filepath"]] = info
+            if "dirs" in tables:
+                for path, mtime_ns in conn.execute("SELECT path, mtime_ns FROM dirs"):
+                    dirs[path] = mtime_ns
+        finally:
+            conn.close()
+        return cls(files, dirs)
+
+
 class FileIndexer:
     """Walk a directory tree, capture per-file metadata, expose stats."""
 
-    def __init__(self):
-        """Initialize the FileIndexer with in-memory storage and stats."""
-        self.files: Dict[str, dict] = {}
+    def __init__(
+        self,
+        compact: bool = False,
+        observer: Optional[WalkObserver] = None,
+        fast_records: bool = False,
+        metadata: str = "full",
+        one_filesystem: bool = False,
+        histograms: Optional[AgeHistograms] = None,
+        path_filter: Optional[PathFilter] = None,
+    ):
+        """Initialize the FileIndexer with in-memory storage and stats.
+
+        ``compact=True`` stores ``self.files`` in a column-oriented
+        ``CompactFileStore`` (interned directory prefixes, ``array``
+        integer columns, record dicts built on access) instead of a
+        dict of dicts. It behaves like the default mapping but uses a
+        fraction of the memory on multi-million-file trees.
+
+        ``observer`` receives progress and timing for every directory
+        the walk scans, plus the access errors that are otherwise
+        printed (see ``specs.disk.progress``).
+
+        ``fast_records=True`` skips the per-file allocations that rival
+        the ``stat`` itself on large walks: records carry the raw
+        ``mtime_ns`` integer instead of a ``last_modified`` datetime,
+        share one ``indexed_at`` taken when the walk starts, and on
+        POSIX keep the joined path as-is (the root is normalized once)
+        instead of going through ``Path.as_posix()``, so keys keep the
+        form of the joined path (``./a`` for a ``.`` root). Exports and the
+        compact store convert ``mtime_ns`` when they write it, so the
+        database is the same either way (mtimes are truncated to the
+        microsecond instead of rounded).
+
+        ``metadata`` picks how much each file costs to record:
+
+        * ``"full"`` (default) -- one ``stat`` per file, every field.
+        * ``"size"`` -- ``size``, ``on_disk`` and the mtime from the
+          ``DirEntry`` stat; ``blocks``, ``nlinks``, ``inode`` and
+          ``device`` are ``None``, so nothing is deduped by inode. On
+          Windows this comes with the directory listing at no extra
+          cost; on POSIX it is still one ``lstat`` per file.
+        * ``"names"`` -- no ``stat`` at all: file vs directory comes
+          from the ``DirEntry`` type bits (``d_type``), and only
+          ``filepath``, ``filename`` and ``extension`` are set. Meant
+          for inventories and extension histograms over slow network
+          shares. Symlinks still need a ``stat`` of their target to
+          tell files from directories.
+
+        Missing sizes count as 0 in ``get_statistics()`` and never
+        match ``search()`` size bounds.
+
+        ``one_filesystem=True`` does not descend into directories on a
+        different device than the root (like ``du -x``), so mounts
+        nested under the root are left to their own index run.
+
+        ``histograms`` (a ``specs.disk.ages.AgeHistograms``) is reset and
+        filled by every walk with file counts and bytes per mtime and
+        atime age bucket; records then also carry ``atime_ns``, and
+        exports write the counters to the ``histograms`` table.
+
+        ``path_filter`` (a ``specs.disk.filters.PathFilter``) prunes
+        excluded and too-deep directories before they are listed and
+        drops filtered files before their ``stat`` where the rule allows.
+        """
+        if metadata not in METADATA_LEVELS:
+            raise ValueError(
+                f"metadata must be one of {', '.join(METADATA_LEVELS)}, not {metadata!r}"
+            )
+        if path_filter is not None and path_filter.min_size is not None and metadata == "names":
+            raise ValueError('a min_size rule needs file sizes, not metadata="names"')
+        self.metadata = metadata
+        self.path_filter = path_filter
+        # Key of the current walk's root, for the filter's relative paths.
+        self._filter_root = "."
+        self.one_filesystem = one_filesystem or (
+            path_filter is not None and path_filter.one_filesystem
+        )
+        # Device of the current walk's root when ``one_filesystem`` is set.
+        self._root_device: Optional[int] = None
+        self.compact = compact
+        self.observer = observer
+        self.histograms = histograms
+        self.fast_records = fast_records
+        # Shared ``indexed_at`` of the current walk in fast_records mode.
+        self._indexed_at: Optional[datetime] = None
+        # Directories queued or being scanned, kept current by the walkers.
+        self._pending = 0
+        self.files: Dict[str, dict] = self._new_store()
+        # Directory key -> mtime_ns for every directory the last walk
+        # listed (None when it could not be read completely). Exported
+        # to the ``dirs`` table and used by ``index_incremental``.
+        self.dirs: Dict[str, Optional[int]] = {}
+        # Directory key -> [size, on_disk, file_count] of the whole
+        # subtree (du-style), inode-deduped within each subtree.
+        # Filled during the walk and rolled up by ``_finalize_stats``.
+        self.dir_totals: Dict[str, List[int]] = {}
+        # Row counts from the last ``index_incremental`` run.
+        self.changes: Dict[str, int] = {}
+        self._previous: Optional[_PreviousIndex] = None
+        self._search_index: Optional[SearchIndex] = None
         self._reset_stats()
 
+    @staticmethod
+    def open(db_path: str) -> SQLiteIndexReader:
+        """Open an exported index for ``search`` / ``get_statistics`` without a walk.
+
+        Returns a read-only ``SQLiteIndexReader`` over ``db_path``;
+        raises ``FileNotFoundError`` if the database does not exist.
+        """
+        return SQLiteIndexReader(db_path)
+
+    def _new_store(self) -> Dict[str, dict]:
+        # A fresh store invalidates any search index built over the old one.
+        self._search_index = None
+        return CompactFileStore() if self.compact else {}
+
     def _reset_stats(self) -> None:
         """Reset the per-run stats dict (called by index_directory)."""
         self.stats = {
@@ -71,7 +443,7 @@ class FileIndexer:
             "extensions": defaultdict(int),
         }
 
-    def index_directory(self, root_path: str) -> int:
+    def index_directory(self, root_path: str, workers: int = 1) -> int:
         """
         Recursively index all files from the given root directory.
 
@@ -82,86 +454,380 @@ class FileIndexer:
         legacy ``os.walk + os.stat`` pair); symlinks-to-directories
         are not followed, matching the old ``followlinks=False``.
 
+        ``workers > 1`` scans directories on a pool of threads pulling
+        from a shared work queue. ``scandir`` and ``stat`` release the
+        GIL, so this overlaps syscall latency on network mounts and
+        deep NVMe queues. Records are still merged on the calling
+        thread, so symlink / skip / error semantics and
+        ``get_statistics()`` are identical to the serial walk; only the
+        insertion order of ``self.files`` differs.
+
         Returns the number of file entries indexed (including
         hardlinked paths, so two hardlinks of one inode count as 2).
         """
-        self._reset_stats()
         # Clear per-file records from any previous run. Without this,
         # the second call's _finalize_stats() would aggregate both
         # runs' records and produce impossible counters
         # (unique_files > total_files, hardlink_extra_paths < 0).
-        self.files = {}
+        self.files = self._new_store()
 
-        stack: List[str] = [root_path]
-        while stack:
-            dirpath = stack.pop()
+        for record in self.iter_records(root_path, workers):
+            self._store_record(record)
+
+        self._finalize_stats()
+        return self.stats["total_files"]
+
+    def iter_records(self, root_path: str, workers: int = 1) -> Iterator[dict]:
+        """Walk ``root_path`` and yield one record per file as it is stat'd.
+
+        This is the producer behind ``index_directory`` and
+        ``stream_to_sqlite``. It resets and maintains the per-path
+        counters in ``self.stats`` (``total_files``, ``total_size``,
+        ``extensions``, ``skipped_paths``) and ``self.dirs``, but does
+        not keep the records: a caller that only forwards them uses
+        memory proportional to one directory, not the whole tree. The
+        inode-deduped counters need every record and are filled in by
+        the caller (``_finalize_stats`` / ``_finalize_stats_sql``).
+        """
+        self._reset_stats()
+        self.dirs = {}
+        self.dir_totals = {}
+        self._indexed_at = datetime.now()
+        racy_after = int(time.time() * 10 ** 9) - RACY_MTIME_NS
+        self._root_device = None
+        if self.one_filesystem:
             try:
-                with os.scandir(dirpath) as it:
-                    entries = list(it)
-            except (OSError, PermissionError) as e:
-                print(f"Error scanning {dirpath}: {e}")
-                self.stats["skipped_paths"] += 1
+                self._root_device = os.stat(root_path).st_dev
+            except OSError:
+                pass  # reported by the root's own scan
+        if self.fast_records and _POSIX_PATHS:
+            # Normalize once so every joined child path is already the
+            # posix key ``_record_file`` would otherwise build per file.
+            root_path = Path(root_path).as_posix()
+        self._filter_root = Path(root_path).as_posix()
+        histograms = self.histograms
+        if histograms is not None:
+            histograms.reset(self._filter_root)
+        observer = self.observer
+        if observer is not None:
+            observer.on_start(root_path)
+        for scan in self._walk(root_path, workers):
+            if scan.other_device:
                 continue
+            for message in scan.errors:
+                if observer is not None:
+                    observer.on_error(message)
+                else:
+                    print(message)
+                self.stats["skipped_paths"] += 1
+            # A directory with any read error, or with a racy mtime, is
+            # stored without an mtime so the next incremental run
+            # always rescans it.
+            mtime_ns = scan.mtime_ns
+            if scan.errors or (mtime_ns is not None and mtime_ns >= racy_after):
+                mtime_ns = None
+            self.dirs[scan.dirkey] = mtime_ns
+            if scan.reused:
+                self.changes["reused_dirs"] = self.changes.get("reused_dirs", 0) + 1
+            # Direct totals only; ``_rollup_dirs`` adds the subtrees.
+            totals = self.dir_totals[scan.dirkey] = [0, 0, 0]
+            for record in scan.records:
+                self._count_record(record)
+                totals[0] += record["size"] or 0
+                totals[1] += record["on_disk"] or 0
+                totals[2] += 1
+                if histograms is not None:
+                    histograms.add(record)
+                yield record
+            if observer is not None:
+                observer.on_dir(scan, self._pending)
+        if observer is not None:
+            observer.on_finish()
+
+    def _walk(self, root_path: str, workers: int = 1) -> Iterator["_DirScan"]:
+        """Yield one ``_DirScan`` per directory under ``root_path``.
 
-            for entry in entries:
-                child = os.path.join(dirpath, entry.name)
+        The serial path is the original depth-first stack; with
+        ``workers > 1`` the scans are produced by ``_walk_parallel``.
+        """
+        if workers > 1:
+            yield from self._walk_parallel(root_path, workers)
+            return
+        stack: List[str] = [root_path]
+        while stack:
+            scan = self._scan_dir(stack.pop())
+            stack.extend(scan.subdirs)
+            self._pending = len(stack)
+            yield scan
+
+    def _walk_parallel(self, root_path: str, workers: int) -> Iterator["_DirScan"]:
+        """Scan directories on ``workers`` threads, yield results in arrival order.
+
+        Workers pull directory paths from ``work`` and push both the
+        finished ``_DirScan`` (onto the bounded ``results`` queue) and
+        the discovered subdirectories (back onto ``work``). The consumer
+        tracks how many directories are queued or in flight; when that
+        reaches zero the tree is exhausted and the workers are told to
+        exit. If the consumer stops early (exception, closed
+        generator) the ``finally`` block drains ``results`` so no
+        worker stays blocked on a full queue.
+        """
+        work: "queue.Queue[Optional[str]]" = queue.Queue()
+        results: "queue.Queue[object]" = queue.Queue(maxsize=workers * 4)
+        stop = threading.Event()
+
+        def worker() -> None:
+            while True:
+                dirpath = work.get()
+                if dirpath is None:
+                    return
+                if stop.is_set():
+                    continue
                 try:
-                    is_link = entry.is_symlink()
-                    # Symlink-to-file: stat the target (matches the
-                    # legacy os.walk + os.stat pair, which placed
-                    # symlinks-to-files in ``filenames`` and stat'd
-                    # the target). Symlink-to-dir: do NOT descend
-                    # (matches followlinks=False). Plain files and
-                    # plain dirs use follow_symlinks=False.
-                    if is_link:
-                        if entry.is_file(follow_symlinks=True):
-                            self._record_file(child, entry, follow_symlinks=True)
-                        # symlink-to-dir is silently skipped
-                    elif entry.is_file(follow_symlinks=False):
-                        self._record_file(child, entry, follow_symlinks=False)
-                    elif entry.is_dir(follow_symlinks=False):
-                        stack.append(child)
+                    scan = self._scan_dir(dirpath)
+                except BaseException as e:  # surfaced on the consumer thread
+                    results.put(e)
+                    return
+                # Publish the parent before queueing its children: the
+                # results queue is FIFO, so the consumer always counts a
+                # directory's subdirs before any of their scans arrive
+                # and ``outstanding`` cannot reach zero early.
+                results.put(scan)
+                for sub in scan.subdirs:
+                    work.put(sub)
+
+        threads = [
+            threading.Thread(target=worker, name=f"indexer-{i}", daemon=True)
+            for i in range(workers)
+        ]
+        for t in threads:
+            t.start()
+        work.put(root_path)
+        outstanding = 1
+        try:
+            while outstanding:
+                item = results.get()
+                if isinstance(item, BaseException):
+                    raise item
+                outstanding += len(item.subdirs) - 1
+                self._pending = outstanding
+                yield item
+        finally:
+            stop.set()
+            for _ in threads:
+                work.put(None)
+            for t in threads:
+                while t.is_alive():
+                    try:
+                        results.get(timeout=0.05)
+                    except queue.Empty:
+                        pass
+                t.join()
+
+    def _scan_dir(self, dirpath: str) -> "_DirScan":
+        """List one directory and stat its files.
+
+        Runs on worker threads in parallel mode, so it must not touch
+        ``self.files`` or ``self.stats``; everything it learns goes
+        into the returned ``_DirScan``. With an ``observer`` the scan
+        and each file's stat are timed.
+        """
+        if self.observer is None:
+            return self._list_dir(dirpath, timed=False)
+        started = _perf_ns()
+        scan = self._list_dir(dirpath, timed=True)
+        scan.elapsed_ns = _perf_ns() - started
+        return scan
+
+    def _list_dir(self, dirpath: str, timed: bool) -> "_DirScan":
+        """Body of ``_scan_dir``; ``timed`` fills ``scan.stat_ns``."""
+        scan = _DirScan(dirpath, normalize=not (self.fast_records and _POSIX_PATHS))
+        try:
+            st = os.stat(dirpath)
+            if self._root_device is not None and st.st_dev != self._root_device:
+                scan.other_device = True
+                return scan
+            scan.mtime_ns = st.st_mtime_ns
+            previous = self._previous
+            if (
+                previous is not None
+                and previous.dirs.get(scan.dirkey) == scan.mtime_ns
+            ):
+                # Unchanged since the last run: no entries were added,
+                # removed or renamed here, so reuse the stored listing.
+                # Subdirectories are still visited, because a change
+                # deeper down does not touch this directory's mtime.
+                scan.records = previous.files_by_dir.get(scan.dirkey, [])
+                scan.subdirs = previous.subdirs.get(scan.dirkey, [])
+                scan.reused = True
+                return scan
+            with os.scandir(dirpath) as it:
+                entries = list(it)
+        except (OSError, PermissionError) as e:
+            scan.errors.append(f"Error scanning {dirpath}: {e}")
+            return scan
+
+        path_filter = self.path_filter
+        if path_filter is not None:
+            dir_rel = relative_path(self._filter_root, scan.dirkey)
+            depth = dir_rel.count("/") + 2 if dir_rel else 1
+        # ``os.path.join(".", name)`` is ``./name``, which the normalized
+        # keys of a ``.`` root spell ``name``; ``fast_records`` keys are
+        # the joined paths themselves, so drop the prefix up front.
+        prefix = "" if dirpath == "." else os.path.join(dirpath, "")
+        for entry in entries:
+            child = prefix + entry.name
+            if path_filter is not None:
+                rel = f"{dir_rel}/{entry.name}" if dir_rel else entry.name
+            try:
+                is_link = entry.is_symlink()
+                # Symlink-to-file: stat the target (matches the
+                # legacy os.walk + os.stat pair, which placed
+                # symlinks-to-files in ``filenames`` and stat'd
+                # the target). Symlink-to-dir: do NOT descend
+                # (matches followlinks=False). Plain files and
+                # plain dirs use follow_symlinks=False.
+                if is_link:
+                    if not entry.is_file(follow_symlinks=True):
+                        continue  # symlink-to-dir is silently skipped
+                    follow = True
+                elif entry.is_file(follow_symlinks=False):
+                    follow = False
+                elif entry.is_dir(follow_symlinks=False):
+                    if path_filter is None or not path_filter.prune_dir(rel, entry.name, depth):
+                        scan.subdirs.append(child)
+                    continue
+                else:
                     # Other entry types (sockets, FIFOs, etc.) are
                     # silently skipped.
-                except (OSError, PermissionError) as e:
-                    print(f"Error accessing {child}: {e}")
-                    self.stats["skipped_paths"] += 1
-
-        self._finalize_stats()
-        return self.stats["total_files"]
+                    continue
+                if path_filter is not None and path_filter.skip_file(rel, entry.name):
+                    continue
+                if timed:
+                    started = _perf_ns()
+                    record = self._record_file(child, entry, follow_symlinks=follow)
+                    scan.stat_ns.append(_perf_ns() - started)
+                else:
+                    record = self._record_file(child, entry, follow_symlinks=follow)
+                if path_filter is not None and path_filter.skip_size(record["size"]):
+                    continue
+                scan.records.append(record)
+            except (OSError, PermissionError) as e:
+                scan.errors.append(f"Error accessing {child}: {e}")
+        return scan
 
     def _record_file(
         self,
         filepath: str,
         entry: "os.DirEntry",
         follow_symlinks: bool = False,
-    ) -> None:
-        """Stat a single file entry and append to ``self.files`` + ``self.stats``.
+    ) -> dict:
+        """Stat a single file entry and build its ``self.files`` record.
 
         ``follow_symlinks`` is forwarded to ``entry.stat()``; pass
         ``True`` for symlink-to-file entries so the target's stats
         are recorded under the symlink's path.
         """
+        if self.metadata != "full":
+            return self._partial_record(filepath, entry, follow_symlinks)
         st = entry.stat(follow_symlinks=follow_symlinks)
         _, ext = os.path.splitext(entry.name)
         ext = ext.lower()
-        posix_path = Path(filepath).as_posix()
-        self.files[posix_path] = {
-            "filepath": posix_path,
+        if self.fast_records:
+            record = {
+                "filepath": filepath if _POSIX_PATHS else Path(filepath).as_posix(),
+                "filename": entry.name,
+                "extension": ext,
+                "size": st.st_size,
+                "on_disk": _on_disk_bytes(st),
+                "blocks": st.st_blocks,
+                "nlinks": st.st_nlink,
+                "inode": st.st_ino,
+                "device": st.st_dev,
+                "mtime_ns": st.st_mtime_ns,
+                "indexed_at": self._indexed_at,
+            }
+        else:
+            record = {
+                "filepath": Path(filepath).as_posix(),
+                "filename": entry.name,
+                "extension": ext,
+                "size": st.st_size,
+                "on_disk": _on_disk_bytes(st),
+                "blocks": st.st_blocks,
+                "nlinks": st.st_nlink,
+                "inode": st.st_ino,
+                "device": st.st_dev,
+                "last_modified": datetime.fromtimestamp(st.st_mtime),
+                "indexed_at": datetime.now(),
+            }
+        if self.histograms is not None:
+            record["atime_ns"] = st.st_atime_ns
+        return record
+
+    def _filtered_out(self, path: str, is_dir: bool, size: Optional[int] = None) -> bool:
+        """Apply ``path_filter`` to one path outside a directory listing (used by the watcher)."""
+        path_filter = self.path_filter
+        if path_filter is None:
+            return False
+        rel = relative_path(self._filter_root, path)
+        if not rel:
+            return False
+        name = rel.rpartition("/")[2]
+        if is_dir:
+            return path_filter.prune_dir(rel, name, rel.count("/") + 1)
+        return path_filter.skip_file(rel, name) or path_filter.skip_size(size)
+
+    def _partial_record(
+        self, filepath: str, entry: "os.DirEntry", follow_symlinks: bool
+    ) -> dict:
+        """Build a record for the ``"size"`` / ``"names"`` metadata levels."""
+        st = None
+        if self.metadata == "size":
+            st = entry.stat(follow_symlinks=follow_symlinks)
+        _, ext = os.path.splitext(entry.name)
+        fast_path = self.fast_records and _POSIX_PATHS
+        record = {
+            "filepath": filepath if fast_path else Path(filepath).as_posix(),
             "filename": entry.name,
-            "extension": ext,
-            "size": st.st_size,
-            "on_disk": _on_disk_bytes(st),
-            "blocks": st.st_blocks,
-            "nlinks": st.st_nlink,
-            "inode": st.st_ino,
-            "device": st.st_dev,
-            "last_modified": datetime.fromtimestamp(st.st_mtime),
-            "indexed_at": datetime.now(),
+            "extension": ext.lower(),
+            "size": st.st_size if st is not None else None,
+            "on_disk": _on_disk_bytes(st) if st is not None else None,
+            "blocks": None,
+            "nlinks": None,
+            "inode": None,
+            "device": None,
         }
+        if self.fast_records:
+            record["mtime_ns"] = st.st_mtime_ns if st is not None else None
+            record["indexed_at"] = self._indexed_at
+        else:
+            record["last_modified"] = (
+                datetime.fromtimestamp(st.st_mtime) if st is not None else None
+            )
+            record["indexed_at"] = datetime.now()
+        if st is not None and self.histograms is not None:
+            record["atime_ns"] = st.st_atime_ns
+        return record
+
+    def _store_record(self, record: dict) -> None:
+        """Keep a record built by ``_record_file`` in ``self.files``."""
+        if self.compact:
+            self.files.add(record)
+        else:
+            self.files[record["filepath"]] = record
+
+    def _count_record(self, record: dict) -> None:
+        """Bump the per-path counters for one record."""
         self.stats["total_files"] += 1
-        self.stats["total_size"] += st.st_size
-        self.stats["extensions"][ext] += 1
+        self.stats["total_size"] += record["size"] or 0
+        self.stats["extensions"][record["extension"]] += 1
+
+    def _iter_fields(self, *names: str) -> Iterator[tuple]:
+        """Yield ``(info[name], ...)`` per record without building dicts in compact mode."""
+        if self.compact:
+            return self.files.iter_columns(*names)
+        return (tuple(info[n] for n in names) for info in self.files.values())
 
     def _finalize_stats(self) -> None:
         """Compute the inode-deduped sums and hardlink counts.
@@ -173,18 +839,15 @@ class FileIndexer:
         path is counted individually in that case; this is documented
         in the module docstring.
         """
-        seen: Dict[Tuple[int, int], Tuple[int, int]] = {}
-        for info in self.files.values():
-            ino = info["inode"]
-            dev = info["device"]
-            if ino == 0:
-                # Indistinguishable inodes — count this path on its own
-                # so the total is still an upper bound.
-                seen[(dev, id(info))] = (info["on_disk"], info["size"])
+        seen: Dict[tuple, Tuple[int, int]] = {}
+        repeated = set()
+        fields = self._iter_fields("device", "inode", "on_disk", "size")
+        for i, (dev, ino, on_disk, size) in enumerate(fields):
+            key = _inode_key(dev, ino, i)
+            if key not in seen:
+                seen[key] = (on_disk or 0, size or 0)
             else:
-                key = (dev, ino)
-                if key not in seen:
-                    seen[key] = (info["on_disk"], info["size"])
+                repeated.add(key)
         self.stats["unique_files"] = len(seen)
         self.stats["on_disk_size"] = sum(o for o, _ in seen.values())
         self.stats["logical_size"] = sum(s for _, s in seen.values())
@@ -192,6 +855,50 @@ class FileIndexer:
             self.stats["total_files"] - self.stats["unique_files"]
         )
 
+        # Second pass only over hardlinked inodes, for the rollups.
+        links: Dict[tuple, list] = {}
+        if repeated:
+            fields = self._iter_fields("device", "inode", "filepath")
+            for dev, ino, path in fields:
+                if (dev, ino) in repeated:
+                    links.setdefault((dev, ino), []).append(path)
+        self._rollup_dirs(
+            (seen[key][1], seen[key][0], paths) for key, paths in links.items()
+        )
+
+    def _rollup_dirs(self, hardlinks: Iterable[Tuple[int, int, List[str]]]) -> None:
+        """Turn the direct per-directory totals into subtree totals.
+
+        Directories are folded into their parent longest key first, so
+        every child is complete before it is added. That counts an
+        inode once per path; ``hardlinks`` yields ``(size, on_disk,
+        paths)`` for each inode with several paths, and each ancestor
+        holding ``n > 1`` of them gives back ``n - 1`` copies, which
+        matches the volume-wide dedup in ``get_statistics()``.
+        """
+        totals = self.dir_totals
+        for key in sorted(totals, key=len, reverse=True):
+            parent = _parent_key(key)
+            if parent != key and parent in totals:
+                child, up = totals[key], totals[parent]
+                up[0] += child[0]
+                up[1] += child[1]
+                up[2] += child[2]
+        for size, on_disk, paths in hardlinks:
+            counts: Dict[str, int] = defaultdict(int)
+            for path in paths:
+                key = _parent_key(path)
+                while key in totals:
+                    counts[key] += 1
+                    parent = _parent_key(key)
+                    if parent == key:
+                        break
+                    key = parent
+            for key, n in counts.items():
+                if n > 1:
+                    totals[key][0] -= (n - 1) * size
+                    totals[key][1] -= (n - 1) * on_disk
+
     def search(
         self,
         pattern: str,
@@ -203,16 +910,22 @@ class FileIndexer:
         """
         Search for files matching the given criteria.
         Returns list of tuples containing (filepath, filename, size).
+
+        After ``build_search_index()`` the query is answered from the
+        prebuilt extension / size / trigram indexes; otherwise every
+        record is scanned. Both paths return the same list.
         """
+        if self._search_index is not None:
+            return self._search_index.search(
+                pattern, exact_match, extensions, min_size, max_size
+            )
+
         results = []
 
-        # Compile regex pattern if not exact match
+        # Compile regex pattern if not exact match (falls back to a
+        # literal match for invalid regexes; compiled patterns are cached)
         if not exact_match:
-            try:
-                regex = re.compile(pattern, re.IGNORECASE)
-            except re.error:
-                # If pattern is not a valid regex, treat it as literal
-                regex = re.compile(re.escape(pattern), re.IGNORECASE)
+            regex = compile_pattern(pattern)
 
         # Normalize extensions list
         if extensions:
@@ -233,11 +946,14 @@ class FileIndexer:
             if extensions and file_info["extension"] not in extensions:
                 continue
 
-            # Check size constraints
-            if min_size is not None and file_info["size"] < min_size:
-                continue
-            if max_size is not None and file_info["size"] > max_size:
-                continue
+            # Check size constraints (unknown sizes never match)
+            if min_size is not None or max_size is not None:
+                if file_info["size"] is None:
+                    continue
+                if min_size is not None and file_info["size"] < min_size:
+                    continue
+                if max_size is not None and file_info["size"] > max_size:
+                    continue
 
             results.append(
                 (
@@ -249,6 +965,19 @@ class FileIndexer:
 
         return sorted(results, key=lambda x: x[1])  # Sort by filename
 
+    def build_search_index(self) -> SearchIndex:
+        """Build the indexes ``search()`` uses instead of a linear scan.
+
+        One pass over ``self.files``; worth it as soon as more than a
+        handful of queries are run against the same index. The index
+        is dropped whenever ``self.files`` is replaced by a new walk;
+        call this again afterwards.
+        """
+        self._search_index = SearchIndex(
+            self._iter_fields("filepath", "filename", "extension", "size")
+        )
+        return self._search_index
+
     def get_statistics(self) -> dict:
         """Return statistics about the indexed files.
 
@@ -271,8 +1000,10 @@ class FileIndexer:
             unique_extensions   -- distinct file extensions seen.
             top_extensions      -- top 5 extensions by file count.
         """
+        # Ties are broken by extension name so the result does not
+        # depend on walk order (serial vs. parallel walkers).
         top_extensions = sorted(
-            self.stats["extensions"].items(), key=lambda x: x[1], reverse=True
+            self.stats["extensions"].items(), key=lambda x: (-x[1], x[0])
         )[:5]
 
         return {
@@ -287,133 +1018,239 @@ class FileIndexer:
             "top_extensions": top_extensions,
         }
 
-    def export_to_sqlite(self, db_path: str) -> Tuple[bool, Optional[str]]:
+    def index_incremental(
+        self, root_path: str, db_path: str, workers: int = 1
+    ) -> Tuple[bool, Optional[str]]:
+        """Re-index ``root_path`` against the index already in ``db_path``.
+
+        Loads the previous ``files`` and ``dirs`` tables, then walks
+        the tree. A directory whose mtime matches the stored one has
+        had no entries added, removed or renamed, so its file records
+        are reused instead of listed and stat'd again; only its
+        subdirectories are visited. The database is then brought in
+        line with only the rows that differ (INSERT for new paths,
+        UPDATE for changed metadata, DELETE for vanished paths), and
+        the counts are left in ``self.changes``.
+
+        Directories whose mtime was within ``RACY_MTIME_NS`` of the
+        previous walk's start are always rescanned, since an entry
+        added in the same filesystem tick would not have moved it.
+        Directory mtimes do not move when a file is rewritten in
+        place, so such edits inside an otherwise unchanged directory
+        are picked up by the next full ``index_directory`` run, not by
+        this one. A missing or empty database degrades to a full walk
+        where every path counts as added.
+
+        Returns ``(success, error_message)`` like ``export_to_sqlite``.
         """
-        Export the indexed files to a SQLite database.
-        Returns a tuple of (success: bool, error_message: Optional[str])
+        try:
+            previous = _PreviousIndex.load(db_path)
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+
+        self.changes = {}
+        self._previous = previous
+        try:
+            self.index_directory(root_path, workers)
+        finally:
+            self._previous = None
+
+        added = [info for path, info in self.files.items() if path not in previous.files]
+        changed = []
+        for path, info in self.files.items():
+            old = previous.files.get(path)
+            if old is None or old is info:
+                continue
+            # Compare everything except indexed_at.
+            if _file_row(info)[:-1] != _file_row(old)[:-1]:
+                changed.append(info)
+        removed = [path for path in previous.files if path not in self.files]
+        self.changes.update(
+            added=len(added), changed=len(changed), removed=len(removed)
+        )
+        self.changes.setdefault("reused_dirs", 0)
+
+        try:
+            conn = sqlite3.connect(db_path)
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+
+        try:
+            cursor = conn.cursor()
+            self._ensure_schema(cursor)
+            cursor.executemany(
+                "DELETE FROM files WHERE filepath = ?",
+                [(path,) for path in removed],
+            )
+            _upsert_files(cursor, [_file_row(info) for info in added])
+            # A changed row may have new content: drop its stale digest.
+            cursor.executemany(
+                "UPDATE files SET "
+                + ", ".join(f"{c} = ?" for c in _FILE_COLUMNS[1:])
+                + ", digest = NULL WHERE filepath = ?",
+                [_file_row(info)[1:] + (info["filepath"],) for info in changed],
+            )
+            self._write_dirs(cursor)
+            self._write_statistics(cursor)
+            conn.commit()
+            return True, None
+
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+        except Exception as e:
+            return False, f"Unexpected error: {str(e)}"
+        finally:
+            conn.close()
+
+    def stream_to_sqlite(
+        self,
+        root_path: str,
+        db_path: str,
+        batch_size: int = 10000,
+        workers: int = 1,
+    ) -> Tuple[bool, Optional[str]]:
+        """Walk ``root_path`` and write rows to ``db_path`` while walking.
+
+        Records from ``iter_records`` are upserted in batches of ``batch_size``, each committed in its
+        own WAL-mode transaction, and are never collected in
+        ``self.files``. Peak memory is one batch plus one directory
+        listing, independent of the tree size.
+
+        Rows are stamped with this run's ``indexed_at``; once the walk
+        completes, rows older than the run (paths that no longer exist)
+        are deleted and the deduplicated totals are computed in SQL
+        (``GROUP BY device, inode``) before the ``dirs`` and
+        ``statistics`` tables are written. If the process dies
+        midway, every committed batch is kept and the database stays a
+        usable, partially refreshed index of the previous run plus the
+        part of the tree walked so far.
+
+        ``self.files`` is left empty; ``get_statistics()`` reflects the
+        walk. Returns ``(success, error_message)`` like
+        ``export_to_sqlite``.
         """
         try:
             conn = sqlite3.connect(db_path)
         except sqlite3.Error as e:
             return False, f"SQLite error: {str(e)}"
 
+        self.files = self._new_store()
         try:
             cursor = conn.cursor()
+            cursor.execute("PRAGMA journal_mode=WAL")
+            cursor.execute("PRAGMA synchronous=NORMAL")
+            self._ensure_schema(cursor)
+            conn.commit()
+
+            run_started = datetime.now().isoformat()
+            batch: List[tuple] = []
+            for record in self.iter_records(root_path, workers):
+                batch.append(_file_row(record))
+                if len(batch) >= batch_size:
+                    _upsert_files(cursor, batch)
+                    conn.commit()
+                    batch = []
+            if batch:
+                _upsert_files(cursor, batch)
 
-            # Create the files table with the new stat columns. Note:
-            # the indexes are created *after* the migration block
-            # below, because the index on (device, inode) would fail
-            # on a pre-0.4.1 table that does not yet have those
-            # columns.
             cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS files (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    filepath TEXT NOT NULL UNIQUE,
-                    filename TEXT NOT NULL,
-                    extension TEXT,
-                    size INTEGER,
-                    on_disk INTEGER,
-                    blocks INTEGER,
-                    nlinks INTEGER,
-                    inode INTEGER,
-                    device INTEGER,
-                    last_modified TIMESTAMP,
-                    indexed_at TIMESTAMP
-                )
-            """
+                "DELETE FROM files WHERE indexed_at IS NULL OR indexed_at < ?",
+                (run_started,),
             )
+            self._finalize_stats_sql(cursor)
+            self._write_dirs(cursor)
+            self._write_statistics(cursor)
+            conn.commit()
+            # Leave a plain rollback-journal database behind so readers
+            # (including read-only ones) need no -wal / -shm files.
+            cursor.execute("PRAGMA journal_mode=DELETE")
+            return True, None
 
-            # Idempotent migration: if this is an older DB (pre-0.4.1),
-            # ``CREATE TABLE IF NOT EXISTS`` above is a no-op and the
-            # table still has only the original 6 columns. The subsequent
-            # ``INSERT OR REPLACE`` would fail with
-            # ``SQLite error: no such column: device``. Add any missing
-            # columns via ``PRAGMA table_info`` + ``ALTER TABLE``.
-            _NEW_FILE_COLUMNS = {
-                "on_disk": "INTEGER",
-                "blocks":  "INTEGER",
-                "nlinks":  "INTEGER",
-                "inode":   "INTEGER",
-                "device":  "INTEGER",
-            }
-            existing = {
-                row[1]
-                for row in cursor.execute("PRAGMA table_info(files)").fetchall()
-            }
-            for name, decl in _NEW_FILE_COLUMNS.items():
-                if name not in existing:
-                    cursor.execute(
-                        f"ALTER TABLE files ADD COLUMN {name} {decl}"
-                    )
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+        except Exception as e:
+            return False, f"Unexpected error: {str(e)}"
+        finally:
+            conn.close()
 
-            # Indexes can be created only after the columns exist.
-            cursor.execute(
-                "CREATE INDEX IF NOT EXISTS idx_files_inode "
-                "ON files(device, inode)"
-            )
-            cursor.execute(
-                "CREATE INDEX IF NOT EXISTS idx_files_ext "
-                "ON files(extension)"
-            )
+    def _finalize_stats_sql(self, cursor: sqlite3.Cursor) -> None:
+        """SQL counterpart of ``_finalize_stats`` over the ``files`` table.
 
-            # Create the statistics table
-            cursor.execute(
-                """
-                CREATE TABLE IF NOT EXISTS statistics (
-                    key TEXT PRIMARY KEY,
-                    value TEXT
-                )
+        Same rules: one row per ``(device, inode)``, and rows with
+        ``inode == 0`` each count on their own. Also completes the
+        directory rollups, looking up hardlinked inodes in SQL.
+        """
+        unique, on_disk, logical = cursor.execute(
             """
+            SELECT COUNT(*), COALESCE(SUM(on_disk), 0), COALESCE(SUM(size), 0)
+            FROM (
+                SELECT MAX(on_disk) AS on_disk, MAX(size) AS size
+                FROM files
+                GROUP BY device,
+                         CASE WHEN inode IS NULL OR inode = 0 THEN -id ELSE inode END
             )
+        """
+        ).fetchone()
+        self.stats["unique_files"] = unique
+        self.stats["on_disk_size"] = on_disk
+        self.stats["logical_size"] = logical
+        self.stats["hardlink_extra_paths"] = (
+            self.stats["total_files"] - self.stats["unique_files"]
+        )
 
-            # Insert or update file records
-            cursor.executemany(
-                """
-                INSERT OR REPLACE INTO files
-                (filepath, filename, extension, size, on_disk, blocks,
-                 nlinks, inode, device, last_modified, indexed_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """,
-                [
-                    (
-                        info["filepath"],
-                        info["filename"],
-                        info["extension"],
-                        info["size"],
-                        info["on_disk"],
-                        info["blocks"],
-                        info["nlinks"],
-                        info["inode"],
-                        info["device"],
-                        info["last_modified"].isoformat(),
-                        info["indexed_at"].isoformat(),
-                    )
-                    for info in self.files.values()
-                ],
+        links: Dict[tuple, list] = {}
+        for dev, ino, size, on_disk, path in cursor.execute(
+            """
+            SELECT device, inode, size, on_disk, filepath FROM files
+            WHERE inode != 0 AND (device, inode) IN (
+                SELECT device, inode FROM files
+                GROUP BY device, inode HAVING COUNT(*) > 1
             )
+        """
+        ):
+            links.setdefault((dev, ino), [size, on_disk, []])[2].append(path)
+        self._rollup_dirs(tuple(link) for link in links.values())
 
-            # Insert statistics
-            stats = self.get_statistics()
-            cursor.executemany(
-                """
-                INSERT OR REPLACE INTO statistics (key, value)
-                VALUES (?, ?)
-            """,
-                [
-                    ("total_files", str(stats["total_files"])),
-                    ("unique_files", str(stats["unique_files"])),
-                    ("total_size", str(stats["total_size"])),
-                    ("logical_size", str(stats["logical_size"])),
-                    ("on_disk_size", str(stats["on_disk_size"])),
-                    ("hardlink_extra_paths", str(stats["hardlink_extra_paths"])),
-                    ("skipped_paths", str(stats["skipped_paths"])),
-                    ("unique_extensions", str(stats["unique_extensions"])),
-                    ("top_extensions", repr(stats["top_extensions"])),
-                ],
-            )
+    def export_to_sqlite(
+        self, db_path: str, bulk: bool = False, chunk_size: int = 50000
+    ) -> Tuple[bool, Optional[str]]:
+        """
+        Export the indexed files to a SQLite database.
+        Returns a tuple of (success: bool, error_message: Optional[str])
+
+        ``bulk=True`` tunes the connection for a large load: no rollback
+        journal (WAL when the table already holds rows), ``synchronous``
+        off, a 256 MiB page cache, rows inserted in chunks of
+        ``chunk_size``, ``idx_files_inode`` /
+        ``idx_files_ext`` dropped during the load and rebuilt after it,
+        and a final ``ANALYZE``. A crash midway can leave a fresh
+        database unusable, so re-run the export in that case.
+        """
+        try:
+            conn = sqlite3.connect(db_path)
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+
+        try:
+            cursor = conn.cursor()
+            self._ensure_schema(cursor)
+
+            if not bulk:
+                # Insert or update file records
+                _upsert_files(cursor, [_file_row(info) for info in self.files.values()])
+            else:
+                self._bulk_load(conn, cursor, chunk_size)
+
+            self._write_dirs(cursor)
+            self._write_statistics(cursor)
 
             conn.commit()
+            if bulk:
+                # Sample each index instead of reading all of it (ignored
+                # by SQLite < 3.32, which then analyzes everything).
+                cursor.execute("PRAGMA analysis_limit=1000")
+                cursor.execute("ANALYZE")
+                cursor.execute("PRAGMA journal_mode=DELETE")
             return True, None
 
         except sqlite3.Error as e:
@@ -422,3 +1259,222 @@ class FileIndexer:
             return False, f"Unexpected error: {str(e)}"
         finally:
             conn.close()
+
+    def _bulk_load(
+        self, conn: sqlite3.Connection, cursor: sqlite3.Cursor, chunk_size: int
+    ) -> None:
+        """Body of ``export_to_sqlite(bulk=True)`` up to the ``dirs`` table."""
+        empty = cursor.execute("SELECT 1 FROM files LIMIT 1").fetchone() is None
+        conn.commit()
+        cursor.execute(f"PRAGMA journal_mode={'OFF' if empty else 'WAL'}")
+        cursor.execute("PRAGMA synchronous=OFF")
+        cursor.execute("PRAGMA cache_size=-262144")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("DROP INDEX IF EXISTS idx_files_inode")
+        cursor.execute("DROP INDEX IF EXISTS idx_files_ext")
+        batch: List[tuple] = []
+        for info in self.files.values():
+            batch.append(_file_row(info))
+            if len(batch) >= chunk_size:
+                _upsert_files(cursor, batch)
+                batch = []
+        _upsert_files(cursor, batch)
+        self._ensure_schema(cursor)  # recreates the dropped indexes
+
+    @staticmethod
+    def _ensure_schema(cursor: sqlite3.Cursor) -> None:
+        """Create or migrate the ``files``, ``dirs``, ``statistics``, ``histograms`` and ``hash_cache`` tables."""
+        # Create the files table with the new stat columns. Note:
+        # the indexes are created *after* the migration block
+        # below, because the index on (device, inode) would fail
+        # on a pre-0.4.1 table that does not yet have those
+        # columns.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS files (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                filepath TEXT NOT NULL UNIQUE,
+                filename TEXT NOT NULL,
+                extension TEXT,
+                size INTEGER,
+                on_disk INTEGER,
+                blocks INTEGER,
+                nlinks INTEGER,
+                inode INTEGER,
+                device INTEGER,
+                last_modified TIMESTAMP,
+                indexed_at TIMESTAMP
+            )
+        """
+        )
+
+        # Idempotent migration: if this is an older DB (pre-0.4.1),
+        # ``CREATE TABLE IF NOT EXISTS`` above is a no-op and the
+        # table still has only the original 6 columns. The subsequent
+        # ``_upsert_files`` would fail with
+        # ``SQLite error: no such column: device``. Add any missing
+        # columns via ``PRAGMA table_info`` + ``ALTER TABLE``.
+        existing = {
+            row[1]
+            for row in cursor.execute("PRAGMA table_info(files)").fetchall()
+        }
+        for name, decl in _NEW_FILE_COLUMNS.items():
+            if name not in existing:
+                cursor.execute(
+                    f"ALTER TABLE files ADD COLUMN {name} {decl}"
+                )
+
+        # Indexes can be created only after the columns exist.
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_files_inode "
+            "ON files(device, inode)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_files_ext "
+            "ON files(extension)"
+        )
+
+        # Directory mtimes from the last walk, used by
+        # ``index_incremental`` to skip unchanged directories, plus
+        # the du-style subtree rollups and a parent pointer.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS dirs (
+                path TEXT PRIMARY KEY,
+                mtime_ns INTEGER,
+                parent TEXT,
+                size INTEGER,
+                on_disk INTEGER,
+                file_count INTEGER
+            )
+        """
+        )
+        existing = {
+            row[1]
+            for row in cursor.execute("PRAGMA table_info(dirs)").fetchall()
+        }
+        for name, decl in _NEW_DIR_COLUMNS.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE dirs ADD COLUMN {name} {decl}")
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_dirs_parent ON dirs(parent)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_dirs_on_disk ON dirs(on_disk)"
+        )
+
+        # Create the statistics table
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS statistics (
+                key TEXT PRIMARY KEY,
+                value TEXT
+            )
+        """
+        )
+
+        # Age histograms from ``specs.disk.ages.AgeHistograms``: one row
+        # per non-empty (clock, dimension, key, bucket).
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS histograms (
+                clock TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                key TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                max_age_days REAL,
+                files INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                on_disk INTEGER NOT NULL,
+                PRIMARY KEY (clock, dimension, key, bucket)
+            ) WITHOUT ROWID
+        """
+        )
+
+        # Content digests keyed by file identity, used by
+        # ``specs.disk.hashcache.HashCache``. Entries follow the files
+        # table: removing the last path of an inode, or changing a
+        # row's size / mtime / inode, evicts the old inode's digests.
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hash_cache (
+                device INTEGER NOT NULL,
+                inode INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                digest TEXT NOT NULL,
+                PRIMARY KEY (device, inode, size, mtime_ns, kind)
+            ) WITHOUT ROWID
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS files_hash_cache_delete
+            AFTER DELETE ON files
+            WHEN NOT EXISTS (
+                SELECT 1 FROM files
+                WHERE device = OLD.device AND inode = OLD.inode
+            )
+            BEGIN
+                DELETE FROM hash_cache
+                WHERE device = OLD.device AND inode = OLD.inode;
+            END
+        """
+        )
+        cursor.execute(
+            """
+            CREATE TRIGGER IF NOT EXISTS files_hash_cache_update
+            AFTER UPDATE OF size, last_modified, device, inode ON files
+            WHEN OLD.size IS NOT NEW.size
+              OR OLD.last_modified IS NOT NEW.last_modified
+              OR OLD.device IS NOT NEW.device
+              OR OLD.inode IS NOT NEW.inode
+            BEGIN
+                DELETE FROM hash_cache
+                WHERE device = OLD.device AND inode = OLD.inode;
+            END
+        """
+        )
+
+    def _write_dirs(self, cursor: sqlite3.Cursor) -> None:
+        """Replace the ``dirs`` table with the directories of the last walk."""
+        cursor.execute("DELETE FROM dirs")
+        rows = []
+        for path, mtime_ns in self.dirs.items():
+            parent = _parent_key(path)
+            if parent == path or parent not in self.dirs:
+                parent = None
+            size, on_disk, file_count = self.dir_totals.get(path, (0, 0, 0))
+            rows.append((path, mtime_ns, parent, size, on_disk, file_count))
+        cursor.executemany(
+            "INSERT INTO dirs (path, mtime_ns, parent, size, on_disk, file_count) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            rows,
+        )
+
+    def _write_statistics(self, cursor: sqlite3.Cursor) -> None:
+        """Insert or update the ``statistics`` rows from ``get_statistics()``.
+
+        With ``histograms`` set, the ``histograms`` table is replaced too.
+        """
+        if self.histograms is not None:
+            self.histograms.write(cursor)
+        stats = self.get_statistics()
+        cursor.executemany(
+            """
+            INSERT OR REPLACE INTO statistics (key, value)
+            VALUES (?, ?)
+        """,
+            [
+                ("total_files", str(stats["total_files"])),
+                ("unique_files", str(stats["unique_files"])),
+                ("total_size", str(stats["total_size"])),
+                ("logical_size", str(stats["logical_size"])),
+                ("on_disk_size", str(stats["on_disk_size"])),
+                ("hardlink_extra_paths", str(stats["hardlink_extra_paths"])),
+                ("skipped_paths", str(stats["skipped_paths"])),
+                ("unique_extensions", str(stats["unique_extensions"])),
+                ("top_extensions", repr(stats["top_extensions"])),
+            ],
+        )
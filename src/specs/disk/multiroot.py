@@ -0,0 +1,213 @@
+"""Index several roots in parallel, one process per device, into one database.
+
+A single ``FileIndexer`` walk is bound by one device's latency. When a
+host has many independent data mounts, ``MultiRootIndexer`` groups the
+requested roots by ``st_dev`` and walks each device in its own process
+(``ProcessPoolExecutor``), so the disks are busy at the same time and
+the walks do not share a GIL:
+
+* every root is streamed (``stream_to_sqlite``, with ``workers``
+  threads) into its own shard database with ``one_filesystem=True``,
+  so a mount nested under another root is indexed once, by its own
+  device's process,
+* the shards are merged into the target database with ``ATTACH`` +
+  ``INSERT ... SELECT``, and rows from earlier runs that were not seen
+  again are deleted,
+* the statistics are recomputed in SQL over the merged ``files``
+  table; the dedup groups by ``(device, inode)``, so equal inode
+  numbers on different disks stay distinct.
+
+``discover_roots()`` lists the mount points worth indexing with the
+same ``psutil.disk_partitions`` filtering the hardware summary uses
+(``specs.hardware.main._skip_summary_partition``).
+"""
+import os
+import sqlite3
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..hardware.deps import ensure_lib
+from ..hardware.main import _skip_summary_partition
+from .indexer import _FILE_COLUMNS, FileIndexer, _upsert_files
+
+_DIR_COLUMNS = ("path", "mtime_ns", "parent", "size", "on_disk", "file_count")
+
+
+def select_mounts(partitions) -> List[str]:
+    """Return one mount point per device from ``psutil.disk_partitions()`` rows.
+
+    Pseudo and loop filesystems are dropped by
+    ``_skip_summary_partition``; a device mounted more than once (bind
+    mounts, btrfs subvolumes) keeps its first mount point.
+    """
+    roots: List[str] = []
+    seen_devices = set()
+    for partition in partitions:
+        if _skip_summary_partition(partition):
+            continue
+        device = getattr(partition, "device", "") or partition.mountpoint
+        if device in seen_devices:
+            continue
+        seen_devices.add(device)
+        roots.append(partition.mountpoint)
+    return roots
+
+
+@ensure_lib("psutil")
+def discover_roots() -> List[str]:
+    """Return the mount points of this host's real data filesystems."""
+    import psutil
+
+    return select_mounts(psutil.disk_partitions(all=False))
+
+
+def _index_device(
+    jobs: List[Tuple[str, str]], options: dict, workers: int = 1
+) -> List[Tuple[str, bool, Optional[str]]]:
+    """Process-pool entry point: stream each ``(root, shard_db)`` of one device."""
+    results = []
+    for root, shard in jobs:
+        indexer = FileIndexer(one_filesystem=True, **options)
+        ok, err = indexer.stream_to_sqlite(root, shard, workers=workers)
+        results.append((root, ok, err))
+    return results
+
+
+class MultiRootIndexer:
+    """Index ``roots`` into one SQLite database with a process per device.
+
+    ``options`` are passed to each shard's ``FileIndexer`` (for example
+    ``fast_records`` or ``metadata``); shards always run with
+    ``one_filesystem=True``. ``workers`` is the number of threads each
+    shard walks its root with. After ``index_to_sqlite`` the merged
+    totals are available from ``get_statistics()``.
+    """
+
+    def __init__(
+        self,
+        roots: Sequence[str],
+        processes: Optional[int] = None,
+        workers: int = 1,
+        **options,
+    ):
+        self.roots = [str(root) for root in roots]
+        self.processes = processes
+        self.workers = workers
+        self.options = options
+        self.errors: List[str] = []
+        self._merged = FileIndexer()
+
+    def plan(self) -> Dict[int, List[str]]:
+        """Group the roots by device, dropping roots inside another root of the same device."""
+        by_device: Dict[int, List[str]] = {}
+        for root in sorted({os.path.abspath(r) for r in self.roots}, key=len):
+            try:
+                device = os.stat(root).st_dev
+            except OSError as e:
+                self.errors.append(f"Error scanning {root}: {e}")
+                continue
+            siblings = by_device.setdefault(device, [])
+            # commonpath rather than Path.is_relative_to (Python 3.9+).
+            if any(os.path.commonpath([root, other]) == other for other in siblings):
+                continue
+            siblings.append(root)
+        return by_device
+
+    def index_to_sqlite(self, db_path: str) -> Tuple[bool, Optional[str]]:
+        """Index every root and merge the shards into ``db_path``.
+
+        Returns ``(success, error_message)`` like
+        ``FileIndexer.export_to_sqlite``. If any shard fails, the
+        target database is left untouched.
+        """
+        self.errors = []
+        plan = self.plan()
+        if not plan:
+            return False, "No readable roots to index"
+        run_started = datetime.now().isoformat()
+        shard_dir = Path(db_path).resolve().parent
+        with tempfile.TemporaryDirectory(prefix=".index-shards-", dir=shard_dir) as tmp:
+            jobs = {
+                device: [
+                    (root, os.path.join(tmp, f"shard-{device}-{i}.db"))
+                    for i, root in enumerate(roots)
+                ]
+                for device, roots in plan.items()
+            }
+            workers = self.processes or len(jobs)
+            with ProcessPoolExecutor(max_workers=max(1, min(workers, len(jobs)))) as pool:
+                futures = [
+                    pool.submit(_index_device, device_jobs, self.options, self.workers)
+                    for device_jobs in jobs.values()
+                ]
+                failures = []
+                for future in futures:
+                    for root, ok, err in future.result():
+                        if not ok:
+                            failures.append(f"{root}: {err}")
+            if failures:
+                return False, "; ".join(failures)
+            shards = [shard for device_jobs in jobs.values() for _, shard in device_jobs]
+            return self._merge(db_path, shards, run_started)
+
+    def _merge(self, db_path: str, shards: List[str], run_started: str) -> Tuple[bool, Optional[str]]:
+        try:
+            conn = sqlite3.connect(db_path)
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+        merged = self._merged = FileIndexer()
+        file_columns = ", ".join(_FILE_COLUMNS)
+        dir_columns = ", ".join(_DIR_COLUMNS)
+        try:
+            cursor = conn.cursor()
+            FileIndexer._ensure_schema(cursor)
+            cursor.execute("DELETE FROM dirs")
+            skipped = len(self.errors)
+            for shard in shards:
+                cursor.execute("ATTACH DATABASE ? AS shard", (shard,))
+                rows = conn.execute(f"SELECT {file_columns} FROM shard.files")
+                for batch in iter(lambda: rows.fetchmany(50000), []):
+                    _upsert_files(cursor, batch)
+                cursor.execute(
+                    f"INSERT OR REPLACE INTO dirs ({dir_columns}) "
+                    f"SELECT {dir_columns} FROM shard.dirs"
+                )
+                row = cursor.execute(
+                    "SELECT value FROM shard.statistics WHERE key = 'skipped_paths'"
+                ).fetchone()
+                skipped += int(row[0]) if row else 0
+                conn.commit()
+                cursor.execute("DETACH DATABASE shard")
+            cursor.execute(
+                "DELETE FROM files WHERE indexed_at IS NULL OR indexed_at < ?",
+                (run_started,),
+            )
+
+            total, size = cursor.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM files"
+            ).fetchone()
+            merged.stats["total_files"] = total
+            merged.stats["total_size"] = size
+            merged.stats["skipped_paths"] = skipped
+            for ext, count in cursor.execute(
+                "SELECT extension, COUNT(*) FROM files GROUP BY extension"
+            ):
+                merged.stats["extensions"][ext] = count
+            merged._finalize_stats_sql(cursor)
+            merged._write_statistics(cursor)
+            conn.commit()
+            return True, None
+
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+        except Exception as e:
+            return False, f"Unexpected error: {str(e)}"
+        finally:
+            conn.close()
+
+    def get_statistics(self) -> dict:
+        """Statistics of the merged index, as ``FileIndexer.get_statistics``."""
+        return self._merged.get_statistics()
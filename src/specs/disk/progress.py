@@ -0,0 +1,205 @@
+"""Walk instrumentation hooks for ``FileIndexer``.
+
+Pass an observer as ``FileIndexer(observer=...)`` and the walk reports
+to it from the consuming thread (never from walker threads), once per
+directory:
+
+* ``WalkObserver`` is the no-op base class defining the hooks,
+* ``WalkMetrics`` aggregates directories/files per second, a log2
+  histogram of per-file stat latency, walk queue depth, the slowest
+  directories and the error messages, and serializes them with
+  ``to_dict()`` for JSON dumps,
+* ``ProgressPrinter`` is a ``WalkMetrics`` that also redraws a single
+  status line on a stream at most every ``interval`` seconds.
+
+Without an observer the walker does no timing at all; with one it
+adds two ``perf_counter`` calls per file and one per directory.
+Errors go to ``on_error`` instead of being printed.
+"""
+import heapq
+import sys
+import time
+from typing import Dict, List, Optional, TextIO, Tuple
+
+
+class WalkObserver:
+    """Hooks called by ``FileIndexer.iter_records``; override what you need."""
+
+    def on_start(self, root_path: str) -> None:
+        """Called once before the first directory is scanned."""
+
+    def on_dir(self, scan, pending: int) -> None:
+        """Called for each scanned directory.
+
+        ``scan`` is the walker's ``_DirScan`` (``dirkey``, ``records``,
+        ``subdirs``, ``errors``, ``reused``, ``elapsed_ns`` and
+        ``stat_ns``, the per-file stat latencies). ``pending`` is the
+        number of directories still queued or being scanned.
+        """
+
+    def on_error(self, message: str) -> None:
+        """Called for each directory or entry access error."""
+        print(message)
+
+    def on_finish(self) -> None:
+        """Called once after the last directory."""
+
+
+def _bucket_label(bucket: int) -> str:
+    return f"<{1 << bucket}us"
+
+
+class WalkMetrics(WalkObserver):
+    """Collect walk rates, stat latencies, queue depth and slow directories."""
+
+    def __init__(self, slowest: int = 10, max_errors: int = 100):
+        self.slowest = slowest
+        self.max_errors = max_errors
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.root_path: Optional[str] = None
+        self.dirs = 0
+        self.reused_dirs = 0
+        self.files = 0
+        self.bytes = 0
+        self.error_count = 0
+        self.errors: List[str] = []
+        # Bucket b counts stats that took < 2**b microseconds.
+        self.stat_histogram: Dict[int, int] = {}
+        self.stat_count = 0
+        self.stat_total_ns = 0
+        self.stat_max_ns = 0
+        self.queue_max = 0
+        self.queue_total = 0
+        self._slow: List[Tuple[int, str]] = []  # min-heap of (elapsed_ns, dir)
+
+    def on_start(self, root_path: str) -> None:
+        self.root_path = root_path
+        self.started = time.monotonic()
+
+    def on_dir(self, scan, pending: int) -> None:
+        self.dirs += 1
+        if scan.reused:
+            self.reused_dirs += 1
+        self.files += len(scan.records)
+        for record in scan.records:
+            self.bytes += record["size"] or 0
+        hist = self.stat_histogram
+        for ns in scan.stat_ns:
+            bucket = (ns // 1000).bit_length()
+            hist[bucket] = hist.get(bucket, 0) + 1
+            self.stat_total_ns += ns
+            if ns > self.stat_max_ns:
+                self.stat_max_ns = ns
+        self.stat_count += len(scan.stat_ns)
+        self.queue_total += pending
+        if pending > self.queue_max:
+            self.queue_max = pending
+        item = (scan.elapsed_ns, scan.dirkey)
+        if len(self._slow) < self.slowest:
+            heapq.heappush(self._slow, item)
+        elif item > self._slow[0]:
+            heapq.heapreplace(self._slow, item)
+
+    def on_error(self, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(message)
+
+    def on_finish(self) -> None:
+        self.finished = time.monotonic()
+
+    @property
+    def elapsed(self) -> float:
+        if self.started is None:
+            return 0.0
+        end = self.finished if self.finished is not None else time.monotonic()
+        return end - self.started
+
+    def rates(self) -> Tuple[float, float]:
+        """Return ``(directories per second, files per second)`` so far."""
+        elapsed = self.elapsed
+        if elapsed <= 0:
+            return 0.0, 0.0
+        return self.dirs / elapsed, self.files / elapsed
+
+    def slowest_dirs(self) -> List[Tuple[str, float]]:
+        """Return ``(directory, seconds)`` for the slowest scans, slowest first."""
+        return [(path, ns / 1e9) for ns, path in sorted(self._slow, reverse=True)]
+
+    def to_dict(self) -> dict:
+        dirs_per_sec, files_per_sec = self.rates()
+        return {
+            "root": self.root_path,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "dirs": self.dirs,
+            "reused_dirs": self.reused_dirs,
+            "files": self.files,
+            "bytes": self.bytes,
+            "dirs_per_second": round(dirs_per_sec, 1),
+            "files_per_second": round(files_per_sec, 1),
+            "stat_latency": {
+                "count": self.stat_count,
+                "mean_us": round(self.stat_total_ns / self.stat_count / 1000, 2)
+                if self.stat_count else 0.0,
+                "max_us": round(self.stat_max_ns / 1000, 2),
+                "histogram": {
+                    _bucket_label(b): n for b, n in sorted(self.stat_histogram.items())
+                },
+            },
+            "queue_depth": {
+                "max": self.queue_max,
+                "mean": round(self.queue_total / self.dirs, 1) if self.dirs else 0.0,
+            },
+            "slowest_dirs": [
+                {"path": path, "seconds": round(seconds, 6)}
+                for path, seconds in self.slowest_dirs()
+            ],
+            "error_count": self.error_count,
+            "errors": list(self.errors),
+        }
+
+
+class ProgressPrinter(WalkMetrics):
+    """``WalkMetrics`` that redraws a one-line status at most every ``interval`` s."""
+
+    def __init__(self, stream: TextIO = None, interval: float = 0.5, **kwargs):
+        super().__init__(**kwargs)
+        self.stream = stream if stream is not None else sys.stderr
+        self.interval = interval
+        self._last_draw = 0.0
+        self._width = 0
+
+    def _draw(self, pending: int) -> None:
+        dirs_per_sec, files_per_sec = self.rates()
+        line = (
+            f"{self.files:,} files in {self.dirs:,} dirs  "
+            f"{files_per_sec:,.0f} files/s  {dirs_per_sec:,.0f} dirs/s  "
+            f"queue {pending:,}  errors {self.error_count:,}"
+        )
+        self.stream.write("\r" + line.ljust(self._width))
+        self.stream.flush()
+        self._width = len(line)
+
+    def _clear(self) -> None:
+        if self._width:
+            self.stream.write("\r" + " " * self._width + "\r")
+            self._width = 0
+
+    def on_dir(self, scan, pending: int) -> None:
+        super().on_dir(scan, pending)
+        now = time.monotonic()
+        if now - self._last_draw >= self.interval:
+            self._last_draw = now
+            self._draw(pending)
+
+    def on_error(self, message: str) -> None:
+        super().on_error(message)
+        self._clear()
+        self.stream.write(message + "\n")
+
+    def on_finish(self) -> None:
+        super().on_finish()
+        self._draw(0)
+        self.stream.write("\n")
+        self.stream.flush()
@@ -0,0 +1,206 @@
+"""Query an exported SQLite index without walking the disk again.
+
+``FileIndexer.search()`` and ``get_statistics()`` work on the in-memory
+``files`` mapping, which is empty until the tree has been walked.
+``SQLiteIndexReader`` answers the same two calls straight from the
+``files`` and ``statistics`` tables written by ``export_to_sqlite``,
+``stream_to_sqlite`` or ``index_incremental``:
+
+* the database is opened read-only (``mode=ro`` URI, ``query_only``)
+  with ``PRAGMA mmap_size`` so pages are read through the OS page cache
+  instead of being copied into SQLite's own cache,
+* extension filters are an ``IN`` list on ``idx_files_ext``,
+* ``paths_for_inode`` is a lookup on ``idx_files_inode``,
+* ``top_dirs`` / ``subdirs`` read the per-directory rollups of the
+  ``dirs`` table through ``idx_dirs_on_disk`` / ``idx_dirs_parent``,
+* ``age_histogram`` reads the ``histograms`` table written with
+  ``specs.disk.ages.AgeHistograms``,
+* regex filters run in SQL through a ``REGEXP`` function, behind a
+  ``LIKE`` prefilter on the literal runs the pattern requires so most
+  rows never reach Python.
+
+Results match ``FileIndexer.search`` on the same data: same tuples,
+ordered by filename (ties in export order).
+"""
+import ast
+import sqlite3
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from .search import compile_pattern, required_literals
+
+# 256 MiB: enough to map the files table of a multi-million-row index.
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+
+_INT_STATISTICS = (
+    "total_files",
+    "unique_files",
+    "total_size",
+    "logical_size",
+    "on_disk_size",
+    "hardlink_extra_paths",
+    "skipped_paths",
+    "unique_extensions",
+)
+
+
+def _regexp(pattern: str, value: Optional[str]) -> bool:
+    return value is not None and compile_pattern(pattern).search(value) is not None
+
+
+def _lower(value: Optional[str]) -> Optional[str]:
+    # SQLite's lower() only folds ASCII; match ``str.lower`` instead.
+    return None if value is None else value.lower()
+
+
+def _like_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _create_function(conn: sqlite3.Connection, name: str, n_args: int, func) -> None:
+    """Register ``func`` as deterministic where supported (Python 3.8+, SQLite 3.8.3+)."""
+    try:
+        conn.create_function(name, n_args, func, deterministic=True)
+    except (TypeError, sqlite3.NotSupportedError):
+        conn.create_function(name, n_args, func)
+
+
+class SQLiteIndexReader:
+    """Read-only ``search`` / ``get_statistics`` over an exported index.
+
+    Usually obtained through ``FileIndexer.open(db_path)``. Usable as a
+    context manager; ``close()`` releases the connection.
+    """
+
+    def __init__(self, db_path: str, mmap_size: int = DEFAULT_MMAP_SIZE):
+        path = Path(db_path)
+        if not path.is_file():
+            raise FileNotFoundError(f"No index database at {db_path}")
+        self.db_path = str(path)
+        self.conn = sqlite3.connect(
+            f"{path.resolve().as_uri()}?mode=ro", uri=True
+        )
+        self.conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+        self.conn.execute("PRAGMA query_only = ON")
+        _create_function(self.conn, "REGEXP", 2, _regexp)
+        _create_function(self.conn, "PY_LOWER", 1, _lower)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SQLiteIndexReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def search(
+        self,
+        pattern: str,
+        exact_match: bool = False,
+        extensions: List[str] = None,
+        min_size: int = None,
+        max_size: int = None,
+    ) -> List[Tuple[str, str, int]]:
+        """Same contract and result order as ``FileIndexer.search``."""
+        where: List[str] = []
+        params: list = []
+        if exact_match:
+            where.append("PY_LOWER(filename) = ?")
+            params.append(pattern.lower())
+        else:
+            regex = compile_pattern(pattern)
+            literals = required_literals(regex)
+            if literals:
+                # LIKE folds ASCII case only; names with any character
+                # outside printable ASCII skip the prefilter and are
+                # left to REGEXP (see specs.disk.search).
+                likes = " AND ".join("filename LIKE ? ESCAPE '\\'" for _ in literals)
+                where.append(f"(({likes}) OR filename GLOB '*[^ -~]*')")
+                params.extend(f"%{_like_escape(lit)}%" for lit in literals)
+            where.append("filename REGEXP ?")
+            params.append(regex.pattern)
+        if extensions:
+            wanted = sorted({
+                ext.lower() if ext.startswith(".") else f".{ext.lower()}"
+                for ext in extensions
+            })
+            where.append(f"extension IN ({', '.join('?' for _ in wanted)})")
+            params.extend(wanted)
+        if min_size is not None:
+            where.append("size >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            where.append("size <= ?")
+            params.append(max_size)
+
+        sql = "SELECT filepath, filename, size FROM files"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY filename, id"
+        return [tuple(row) for row in self.conn.execute(sql, params)]
+
+    def get_statistics(self) -> dict:
+        """Return the statistics recorded by the export, as ``FileIndexer.get_statistics``."""
+        stored = dict(self.conn.execute("SELECT key, value FROM statistics"))
+        stats = {key: int(stored.get(key) or 0) for key in _INT_STATISTICS}
+        stats["top_extensions"] = ast.literal_eval(stored.get("top_extensions") or "[]")
+        return stats
+
+    def paths_for_inode(self, device: int, inode: int) -> List[str]:
+        """Return every indexed path that refers to ``(device, inode)``."""
+        return [
+            row[0]
+            for row in self.conn.execute(
+                "SELECT filepath FROM files WHERE device = ? AND inode = ? "
+                "ORDER BY filepath",
+                (device, inode),
+            )
+        ]
+
+    def top_dirs(self, n: int = 10) -> List[Tuple[str, int, int, int]]:
+        """Return the ``n`` heaviest directories by subtree on-disk bytes.
+
+        Rows are ``(path, size, on_disk, file_count)`` with recursive,
+        inode-deduped totals, as in ``FileIndexer.dir_totals``.
+        """
+        return [
+            tuple(row)
+            for row in self.conn.execute(
+                "SELECT path, size, on_disk, file_count FROM dirs "
+                "WHERE on_disk IS NOT NULL ORDER BY on_disk DESC, path LIMIT ?",
+                (n,),
+            )
+        ]
+
+    def subdirs(self, path: str) -> List[Tuple[str, int, int, int]]:
+        """Return the direct subdirectories of ``path``, heaviest first."""
+        return [
+            tuple(row)
+            for row in self.conn.execute(
+                "SELECT path, size, on_disk, file_count FROM dirs "
+                "WHERE parent = ? ORDER BY on_disk DESC, path",
+                (path,),
+            )
+        ]
+
+    def age_histogram(
+        self, clock: str = "mtime", dimension: str = "all", key: str = ""
+    ) -> List[Tuple[int, Optional[float], int, int, int]]:
+        """Return the stored age histogram of one ``(clock, dimension, key)``.
+
+        Rows are ``(bucket, max_age_days, files, size, on_disk)`` for the
+        non-empty buckets, youngest first (see ``specs.disk.ages``); empty
+        when the index was written without ``histograms``.
+        """
+        tables = {row[0] for row in self.conn.execute("SELECT name FROM sqlite_master")}
+        if "histograms" not in tables:
+            return []
+        return [
+            tuple(row)
+            for row in self.conn.execute(
+                "SELECT bucket, max_age_days, files, size, on_disk FROM histograms "
+                "WHERE clock = ? AND dimension = ? AND key = ? ORDER BY bucket",
+                (clock, dimension, key),
+            )
+        ]
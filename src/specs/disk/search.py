@@ -0,0 +1,225 @@
+"""Prebuilt lookup structures for ``FileIndexer.search``.
+
+``FileIndexer.search`` is a linear scan: every call walks every record
+and runs the regex against every filename. ``SearchIndex`` is built once
+from the records and answers the same queries from precomputed
+structures:
+
+* ``extension -> ids`` posting lists,
+* a size-sorted id array, so ``min_size`` / ``max_size`` become two
+  ``bisect`` calls and a slice,
+* a lowercase trigram -> ids map over filenames, used to prefilter
+  substring and regex queries down to the names that contain every
+  literal run the pattern requires,
+* a lowercase filename -> ids map for ``exact_match``.
+
+Ids are assigned in filename order (stable over the record order), so
+sorting candidate ids reproduces the linear scan's
+``sorted(results, key=filename)`` exactly.
+
+Trigram prefiltering is only applied to pure-ASCII filenames and to the
+ASCII parts of a pattern. ``re.IGNORECASE`` treats a few non-ASCII
+characters as equal to ASCII ones (``ı``/``i``, ``ſ``/``s``, the Kelvin
+sign/``k``), which plain lowercasing would miss; non-ASCII filenames are
+therefore always handed to the regex for verification.
+"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern, Set, Tuple
+
+try:  # Python 3.11+
+    import re._parser as _sre_parse
+except ImportError:  # pragma: no cover - older interpreters
+    import sre_parse as _sre_parse
+
+
+def _is_ascii(text: str) -> bool:
+    try:
+        text.encode("ascii")
+    except UnicodeEncodeError:
+        return False
+    return True
+
+
+@lru_cache(maxsize=256)
+def compile_pattern(pattern: str) -> Pattern:
+    """Compile ``pattern`` case-insensitively, as a literal if it is not a valid regex."""
+    try:
+        return re.compile(pattern, re.IGNORECASE)
+    except re.error:
+        return re.compile(re.escape(pattern), re.IGNORECASE)
+
+
+def required_literals(regex: Pattern) -> List[str]:
+    """Return lowercase ASCII substrings that every match of ``regex`` contains.
+
+    Only the top-level sequence of the parsed pattern is inspected: runs
+    of consecutive ``LITERAL`` nodes are required, anything else
+    (groups, repeats, classes, alternation) ends the current run.
+    Non-ASCII characters also end a run (see the module docstring).
+    Returns an empty list when nothing can be proven.
+    """
+    try:
+        parsed = _sre_parse.parse(regex.pattern, regex.flags)
+    except Exception:
+        return []
+    runs: List[str] = []
+    current: List[str] = []
+    for op, arg in parsed:
+        if op is _sre_parse.LITERAL and arg < 128:
+            current.append(chr(arg).lower())
+            continue
+        if current:
+            runs.append("".join(current))
+            current = []
+    if current:
+        runs.append("".join(current))
+    return runs
+
+
+def _chain(lists: Iterable[Iterable[int]]) -> Iterable[int]:
+    for ids in lists:
+        yield from ids
+
+
+def _trigrams(text: str) -> Set[str]:
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    """Immutable search structures over ``(filepath, filename, extension, size)`` rows.
+
+    Build it with ``FileIndexer.build_search_index()``; it does not
+    track later changes to ``FileIndexer.files``.
+    """
+
+    def __init__(self, rows: Iterable[Tuple[str, str, str, Optional[int]]]):
+        ordered = sorted(rows, key=lambda row: row[1])
+        self.paths: List[str] = [row[0] for row in ordered]
+        self.names: List[str] = [row[1] for row in ordered]
+        self.sizes = array("q", (-1 if row[3] is None else row[3] for row in ordered))
+        self.extensions: List[str] = [row[2] for row in ordered]
+
+        self._by_extension: Dict[str, array] = {}
+        self._by_name: Dict[str, array] = {}
+        self._trigrams: Dict[str, array] = {}
+        self._unfiltered = array("l")  # ids whose filename is not pure ASCII
+        for i, row in enumerate(ordered):
+            self._by_extension.setdefault(row[2], array("l")).append(i)
+            lowered = row[1].lower()
+            self._by_name.setdefault(lowered, array("l")).append(i)
+            if not _is_ascii(row[1]):
+                self._unfiltered.append(i)
+                continue
+            for gram in _trigrams(lowered):
+                self._trigrams.setdefault(gram, array("l")).append(i)
+
+        by_size = sorted(range(len(ordered)), key=self.sizes.__getitem__)
+        self._size_order = array("l", by_size)
+        self._size_sorted = array("q", (self.sizes[i] for i in by_size))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def _size_range(self, min_size: Optional[int], max_size: Optional[int]) -> array:
+        # Unknown sizes are stored as -1 and never satisfy a bound.
+        lo = bisect_left(self._size_sorted, max(0, min_size or 0))
+        hi = (
+            len(self._size_sorted)
+            if max_size is None
+            else bisect_right(self._size_sorted, max_size)
+        )
+        return self._size_order[lo:hi]
+
+    def _trigram_candidates(self, regex: Pattern) -> Optional[Set[int]]:
+        grams: Set[str] = set()
+        for literal in required_literals(regex):
+            grams |= _trigrams(literal)
+        if not grams:
+            return None
+        # Intersect the rarest posting lists first.
+        postings = sorted(
+            (self._trigrams.get(g, ()) for g in grams), key=len
+        )
+        result = set(postings[0])
+        for posting in postings[1:]:
+            if not result:
+                break
+            result.intersection_update(posting)
+        result.update(self._unfiltered)
+        return result
+
+    def search(
+        self,
+        pattern: str,
+        exact_match: bool = False,
+        extensions: List[str] = None,
+        min_size: int = None,
+        max_size: int = None,
+    ) -> List[Tuple[str, str, int]]:
+        """Same contract and result order as ``FileIndexer.search``.
+
+        Each criterion can supply a candidate id list (exact name,
+        trigram prefilter, extension postings, size range). Only the
+        smallest list is materialized; the other criteria are checked
+        per candidate, so a selective query costs time proportional to
+        its candidates, not to the index.
+        """
+        sources: List[Tuple[int, Iterable[int]]] = []
+        regex = None
+        wanted_name = None
+        if exact_match:
+            wanted_name = pattern.lower()
+            ids = self._by_name.get(wanted_name, ())
+            sources.append((len(ids), ids))
+        else:
+            regex = compile_pattern(pattern)
+            grams = self._trigram_candidates(regex)
+            if grams is not None:
+                sources.append((len(grams), grams))
+        wanted_exts = None
+        if extensions:
+            wanted_exts = {
+                ext.lower() if ext.startswith(".") else f".{ext.lower()}"
+                for ext in extensions
+            }
+            postings = [self._by_extension.get(ext, ()) for ext in wanted_exts]
+            sources.append((sum(len(p) for p in postings), _chain(postings)))
+        sized = min_size is not None or max_size is not None
+        if sized:
+            ids = self._size_range(min_size, max_size)
+            sources.append((len(ids), ids))
+
+        if sources:
+            candidates: Iterable[int] = sorted(min(sources, key=lambda s: s[0])[1])
+        else:
+            candidates = range(len(self.paths))
+
+        names = self.names
+        sizes = self.sizes
+        exts = self.extensions
+        match = regex.search if regex is not None else None
+        hits = []
+        for i in candidates:
+            if wanted_name is not None and names[i].lower() != wanted_name:
+                continue
+            if wanted_exts is not None and exts[i] not in wanted_exts:
+                continue
+            if sized:
+                size = sizes[i]
+                if size < 0:
+                    continue
+                if min_size is not None and size < min_size:
+                    continue
+                if max_size is not None and size > max_size:
+                    continue
+            if match is not None and not match(names[i]):
+                continue
+            hits.append(self._result(i))
+        return hits
+
+    def _result(self, i: int) -> Tuple[str, str, Optional[int]]:
+        size = self.sizes[i]
+        return self.paths[i], self.names[i], None if size < 0 else size
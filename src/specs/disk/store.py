@@ -0,0 +1,259 @@
+"""Compact columnar storage for ``FileIndexer.files``.
+
+The default ``FileIndexer.files`` is a ``dict`` of 11-key dicts keyed by
+posix path. Each record costs several hundred bytes (the dict itself,
+two ``datetime`` objects, boxed ints, and the full path string), which
+adds up to many gigabytes at 10M files.
+
+``CompactFileStore`` keeps the same mapping interface but stores one
+row per file across parallel columns:
+
+* directory prefixes are interned once and referenced by id,
+* the filename is the only per-row string,
+* extensions are interned and referenced by id,
+* ``size``, ``on_disk``, ``blocks``, ``nlinks``, ``inode``, ``device``,
+  ``mtime_ns`` and ``indexed_at_ns`` live in ``array('q')`` columns.
+
+Record dicts are rebuilt on access, so ``files[path]``, iteration,
+``search()`` and ``export_to_sqlite()`` keep working unchanged. A row
+costs roughly 150 bytes (most of it the filename string) versus about
+800 bytes for the dict-of-dicts layout.
+"""
+import math
+from array import array
+from datetime import datetime
+from typing import Dict, Iterator, List, MutableMapping, Optional, Tuple
+
+_NS = 10 ** 9
+
+# Integer record fields stored under a column of the same name.
+_INT_FIELDS = ("size", "on_disk", "blocks", "nlinks", "inode", "device")
+
+
+def _datetime_to_ns(value: Optional[datetime]) -> Optional[int]:
+    """Convert a naive local ``datetime`` to integer nanoseconds since the epoch.
+
+    Whole seconds go through ``timestamp()`` (exact for a value with no
+    microseconds) and the microseconds are added as integers, so
+    ``_ns_to_datetime(_datetime_to_ns(dt)) == dt``.
+    """
+    if value is None:
+        return None
+    seconds = math.floor(value.replace(microsecond=0).timestamp())
+    return seconds * _NS + value.microsecond * 1000
+
+
+def _ns_to_datetime(value: Optional[int]) -> Optional[datetime]:
+    """Inverse of ``_datetime_to_ns``; truncates to microseconds."""
+    if value is None:
+        return None
+    return datetime.fromtimestamp(value // _NS).replace(
+        microsecond=(value % _NS) // 1000
+    )
+
+
+class _RowsView:
+    """Iterable, sized view over the live rows of a ``CompactFileStore``."""
+
+    __slots__ = ("_store", "_kind")
+
+    def __init__(self, store: "CompactFileStore", kind: str):
+        self._store = store
+        self._kind = kind
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def __iter__(self):
+        store = self._store
+        for row in store._live_rows():
+            if self._kind == "keys":
+                yield store._path(row)
+            elif self._kind == "values":
+                yield store._view(row)
+            else:
+                yield store._path(row), store._view(row)
+
+
+class CompactFileStore(MutableMapping):
+    """Mapping of posix filepath -> record dict, stored column-wise.
+
+    ``add()`` appends a record without a lookup and is what the walker
+    uses, since it never sees a path twice. The path -> row lookup
+    needed by ``files[path]``, ``in`` and assignment is built lazily on
+    first use and kept current afterwards; it holds one full path
+    string per row, so bulk consumers should iterate instead. Deleted rows are tombstoned
+    (their filename set to ``None``) rather than compacted.
+
+    Integer columns store ``None`` as ``-1`` (no real field is
+    negative). A value that does not fit a signed 64-bit slot (e.g. a
+    128-bit ReFS file id) converts that column to a plain ``list``.
+    """
+
+    def __init__(self):
+        self._prefix_ids: Dict[str, int] = {}
+        self._prefixes: List[str] = []
+        self._ext_ids: Dict[str, int] = {}
+        self._exts: List[str] = []
+        self._prefix_col = array("l")
+        self._ext_col = array("l")
+        self._names: List[Optional[str]] = []
+        self._cols = {
+            name: array("q")
+            for name in _INT_FIELDS + ("mtime_ns", "indexed_at_ns")
+        }
+        self._live = 0
+        self._lookup: Optional[Dict[str, int]] = None
+
+    # -- column helpers -------------------------------------------------
+
+    def _intern(self, ids: Dict[str, int], values: List[str], value: str) -> int:
+        idx = ids.get(value)
+        if idx is None:
+            idx = ids[value] = len(values)
+            values.append(value)
+        return idx
+
+    def _store_int(self, name: str, row: Optional[int], value: Optional[int]) -> None:
+        col = self._cols[name]
+        if value is None and isinstance(col, array):
+            value = -1
+        try:
+            if row is None:
+                col.append(value)
+            else:
+                col[row] = value
+        except (OverflowError, TypeError):
+            col = self._cols[name] = [None if v == -1 else v for v in col]
+            if row is None:
+                col.append(value)
+            else:
+                col[row] = value
+
+    def _get_int(self, name: str, row: int) -> Optional[int]:
+        value = self._cols[name][row]
+        return None if value == -1 else value
+
+    def _write(self, row: Optional[int], info: dict) -> int:
+        prefix, sep, _ = info["filepath"].rpartition("/")
+        prefix += sep
+        prefix_id = self._intern(self._prefix_ids, self._prefixes, prefix)
+        ext_id = self._intern(self._ext_ids, self._exts, info["extension"])
+        if row is None:
+            self._prefix_col.append(prefix_id)
+            self._ext_col.append(ext_id)
+            self._names.append(info["filename"])
+        else:
+            self._prefix_col[row] = prefix_id
+            self._ext_col[row] = ext_id
+            self._names[row] = info["filename"]
+        for field in _INT_FIELDS:
+            self._store_int(field, row, info[field])
+        if "mtime_ns" in info:  # ``FileIndexer(fast_records=True)`` record
+            mtime_ns = info["mtime_ns"]
+        else:
+            mtime_ns = _datetime_to_ns(info["last_modified"])
+        self._store_int("mtime_ns", row, mtime_ns)
+        self._store_int("indexed_at_ns", row, _datetime_to_ns(info["indexed_at"]))
+        return len(self._names) - 1 if row is None else row
+
+    def _path(self, row: int) -> str:
+        return self._prefixes[self._prefix_col[row]] + self._names[row]
+
+    def _view(self, row: int) -> dict:
+        return {
+            "filepath": self._path(row),
+            "filename": self._names[row],
+            "extension": self._exts[self._ext_col[row]],
+            "size": self._get_int("size", row),
+            "on_disk": self._get_int("on_disk", row),
+            "blocks": self._get_int("blocks", row),
+            "nlinks": self._get_int("nlinks", row),
+            "inode": self._get_int("inode", row),
+            "device": self._get_int("device", row),
+            "last_modified": _ns_to_datetime(self._get_int("mtime_ns", row)),
+            "indexed_at": _ns_to_datetime(self._get_int("indexed_at_ns", row)),
+        }
+
+    def _live_rows(self) -> Iterator[int]:
+        names = self._names
+        for row in range(len(names)):
+            if names[row] is not None:
+                yield row
+
+    def _row_of(self, path: str) -> Optional[int]:
+        if self._lookup is None:
+            self._lookup = {self._path(row): row for row in self._live_rows()}
+        return self._lookup.get(path)
+
+    # -- public API -----------------------------------------------------
+
+    def add(self, info: dict) -> None:
+        """Append a record whose ``filepath`` is not already stored."""
+        row = self._write(None, info)
+        self._live += 1
+        if self._lookup is not None:
+            self._lookup[info["filepath"]] = row
+
+    def iter_columns(self, *names: str) -> Iterator[Tuple]:
+        """Yield raw column tuples for live rows without building dicts.
+
+        Accepts the integer column names (``size``, ``on_disk``,
+        ``blocks``, ``nlinks``, ``inode``, ``device``, ``mtime_ns``,
+        ``indexed_at_ns``) plus ``filepath``, ``filename`` and
+        ``extension``. ``None`` values come back as ``None``.
+        """
+        getters = []
+        for name in names:
+            if name == "filepath":
+                getters.append(self._path)
+            elif name == "filename":
+                getters.append(self._names.__getitem__)
+            elif name == "extension":
+                getters.append(lambda row: self._exts[self._ext_col[row]])
+            else:
+                getters.append(lambda row, name=name: self._get_int(name, row))
+        for row in self._live_rows():
+            yield tuple(get(row) for get in getters)
+
+    def __len__(self) -> int:
+        return self._live
+
+    def __iter__(self) -> Iterator[str]:
+        for row in self._live_rows():
+            yield self._path(row)
+
+    def __contains__(self, path) -> bool:
+        return self._row_of(path) is not None
+
+    def __getitem__(self, path: str) -> dict:
+        row = self._row_of(path)
+        if row is None:
+            raise KeyError(path)
+        return self._view(row)
+
+    def __setitem__(self, path: str, info: dict) -> None:
+        if info["filepath"] != path:
+            info = dict(info, filepath=path)
+        row = self._row_of(path)
+        if row is None:
+            self.add(info)
+        else:
+            self._write(row, info)
+
+    def __delitem__(self, path: str) -> None:
+        row = self._row_of(path)
+        if row is None:
+            raise KeyError(path)
+        self._names[row] = None
+        del self._lookup[path]
+        self._live -= 1
+
+    def keys(self):
+        return _RowsView(self, "keys")
+
+    def values(self):
+        return _RowsView(self, "values")
+
+    def items(self):
+        return _RowsView(self, "items")
@@ -0,0 +1,585 @@
+"""Keep a ``FileIndexer`` and its SQLite index current with Linux inotify.
+
+``IndexWatcher`` runs one ``index_incremental`` pass over ``root`` and
+then follows the tree through inotify instead of walking it again:
+
+* every indexed directory gets a watch; events only name paths, which
+  are collected in sets, so a file written a thousand times between
+  two batches is stat'd once,
+* once no event has arrived for ``delay`` seconds (or ``max_batch``
+  paths are pending) the batch is applied: each file path is
+  ``lstat``'d and upserted or removed, each created, moved or deleted
+  directory has its old subtree dropped and its current one walked,
+  and the changed rows are written to ``files`` in one transaction,
+* the inode-deduped statistics and the ``dirs`` rollups need every
+  record, so they are recomputed in memory and written at most every
+  ``stats_interval`` seconds and on ``close()``,
+* the indexed paths are also grouped by directory (files and
+  subdirectories per directory key, like ``index_incremental``'s
+  previous-index view), so dropping a moved or deleted subtree, or
+  finding the vanished entries of a re-listed directory, costs the
+  size of that subtree rather than a pass over every indexed path,
+* on ``IN_Q_OVERFLOW`` the lost events cannot be recovered, so every
+  indexed directory is ``stat``'d and only those whose mtime moved are
+  listed again. As with ``index_incremental``, a file rewritten in
+  place during an overflow is picked up by the next full run.
+
+The kernel interface is reached through ``ctypes`` and libc, so no
+extra package is needed; ``inotify_available()`` is False elsewhere.
+fanotify would avoid one watch per directory but needs
+``CAP_SYS_ADMIN``, so it is not used. Large trees may need a higher
+``fs.inotify.max_user_watches``; directories over the limit are
+reported and only refreshed by the next full run.
+"""
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import sqlite3
+import stat
+import struct
+import sys
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from .indexer import FileIndexer, _file_row, _parent_key, _upsert_files
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (
+    IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+    | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+    | IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK
+)
+# Directory events that change which entries exist; IN_ATTRIB or
+# IN_MODIFY on a subdirectory does not need its subtree rescanned.
+_DIR_ENTRY_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO
+
+# struct inotify_event { int wd; uint32_t mask, cookie, len; char name[]; }
+_EVENT = struct.Struct("iIII")
+
+
+def _load_libc():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+    except (OSError, AttributeError):
+        return None
+    libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+    libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+    return libc
+
+
+_LIBC = _load_libc()
+
+
+def inotify_available() -> bool:
+    """Return True if this host supports inotify through libc."""
+    return _LIBC is not None
+
+
+def _errno_error(path: Optional[str] = None) -> OSError:
+    err = ctypes.get_errno()
+    return OSError(err, os.strerror(err), path)
+
+
+class _Inotify:
+    """One non-blocking inotify descriptor."""
+
+    def __init__(self):
+        # IN_NONBLOCK / IN_CLOEXEC have the O_* values on Linux.
+        fd = _LIBC.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise _errno_error()
+        self.fd = fd
+
+    def add_watch(self, path: str, mask: int = WATCH_MASK) -> int:
+        wd = _LIBC.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise _errno_error(path)
+        return wd
+
+    def rm_watch(self, wd: int) -> None:
+        # Fails harmlessly if the kernel already dropped the watch.
+        _LIBC.inotify_rm_watch(self.fd, wd)
+
+    def read_events(self) -> List[Tuple[int, int, int, str]]:
+        """Return every queued ``(wd, mask, cookie, name)`` without blocking."""
+        events = []
+        while True:
+            try:
+                buf = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return events
+            offset = 0
+            while offset + _EVENT.size <= len(buf):
+                wd, mask, cookie, length = _EVENT.unpack_from(buf, offset)
+                offset += _EVENT.size
+                name = buf[offset:offset + length].rstrip(b"\0")
+                offset += length
+                events.append((wd, mask, cookie, os.fsdecode(name)))
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+class _PathEntry:
+    """The part of ``os.DirEntry`` that ``FileIndexer._record_file`` uses."""
+
+    __slots__ = ("path", "name")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def stat(self, follow_symlinks: bool = True) -> os.stat_result:
+        return os.stat(self.path, follow_symlinks=follow_symlinks)
+
+
+def _outermost(paths: Set[str]) -> Set[str]:
+    """Drop every path that lies inside another path of the set."""
+    kept: Set[str] = set()
+    for path in sorted(paths, key=len):
+        key = path
+        while True:
+            parent = _parent_key(key)
+            if parent in kept:
+                break
+            if parent == key:
+                kept.add(path)
+                break
+            key = parent
+    return kept
+
+
+class IndexWatcher:
+    """Follow ``root`` with inotify and keep ``indexer`` and ``db_path`` current.
+
+    ``start()`` indexes the tree and installs the watches; ``poll()``
+    waits for events and applies one coalesced batch, and ``run()``
+    polls until a ``threading.Event`` is set. ``close()`` writes the
+    final statistics. Usable as a context manager.
+    """
+
+    def __init__(
+        self,
+        root: str,
+        db_path: str,
+        indexer: Optional[FileIndexer] = None,
+        delay: float = 0.5,
+        max_batch: int = 10000,
+        stats_interval: float = 30.0,
+    ):
+        self.root = os.path.abspath(root)
+        self.db_path = db_path
+        self.indexer = indexer if indexer is not None else FileIndexer()
+        self.delay = delay
+        self.max_batch = max_batch
+        self.stats_interval = stats_interval
+        # Totals over every applied batch.
+        self.changes = {"upserted": 0, "removed": 0, "overflows": 0}
+        self._inotify: Optional[_Inotify] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._watches: Dict[int, str] = {}
+        self._watched: Dict[str, int] = {}
+        self._paths: Set[str] = set()
+        self._subtrees: Set[str] = set()
+        self._stale_dirs: Set[str] = set()
+        # Directory key -> indexed file paths / subdirectory keys in it.
+        self._files_by_dir: Dict[str, Set[str]] = {}
+        self._subdirs: Dict[str, Set[str]] = {}
+        self._overflow = False
+        self._limit_reported = False
+        self._stats_dirty = False
+        self._last_refresh = 0.0
+
+    def __enter__(self) -> "IndexWatcher":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def start(self, workers: int = 1) -> Tuple[bool, Optional[str]]:
+        """Index ``root`` into ``db_path`` and watch every directory.
+
+        Returns ``(success, error_message)`` like
+        ``FileIndexer.index_incremental``.
+        """
+        if not inotify_available():
+            return False, "inotify is not available on this platform"
+        ok, err = self.indexer.index_incremental(self.root, self.db_path, workers=workers)
+        if not ok:
+            return ok, err
+        try:
+            self._inotify = _Inotify()
+        except OSError as e:
+            return False, f"inotify error: {e}"
+        try:
+            self._conn = sqlite3.connect(self.db_path)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        except sqlite3.Error as e:
+            return False, f"SQLite error: {str(e)}"
+        self._files_by_dir, self._subdirs = {}, {}
+        for path in self.indexer.files:
+            self._track_file(path)
+        for dirkey, mtime_ns in list(self.indexer.dirs.items()):
+            self._track_dir(dirkey)
+            self._watch(dirkey, mtime_ns)
+        self._last_refresh = time.monotonic()
+        return True, None
+
+    def poll(self, timeout: Optional[float] = None) -> int:
+        """Wait up to ``timeout`` seconds for events and apply them as one batch.
+
+        After the first event, reading continues until the tree has
+        been quiet for ``delay`` seconds or ``max_batch`` paths are
+        pending. Returns the number of paths upserted or removed.
+        """
+        fd = self._inotify.fd
+        if not self._has_pending():
+            ready, _, _ = select.select([fd], [], [], timeout)
+            if not ready:
+                self._maybe_refresh()
+                return 0
+        while True:
+            for event in self._inotify.read_events():
+                self._handle(*event)
+            if len(self._paths) + len(self._subtrees) >= self.max_batch:
+                break
+            ready, _, _ = select.select([fd], [], [], self.delay)
+            if not ready:
+                break
+        return self.apply_pending()
+
+    def run(self, stop: Optional[threading.Event] = None, interval: float = 1.0) -> None:
+        """Apply batches until ``stop`` is set (or forever)."""
+        while stop is None or not stop.is_set():
+            self.poll(timeout=interval)
+
+    def close(self) -> None:
+        """Write the final statistics and release the descriptor and database."""
+        if self._conn is not None:
+            if self._stats_dirty:
+                self.refresh_statistics()
+            # Leave a plain rollback-journal database, as stream_to_sqlite does.
+            self._conn.execute("PRAGMA journal_mode=DELETE")
+            self._conn.close()
+            self._conn = None
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+        self._watches = {}
+        self._watched = {}
+
+    def _report(self, message: str) -> None:
+        observer = self.indexer.observer
+        if observer is not None:
+            observer.on_error(message)
+        else:
+            print(message)
+
+    def _has_pending(self) -> bool:
+        return bool(self._overflow or self._paths or self._subtrees or self._stale_dirs)
+
+    def _watch(self, dirkey: str, mtime_ns: Optional[int]) -> None:
+        try:
+            wd = self._inotify.add_watch(dirkey)
+        except OSError as e:
+            if e.errno == errno.ENOENT:
+                self._subtrees.add(dirkey)
+            elif e.errno == errno.ENOSPC:
+                if not self._limit_reported:
+                    self._limit_reported = True
+                    self._report(
+                        f"inotify watch limit reached at {dirkey}; raise "
+                        "fs.inotify.max_user_watches to watch the whole tree"
+                    )
+            else:
+                self._report(f"Error watching {dirkey}: {e}")
+            return
+        self._watches[wd] = dirkey
+        self._watched[dirkey] = wd
+        # Entries added between the listing and the watch sent no
+        # event; a moved mtime sends the directory to ``_relist``.
+        try:
+            if mtime_ns is not None and os.stat(dirkey).st_mtime_ns != mtime_ns:
+                self._stale_dirs.add(dirkey)
+        except OSError:
+            self._subtrees.add(dirkey)
+
+    def _unwatch(self, dirkey: str) -> None:
+        wd = self._watched.pop(dirkey, None)
+        if wd is not None:
+            self._watches.pop(wd, None)
+            self._inotify.rm_watch(wd)
+
+    def _track_file(self, path: str) -> None:
+        self._files_by_dir.setdefault(_parent_key(path), set()).add(path)
+
+    def _untrack_file(self, path: str) -> None:
+        siblings = self._files_by_dir.get(_parent_key(path))
+        if siblings is not None:
+            siblings.discard(path)
+
+    def _track_dir(self, dirkey: str) -> None:
+        parent = _parent_key(dirkey)
+        if parent != dirkey:
+            self._subdirs.setdefault(parent, set()).add(dirkey)
+
+    def _subtree_dirs(self, top: str) -> List[str]:
+        """Return the indexed directories at and below ``top``."""
+        dirs = self.indexer.dirs
+        found = []
+        stack = [top]
+        while stack:
+            dirkey = stack.pop()
+            if dirkey in dirs:
+                found.append(dirkey)
+            stack.extend(self._subdirs.get(dirkey, ()))
+        return found
+
+    def _drop_dir(self, dirkey: str) -> List[str]:
+        """Forget an indexed directory; return the file paths it held."""
+        indexer = self.indexer
+        del indexer.dirs[dirkey]
+        indexer.dir_totals.pop(dirkey, None)
+        self._unwatch(dirkey)
+        self._subdirs.pop(dirkey, None)
+        siblings = self._subdirs.get(_parent_key(dirkey))
+        if siblings is not None:
+            siblings.discard(dirkey)
+        return list(self._files_by_dir.pop(dirkey, ()))
+
+    def _handle(self, wd: int, mask: int, cookie: int, name: str) -> None:
+        """Record one inotify event as a pending path or subtree."""
+        if mask & IN_Q_OVERFLOW:
+            self._overflow = True
+            return
+        dirkey = self._watches.get(wd)
+        if dirkey is None:
+            return
+        if mask & IN_IGNORED:
+            del self._watches[wd]
+            if self._watched.get(dirkey) == wd:
+                del self._watched[dirkey]
+            return
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+            # Other directories are handled through their parent's event.
+            if dirkey == self.root:
+                self._subtrees.add(dirkey)
+            return
+        if not name:
+            return
+        path = os.path.join(dirkey, name)
+        if not mask & IN_ISDIR:
+            self._paths.add(path)
+        elif mask & _DIR_ENTRY_EVENTS:
+            self._subtrees.add(path)
+
+    def _relist(self, dirkeys: Set[str]) -> None:
+        """Queue the entries of every directory whose mtime moved."""
+        indexer = self.indexer
+        changed: Set[str] = set()
+        for dirkey in dirkeys:
+            if dirkey not in indexer.dirs:
+                continue
+            try:
+                st = os.stat(dirkey)
+                if st.st_mtime_ns == indexer.dirs[dirkey]:
+                    continue
+                with os.scandir(dirkey) as it:
+                    entries = list(it)
+            except OSError:
+                self._subtrees.add(dirkey)
+                continue
+            changed.add(dirkey)
+            indexer.dirs[dirkey] = st.st_mtime_ns
+            for entry in entries:
+                child = os.path.join(dirkey, entry.name)
+                try:
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                except OSError:
+                    is_dir = False
+                if not is_dir:
+                    self._paths.add(child)
+                elif child not in indexer.dirs:
+                    self._subtrees.add(child)
+        if not changed:
+            return
+        # Known entries that were not listed again are gone.
+        for parent in changed:
+            self._paths.update(self._files_by_dir.get(parent, ()))
+            for dirkey in self._subdirs.get(parent, ()):
+                if dirkey not in changed and (
+                    not os.path.isdir(dirkey) or os.path.islink(dirkey)
+                ):
+                    self._subtrees.add(dirkey)
+
+    def apply_pending(self) -> int:
+        """Apply the pending events to the index and the ``files`` table.
+
+        Returns the number of paths upserted or removed.
+        """
+        indexer = self.indexer
+        if self._overflow:
+            self._overflow = False
+            self.changes["overflows"] += 1
+            self._stale_dirs.update(indexer.dirs)
+        if self._stale_dirs:
+            stale, self._stale_dirs = self._stale_dirs, set()
+            self._relist(stale)
+        subtrees = _outermost(self._subtrees)
+        paths = self._paths
+        self._subtrees, self._paths = set(), set()
+        if not subtrees and not paths:
+            self._maybe_refresh()
+            return 0
+
+        if indexer.fast_records:
+            indexer._indexed_at = datetime.now()
+        upserts: Dict[str, dict] = {}
+        removed: List[str] = []
+        touched: Set[str] = set()
+        prefixes = tuple(top.rstrip("/") + "/" for top in subtrees)
+        if subtrees:
+            for dirkey in [d for top in subtrees for d in self._subtree_dirs(top)]:
+                removed.extend(self._drop_dir(dirkey))
+            for path in removed:
+                del indexer.files[path]
+            for top in sorted(subtrees):
+                if top == self.root or _parent_key(top) in indexer.dirs:
+                    self._walk_subtree(top, upserts)
+                    touched.add(_parent_key(top))
+        for path in paths:
+            parent = _parent_key(path)
+            if (prefixes and path.startswith(prefixes)) or parent not in indexer.dirs:
+                continue
+            touched.add(parent)
+            record = self._stat_record(path)
+            if record is not None:
+                indexer._store_record(record)
+                self._track_file(path)
+                upserts[path] = record
+            elif path in indexer.files:
+                del indexer.files[path]
+                self._untrack_file(path)
+                removed.append(path)
+        for dirkey in touched:
+            if dirkey in indexer.dirs:
+                try:
+                    indexer.dirs[dirkey] = os.stat(dirkey).st_mtime_ns
+                except OSError:
+                    pass  # gone; its parent's event drops it
+
+        removed = [path for path in removed if path not in upserts]
+        if upserts or removed:
+            indexer._search_index = None
+            self._stats_dirty = True
+            self._write_rows(upserts, removed)
+        self.changes["upserted"] += len(upserts)
+        self.changes["removed"] += len(removed)
+        self._maybe_refresh()
+        return len(upserts) + len(removed)
+
+    def _walk_subtree(self, top: str, upserts: Dict[str, dict]) -> None:
+        indexer = self.indexer
+        if not os.path.isdir(top) or os.path.islink(top):
+            return
+        if indexer._filtered_out(top, is_dir=True):
+            return
+        for scan in indexer._walk(top):
+            if scan.other_device:
+                continue
+            for message in scan.errors:
+                self._report(message)
+                indexer.stats["skipped_paths"] += 1
+            indexer.dirs[scan.dirkey] = None if scan.errors else scan.mtime_ns
+            self._track_dir(scan.dirkey)
+            for record in scan.records:
+                indexer._store_record(record)
+                self._track_file(record["filepath"])
+                upserts[record["filepath"]] = record
+            self._watch(scan.dirkey, scan.mtime_ns)
+
+    def _stat_record(self, path: str) -> Optional[dict]:
+        """Return a fresh record for ``path``, or None if it is no longer a file."""
+        try:
+            st = os.lstat(path)
+            follow = stat.S_ISLNK(st.st_mode)
+            if follow:
+                st = os.stat(path)
+            if not stat.S_ISREG(st.st_mode):
+                return None
+            if self.indexer._filtered_out(path, is_dir=False, size=st.st_size):
+                return None
+            return self.indexer._record_file(path, _PathEntry(path), follow_symlinks=follow)
+        except OSError:
+            return None
+
+    def _write_rows(self, upserts: Dict[str, dict], removed: List[str]) -> None:
+        cursor = self._conn.cursor()
+        try:
+            cursor.executemany(
+                "DELETE FROM files WHERE filepath = ?", [(path,) for path in removed]
+            )
+            _upsert_files(cursor, [_file_row(record) for record in upserts.values()])
+            self._conn.commit()
+        except sqlite3.Error as e:
+            self._conn.rollback()
+            self._report(f"SQLite error: {str(e)}")
+
+    def _maybe_refresh(self) -> None:
+        if self._stats_dirty and time.monotonic() - self._last_refresh >= self.stats_interval:
+            self.refresh_statistics()
+
+    def refresh_statistics(self) -> Tuple[bool, Optional[str]]:
+        """Recompute the statistics and rollups and write ``dirs`` / ``statistics``."""
+        indexer = self.indexer
+        skipped = indexer.stats["skipped_paths"]
+        indexer._reset_stats()
+        stats = indexer.stats
+        stats["skipped_paths"] = skipped
+        totals = {dirkey: [0, 0, 0] for dirkey in indexer.dirs}
+        fields = indexer._iter_fields("filepath", "extension", "size", "on_disk")
+        for path, ext, size, on_disk in fields:
+            stats["total_files"] += 1
+            stats["total_size"] += size or 0
+            stats["extensions"][ext] += 1
+            direct = totals.get(_parent_key(path))
+            if direct is not None:
+                direct[0] += size or 0
+                direct[1] += on_disk or 0
+                direct[2] += 1
+        indexer.dir_totals = totals
+        indexer._finalize_stats()
+        self._stats_dirty = False
+        self._last_refresh = time.monotonic()
+        try:
+            cursor = self._conn.cursor()
+            indexer._write_dirs(cursor)
+            indexer._write_statistics(cursor)
+            self._conn.commit()
+            return True, None
+        except sqlite3.Error as e:
+            self._conn.rollback()
+            return False, f"SQLite error: {str(e)}"
@@ -0,0 +1,99 @@
+"""Tests for specs.disk.ages."""
+import os
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk.ages import AgeHistograms  # noqa: E402
+
+DAY = 86400
+
+
+class AgeHistogramsTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        now = time.time()
+        (self.root / "logs").mkdir()
+        (self.root / "src").mkdir()
+        self._write("logs/old.log", 100, atime=now - 400 * DAY, mtime=now - 3000 * DAY)
+        self._write("logs/week.log", 10, atime=now, mtime=now - 3 * DAY)
+        self._write("src/new.py", 5, atime=now, mtime=now)
+        self._write("top.txt", 1, atime=now - 40 * DAY, mtime=now - 40 * DAY)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _write(self, rel, size, atime, mtime):
+        path = self.root / rel
+        path.write_bytes(b"x" * size)
+        os.utime(path, (atime, mtime))
+
+    def _files(self, histograms, clock, dimension, key=""):
+        return histograms.counters[(clock, dimension, key)][0]
+
+    def test_walk_fills_buckets_per_dimension(self):
+        for fast in (False, True):
+            with self.subTest(fast_records=fast):
+                histograms = AgeHistograms()
+                indexer = FileIndexer(fast_records=fast, histograms=histograms)
+                indexer.index_directory(str(self.root))
+                # <1d, 1-7d, 7-30d, 30-90d, ..., >=1825d
+                self.assertEqual(
+                    self._files(histograms, "mtime", "all"), [1, 1, 0, 1, 0, 0, 0, 0, 1]
+                )
+                self.assertEqual(
+                    self._files(histograms, "atime", "all"), [2, 0, 0, 1, 0, 0, 1, 0, 0]
+                )
+                self.assertEqual(sum(self._files(histograms, "mtime", "top_dir", "logs")), 2)
+                self.assertEqual(self._files(histograms, "mtime", "top_dir", ".")[3], 1)
+                sizes = histograms.counters[("mtime", "extension", ".log")][1]
+                self.assertEqual(sizes[-1], 100)
+                self.assertEqual(sizes[1], 10)
+
+    def test_counters_reset_per_walk(self):
+        histograms = AgeHistograms()
+        indexer = FileIndexer(histograms=histograms)
+        indexer.index_directory(str(self.root))
+        indexer.index_directory(str(self.root))
+        self.assertEqual(sum(self._files(histograms, "mtime", "all")), 4)
+
+    def test_names_level_counts_nothing(self):
+        histograms = AgeHistograms()
+        FileIndexer(metadata="names", histograms=histograms).index_directory(str(self.root))
+        self.assertEqual(histograms.counters, {})
+
+    def test_export_and_reader(self):
+        db_path = str(self.root / "index.db")
+        indexer = FileIndexer(histograms=AgeHistograms())
+        indexer.index_directory(str(self.root / "logs"))
+        ok, err = indexer.export_to_sqlite(db_path)
+        self.assertTrue(ok, err)
+        with FileIndexer.open(db_path) as index:
+            rows = index.age_histogram("mtime", "extension", ".log")
+            self.assertEqual(rows, [(1, 7.0, 1, 10, rows[0][4]), (8, None, 1, 100, rows[1][4])])
+            self.assertEqual(index.age_histogram("mtime", "top_dir", "nope"), [])
+
+        # A second export without histograms keeps the old rows; a
+        # stream export with them replaces the table.
+        indexer = FileIndexer(histograms=AgeHistograms())
+        ok, err = indexer.stream_to_sqlite(str(self.root / "src"), db_path)
+        self.assertTrue(ok, err)
+        with FileIndexer.open(db_path) as index:
+            self.assertEqual(index.age_histogram("mtime", "extension", ".log"), [])
+            self.assertEqual(index.age_histogram("mtime", "all")[0][:3], (0, 1.0, 1))
+
+    def test_bucket_labels(self):
+        self.assertEqual(AgeHistograms((1, 7)).bucket_labels(), ["<1d", "1-7d", ">=7d"])
+
+
+if __name__ == "__main__":
+    unittest.main()
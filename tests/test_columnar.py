@@ -0,0 +1,125 @@
+"""Tests for specs.disk.columnar."""
+import csv
+import importlib.util
+import json
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk.columnar import (  # noqa: E402
+    export_columnar,
+    format_for_path,
+    stream_columnar,
+)
+from specs.disk.indexer import _FILE_COLUMNS, _file_row  # noqa: E402
+
+HAVE_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class ColumnarExportTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.out = Path(self._tmp.name)
+        self.root = self.out / "data"
+        _write(self.root / "a.txt", b"a" * 3)
+        _write(self.root / "sub" / "b.py", b"b" * 5)
+        _write(self.root / "sub" / "deep" / "c", b"")
+        self.indexer = FileIndexer()
+        self.indexer.index_directory(str(self.root))
+        self.expected = {
+            path: _file_row(info) for path, info in self.indexer.files.items()
+        }
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_format_for_path(self):
+        self.assertEqual(format_for_path("x.PARQUET"), "parquet")
+        self.assertEqual(format_for_path("x.feather"), "arrow")
+        self.assertEqual(format_for_path("x.jsonl"), "ndjson")
+        self.assertEqual(format_for_path("x.db"), "auto")
+
+    def test_ndjson_matches_sqlite_rows(self):
+        path = str(self.out / "index.ndjson")
+        ok, err = export_columnar(self.indexer, path, row_group_size=2)
+        self.assertTrue(ok, msg=err)
+        with open(path, encoding="utf-8") as f:
+            rows = [json.loads(line) for line in f]
+        self.assertEqual(len(rows), 3)
+        for row in rows:
+            self.assertEqual(
+                tuple(row[c] for c in _FILE_COLUMNS), self.expected[row["filepath"]]
+            )
+        self.assertFalse(os.path.exists(path + ".tmp"))
+
+    def test_stream_csv(self):
+        path = str(self.out / "index.csv")
+        indexer = FileIndexer(fast_records=True)
+        ok, err = stream_columnar(indexer, str(self.root), path, row_group_size=1)
+        self.assertTrue(ok, msg=err)
+        self.assertEqual(len(indexer.files), 0)
+        self.assertEqual(indexer.get_statistics(), self.indexer.get_statistics())
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+        self.assertEqual(
+            sorted((r["filepath"], int(r["size"])) for r in rows),
+            sorted((p, row[3]) for p, row in self.expected.items()),
+        )
+
+    def test_stream_dedups_symlinked_files(self):
+        link = self.root / "link.txt"
+        try:
+            os.symlink("a.txt", str(link))
+        except (AttributeError, NotImplementedError, OSError) as e:
+            self.skipTest(f"symlinks unsupported here: {e}")
+        walked = FileIndexer()
+        walked.index_directory(str(self.root))
+        streamed = FileIndexer()
+        ok, err = stream_columnar(streamed, str(self.root), str(self.out / "x.ndjson"))
+        self.assertTrue(ok, msg=err)
+        self.assertEqual(streamed.get_statistics(), walked.get_statistics())
+        self.assertEqual(streamed.stats["unique_files"], 3)
+        self.assertEqual(streamed.stats["logical_size"], 8)
+
+    def test_unknown_format(self):
+        ok, err = export_columnar(self.indexer, str(self.out / "x"), fmt="xlsx")
+        self.assertFalse(ok)
+        self.assertIn("xlsx", err)
+
+    @unittest.skipUnless(HAVE_PYARROW, "pyarrow is not installed")
+    def test_parquet_and_arrow(self):
+        import pyarrow.ipc
+        import pyarrow.parquet
+
+        parquet = str(self.out / "index.parquet")
+        ok, err = export_columnar(self.indexer, parquet, row_group_size=2)
+        self.assertTrue(ok, msg=err)
+        table = pyarrow.parquet.read_table(parquet)
+        self.assertEqual(pyarrow.parquet.ParquetFile(parquet).num_row_groups, 2)
+        self.assertEqual(table.column_names, list(_FILE_COLUMNS))
+        self.assertEqual(sorted(table.column("filepath").to_pylist()), sorted(self.expected))
+
+        arrow = str(self.out / "index.arrow")
+        ok, err = export_columnar(self.indexer, arrow)
+        self.assertTrue(ok, msg=err)
+        with pyarrow.memory_map(arrow) as source:
+            table = pyarrow.ipc.open_file(source).read_all()
+        self.assertEqual(sum(table.column("size").to_pylist()), 8)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Tests for specs.disk.diff.IndexDiff."""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk.diff import FileChange, IndexDiff, main  # noqa: E402
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class IndexDiffTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        self.root = tmp / "data"
+        _write(self.root / "same.txt", b"same")
+        _write(self.root / "grow.log", b"g" * 10)
+        _write(self.root / "shrink.log", b"s" * 10)
+        _write(self.root / "gone.txt", b"gone")
+        _write(self.root / "rename_me.bin", b"r" * 7)
+        _write(self.root / "olddir" / "inner.txt", b"inner")
+        self.old_db = str(tmp / "old.db")
+        self.new_db = str(tmp / "new.db")
+        self._export(self.old_db)
+
+        _write(self.root / "grow.log", b"g" * 25)
+        _write(self.root / "shrink.log", b"s" * 3)
+        # Create before deleting, so new.py cannot reuse gone.txt's inode.
+        _write(self.root / "new.py", b"n" * 40)
+        os.remove(self.root / "gone.txt")
+        os.rename(self.root / "rename_me.bin", self.root / "renamed.dat")
+        os.rename(self.root / "olddir", self.root / "newdir")
+        self._export(self.new_db)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _export(self, db: str, **options) -> None:
+        indexer = FileIndexer(**options)
+        indexer.index_directory(str(self.root))
+        ok, err = indexer.export_to_sqlite(db)
+        self.assertTrue(ok, msg=err)
+
+    def _key(self, name: str) -> str:
+        return (self.root / name).as_posix()
+
+    def test_changes(self):
+        diff = IndexDiff(self.old_db, self.new_db, work_dir=self._tmp.name)
+        changes = sorted(diff.changes())
+        self.assertEqual(
+            changes,
+            sorted([
+                FileChange("grown", self._key("grow.log"), None, 10, 25),
+                FileChange("shrunk", self._key("shrink.log"), None, 10, 3),
+                FileChange("removed", self._key("gone.txt"), None, 4, None),
+                FileChange("added", self._key("new.py"), None, None, 40),
+                FileChange(
+                    "moved", self._key("renamed.dat"), self._key("rename_me.bin"), 7, 7
+                ),
+                FileChange(
+                    "moved", self._key("newdir/inner.txt"), self._key("olddir/inner.txt"), 5, 5
+                ),
+            ]),
+        )
+        self.assertEqual(diff.counts["moved"], 2)
+        self.assertEqual(diff.bytes["grown"], 15)
+        self.assertEqual(diff.extensions[".py"], [1, 40])
+        self.assertEqual(diff.extensions[".bin"], [-1, -7])
+        self.assertEqual(diff.extensions[".log"], [0, 8])
+        # The spill database is removed once the iteration is done.
+        self.assertEqual(
+            sorted(os.listdir(self._tmp.name)), ["data", "new.db", "old.db"]
+        )
+
+    def test_names_level_index(self):
+        # Same tree as new.db, but without sizes: nothing grew or shrank.
+        names_db = os.path.join(self._tmp.name, "names.db")
+        self._export(names_db, metadata="names")
+        for old_db, new_db in ((names_db, self.new_db), (self.new_db, names_db)):
+            diff = IndexDiff(old_db, new_db)
+            self.assertEqual(list(diff.changes()), [])
+            self.assertFalse(any(diff.counts.values()))
+
+        argv, out = sys.argv, io.StringIO()
+        sys.argv = ["diff", self.old_db, names_db, "--list"]
+        try:
+            with contextlib.redirect_stdout(out):
+                self.assertEqual(main(), 0)
+        finally:
+            sys.argv = argv
+        listed = out.getvalue()
+        self.assertIn("- " + self._key("gone.txt"), listed)
+        self.assertNotIn(self._key("grow.log"), listed)
+
+    def test_top_dirs(self):
+        diff = IndexDiff(self.old_db, self.new_db)
+        rows = {row[0]: row for row in diff.top_dirs(10)}
+        _, size, on_disk, count = rows[self._key("olddir")]
+        self.assertEqual((size, count), (-5, -1))
+        self.assertLess(on_disk, 0)
+        self.assertEqual(rows[self._key("newdir")][1::2], (5, 1))
+        self.assertEqual(rows[self.root.as_posix()][1], 15 - 7 - 4 + 40)
+
+
+if __name__ == "__main__":
+    unittest.main()
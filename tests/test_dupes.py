@@ -0,0 +1,225 @@
+"""Tests for specs.disk.dupes.DuplicateFinder and specs.disk.hashcache.HashCache."""
+import contextlib
+import hashlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk.dupes import DuplicateFinder  # noqa: E402
+from specs.disk.hashcache import HashCache  # noqa: E402
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class DuplicateFinderTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name) / "data"
+        big = os.urandom(300)
+        # Same size, same head and tail, different middle: only the
+        # full hash can tell these apart (partial_bytes=100 below).
+        self.big = big
+        _write(self.root / "big1.bin", big)
+        _write(self.root / "sub" / "big2.bin", big)
+        _write(self.root / "big_other.bin", big[:150] + bytes([big[150] ^ 1]) + big[151:])
+        _write(self.root / "small1.txt", b"hello")
+        _write(self.root / "sub" / "small2.txt", b"hello")
+        _write(self.root / "same_size.txt", b"world")
+        _write(self.root / "empty1", b"")
+        _write(self.root / "empty2", b"")
+        self.hardlinked = True
+        try:
+            os.link(str(self.root / "big1.bin"), str(self.root / "big1_link.bin"))
+        except (OSError, NotImplementedError):
+            self.hardlinked = False
+        self.indexer = FileIndexer()
+        self.indexer.index_directory(str(self.root))
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _key(self, name: str) -> str:
+        return (self.root / name).as_posix()
+
+    def test_finds_identical_content_only(self):
+        finder = DuplicateFinder(self.indexer, workers=2, partial_bytes=100)
+        groups = finder.find()
+        self.assertEqual(finder.errors, [])
+        by_size = {group["size"]: group for group in groups}
+        self.assertEqual(sorted(by_size), [5, 300])
+
+        big = by_size[300]
+        expected = [self._key("big1.bin"), self._key("sub/big2.bin")]
+        if self.hardlinked:
+            expected.append(self._key("big1_link.bin"))
+        self.assertEqual(big["paths"], sorted(expected))
+        self.assertEqual(big["inodes"], 2)
+        self.assertEqual(
+            big["digest"], hashlib.blake2b(self.big, digest_size=32).hexdigest()
+        )
+        self.assertEqual(
+            by_size[5]["paths"],
+            [self._key("small1.txt"), self._key("sub/small2.txt")],
+        )
+
+        on_disk = self.indexer.files[self._key("sub/small2.txt")]["on_disk"]
+        self.assertEqual(by_size[5]["reclaimable"], on_disk)
+        self.assertEqual(
+            DuplicateFinder.reclaimable_bytes(groups),
+            by_size[5]["reclaimable"] + by_size[300]["reclaimable"],
+        )
+
+    def test_write_digests(self):
+        db = Path(self._tmp.name) / "index.db"
+        ok, err = self.indexer.export_to_sqlite(str(db))
+        self.assertTrue(ok, msg=err)
+        finder = DuplicateFinder(self.indexer, partial_bytes=100)
+        finder.find()
+        ok, err = finder.write_digests(str(db))
+        self.assertTrue(ok, msg=err)
+        with sqlite3.connect(str(db)) as conn:
+            digests = dict(conn.execute("SELECT filepath, digest FROM files"))
+        self.assertEqual(
+            digests[self._key("big1.bin")], digests[self._key("sub/big2.bin")]
+        )
+        self.assertNotEqual(
+            digests[self._key("big_other.bin")], digests[self._key("big1.bin")]
+        )
+        self.assertIsNone(digests[self._key("empty1")])
+
+    def test_reexport_keeps_digests_of_unchanged_files(self):
+        for version in (sqlite3.sqlite_version_info, (3, 23, 0)):
+            with self.subTest(sqlite=version), mock.patch.object(
+                sqlite3, "sqlite_version_info", version
+            ):
+                db = Path(self._tmp.name) / f"reexport-{version[1]}.db"
+                indexer = FileIndexer()
+                indexer.index_directory(str(self.root))
+                self.assertTrue(indexer.export_to_sqlite(str(db))[0])
+                finder = DuplicateFinder(indexer, partial_bytes=100)
+                finder.find()
+                self.assertTrue(finder.write_digests(str(db))[0])
+
+                _write(self.root / "sub" / "small2.txt", b"hello, world")
+                try:
+                    indexer = FileIndexer()
+                    indexer.index_directory(str(self.root))
+                    ok, err = indexer.export_to_sqlite(str(db), bulk=version[1] < 24)
+                    self.assertTrue(ok, msg=err)
+                finally:
+                    _write(self.root / "sub" / "small2.txt", b"hello")
+                with sqlite3.connect(str(db)) as conn:
+                    digests = dict(conn.execute("SELECT filepath, digest FROM files"))
+                self.assertEqual(
+                    digests[self._key("big1.bin")],
+                    hashlib.blake2b(self.big, digest_size=32).hexdigest(),
+                )
+                self.assertIsNotNone(digests[self._key("small1.txt")])
+                self.assertIsNone(digests[self._key("sub/small2.txt")])
+
+    def test_changed_file_is_reported_not_grouped(self):
+        _write(self.root / "sub" / "small2.txt", b"hello, world")
+        finder = DuplicateFinder(self.indexer, partial_bytes=100)
+        groups = finder.find()
+        self.assertNotIn(5, [group["size"] for group in groups])
+        self.assertEqual(
+            [path for path, _ in finder.errors], [self._key("sub/small2.txt")]
+        )
+
+
+class HashCacheTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name) / "data"
+        _write(self.root / "a.bin", b"A" * 500)
+        _write(self.root / "b.bin", b"A" * 500)
+        _write(self.root / "sub" / "c.txt", b"same")
+        _write(self.root / "sub" / "d.txt", b"same")
+        self.db = str(Path(self._tmp.name) / "index.db")
+        self.indexer = FileIndexer()
+        ok, err = self.indexer.index_incremental(str(self.root), self.db)
+        self.assertTrue(ok, msg=err)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _find(self):
+        with HashCache(self.db) as cache:
+            groups = DuplicateFinder(self.indexer, partial_bytes=100, cache=cache).find()
+        return groups, cache
+
+    def _cached_inodes(self):
+        with sqlite3.connect(self.db) as conn:
+            return {row[0] for row in conn.execute("SELECT inode FROM hash_cache")}
+
+    def test_repeat_run_reads_nothing(self):
+        first, cache = self._find()
+        self.assertEqual(cache.hits, 0)
+        self.assertGreater(cache.misses, 0)
+        second, cache = self._find()
+        self.assertEqual(second, first)
+        self.assertEqual(cache.misses, 0)
+        # Two partial + two full digests for the large pair, one
+        # whole-file digest each for the small pair.
+        self.assertEqual(cache.hits, 6)
+
+    def test_modified_file_is_rehashed(self):
+        self._find()
+        path = self.root / "b.bin"
+        st = os.stat(path)
+        _write(path, b"B" * 500)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+        self.indexer.index_directory(str(self.root))
+        groups, cache = self._find()
+        self.assertEqual([group["size"] for group in groups], [4])
+        self.assertGreater(cache.misses, 0)
+
+    def test_removed_file_is_evicted(self):
+        self._find()
+        gone = os.stat(self.root / "sub" / "d.txt").st_ino
+        self.assertIn(gone, self._cached_inodes())
+        os.remove(self.root / "sub" / "d.txt")
+        ok, err = self.indexer.index_incremental(str(self.root), self.db)
+        self.assertTrue(ok, msg=err)
+        self.assertEqual(self.indexer.changes["removed"], 1)
+        self.assertNotIn(gone, self._cached_inodes())
+        self.assertIn(os.stat(self.root / "sub" / "c.txt").st_ino, self._cached_inodes())
+
+    def test_default_dupes_run_prunes_deleted_files(self):
+        from specs.disk import drive
+
+        def run():
+            argv = sys.argv
+            sys.argv = ["drive", "--dir", str(self.root), "--db", self.db, "--dupes"]
+            try:
+                with contextlib.redirect_stdout(io.StringIO()):
+                    self.assertEqual(drive.main(), 0)
+            finally:
+                sys.argv = argv
+
+        run()
+        gone = {os.stat(self.root / name).st_ino for name in ("b.bin", "sub/d.txt")}
+        self.assertTrue(gone <= self._cached_inodes())
+        os.remove(self.root / "b.bin")
+        os.remove(self.root / "sub" / "d.txt")
+        run()
+        self.assertFalse(gone & self._cached_inodes())
+
+
+if __name__ == "__main__":
+    unittest.main()
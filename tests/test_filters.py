@@ -0,0 +1,121 @@
+"""Tests for specs.disk.filters."""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk.filters import PathFilter, read_patterns, relative_path  # noqa: E402
+
+
+class PathFilterRuleTests(unittest.TestCase):
+    def test_name_patterns_match_at_any_depth(self):
+        rules = PathFilter(exclude=["node_modules", "*.pyc", "cache/"])
+        self.assertTrue(rules.prune_dir("a/b/node_modules", "node_modules", 3))
+        self.assertTrue(rules.skip_file("pkg/mod.pyc", "mod.pyc"))
+        self.assertFalse(rules.skip_file("pkg/mod.py", "mod.py"))
+        # Trailing slash: directories only.
+        self.assertTrue(rules.prune_dir("x/cache", "cache", 2))
+        self.assertFalse(rules.skip_file("x/cache", "cache"))
+
+    def test_anchored_and_double_star_patterns(self):
+        rules = PathFilter(exclude=["/build", "docs/**/*.tmp", "**/dist"])
+        self.assertTrue(rules.prune_dir("build", "build", 1))
+        self.assertFalse(rules.prune_dir("src/build", "build", 2))
+        self.assertTrue(rules.skip_file("docs/a.tmp", "a.tmp"))
+        self.assertTrue(rules.skip_file("docs/x/y/a.tmp", "a.tmp"))
+        self.assertFalse(rules.skip_file("src/a.tmp", "a.tmp"))
+        self.assertTrue(rules.prune_dir("deep/er/dist", "dist", 3))
+
+    def test_negation_include_depth_and_size(self):
+        rules = PathFilter(
+            exclude=["*.log", "!keep.log"], include=["*.log", "*.txt"], max_depth=1, min_size=10
+        )
+        self.assertTrue(rules.skip_file("a.log", "a.log"))
+        self.assertFalse(rules.skip_file("keep.log", "keep.log"))
+        self.assertFalse(rules.skip_file("notes.txt", "notes.txt"))
+        self.assertTrue(rules.skip_file("img.png", "img.png"))
+        self.assertFalse(rules.prune_dir("a", "a", 1))
+        self.assertTrue(rules.prune_dir("a/b", "b", 2))
+        self.assertTrue(rules.skip_size(9))
+        self.assertTrue(rules.skip_size(None))
+        self.assertFalse(rules.skip_size(10))
+
+    def test_relative_path(self):
+        self.assertEqual(relative_path("/srv/data", "/srv/data"), "")
+        self.assertEqual(relative_path("/srv/data", "/srv/data/a/b"), "a/b")
+        self.assertEqual(relative_path("/", "/etc/hosts"), "etc/hosts")
+        self.assertEqual(relative_path(".", "./a/b"), "a/b")
+        self.assertEqual(relative_path(".", "a/b"), "a/b")
+
+    def test_read_patterns(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, ".gitignore")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("# build output\n\n/build\n*.o  \n")
+            self.assertEqual(read_patterns(path), ["/build", "*.o"])
+
+
+class FilteredWalkTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        for rel, size in (
+            ("main.py", 50),
+            ("tiny.py", 1),
+            ("main.pyc", 50),
+            ("src/lib.py", 50),
+            ("src/deep/er/x.py", 50),
+            (".git/objects/ab", 50),
+            ("web/node_modules/pkg/index.js", 50),
+        ):
+            path = self.root / rel
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"x" * size)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _names(self, indexer):
+        return sorted(info["filename"] for info in indexer.files.values())
+
+    def test_excluded_directories_are_never_scanned(self):
+        for workers, fast in ((1, False), (4, True)):
+            with self.subTest(workers=workers, fast_records=fast):
+                rules = PathFilter(exclude=[".git", "node_modules/", "*.pyc"])
+                indexer = FileIndexer(path_filter=rules, fast_records=fast)
+                indexer.index_directory(str(self.root), workers=workers)
+                self.assertEqual(self._names(indexer), ["lib.py", "main.py", "tiny.py", "x.py"])
+                self.assertFalse(any(".git" in key or "node_modules" in key for key in indexer.dirs))
+                self.assertEqual(indexer.get_statistics()["total_files"], 4)
+
+    def test_depth_and_size_rules(self):
+        indexer = FileIndexer(path_filter=PathFilter(max_depth=1, min_size=10, exclude=[".git/", "web"]))
+        indexer.index_directory(str(self.root))
+        self.assertEqual(self._names(indexer), ["lib.py", "main.py", "main.pyc"])
+
+    def test_filtered_stream_export(self):
+        db_path = str(self.root / "index.db")
+        indexer = FileIndexer(path_filter=PathFilter(include=["*.py"], exclude=[".git"]))
+        ok, err = indexer.stream_to_sqlite(str(self.root), db_path)
+        self.assertTrue(ok, err)
+        with FileIndexer.open(db_path) as index:
+            self.assertEqual(index.get_statistics()["total_files"], 4)
+
+    def test_min_size_needs_sizes(self):
+        with self.assertRaises(ValueError):
+            FileIndexer(metadata="names", path_filter=PathFilter(min_size=1))
+
+    def test_one_filesystem_rule(self):
+        indexer = FileIndexer(path_filter=PathFilter(one_filesystem=True))
+        self.assertTrue(indexer.one_filesystem)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,6 +10,7 @@ import sqlite3
 import sys
 import tempfile
 import unittest
+from datetime import datetime
 from pathlib import Path
 
 HERE = os.path.dirname(os.path.abspath(__file__))
@@ -18,6 +19,7 @@ if SRC not in sys.path:
     sys.path.insert(0, SRC)
 
 from specs.disk import FileIndexer  # noqa: E402
+from unittest import mock  # noqa: E402
 
 
 def _write(path: Path, data: bytes) -> None:
@@ -166,6 +168,37 @@ class FileIndexerSqliteTests(unittest.TestCase):
             ):
                 self.assertIn(key, stat_keys)
 
+    def test_bulk_export_matches_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "data"
+            for i in range(7):
+                _write(root / f"d{i % 3}" / f"f{i}.{'txt' if i % 2 else 'bin'}", b"x" * i)
+            indexer = FileIndexer()
+            indexer.index_directory(str(root))
+            tables = {}
+            for bulk in (False, True, True):  # second bulk run: existing rows
+                db = str(Path(tmp) / f"bulk-{bulk}.db")
+                ok, err = indexer.export_to_sqlite(db, bulk=bulk, chunk_size=3)
+                self.assertTrue(ok, msg=err)
+                conn = sqlite3.connect(db)
+                try:
+                    tables[bulk] = (
+                        conn.execute(
+                            "SELECT filepath, size, inode FROM files ORDER BY filepath"
+                        ).fetchall(),
+                        dict(conn.execute("SELECT key, value FROM statistics")),
+                        {r[0] for r in conn.execute(
+                            "SELECT name FROM sqlite_master WHERE type = 'index'"
+                        )},
+                        conn.execute("PRAGMA journal_mode").fetchone()[0],
+                    )
+                finally:
+                    conn.close()
+            self.assertEqual(tables[True][:3], tables[False][:3])
+            self.assertEqual(len(tables[True][0]), 7)
+            self.assertIn("idx_files_inode", tables[True][2])
+            self.assertEqual(tables[True][3], "delete")
+
 
 class FileIndexerWindowsStatTests(unittest.TestCase):
     """On Windows ``st_blocks`` is ``None``; the indexer must not crash."""
@@ -250,6 +283,669 @@ class FileIndexerSymlinkTests(unittest.TestCase):
             self.assertEqual(indexer.files[link.as_posix()]["size"], 64)
 
 
+class FileIndexerParallelWalkTests(unittest.TestCase):
+    """``workers > 1`` must produce the same records and stats as the serial walk."""
+
+    def test_parallel_matches_serial(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            for d in range(4):
+                for f in range(5):
+                    _write(root / f"d{d}" / f"s{f}" / f"f{f}.txt", b"x" * (d + f))
+                _write(root / f"d{d}" / f"top{d}.bin", b"y" * 10)
+            try:
+                os.link(str(root / "d0" / "top0.bin"), str(root / "d1" / "hl.bin"))
+            except (OSError, NotImplementedError):
+                pass
+
+            serial = FileIndexer()
+            serial.index_directory(str(root))
+            parallel = FileIndexer()
+            n = parallel.index_directory(str(root), workers=4)
+
+            self.assertEqual(n, serial.stats["total_files"])
+            self.assertEqual(set(parallel.files), set(serial.files))
+            self.assertEqual(parallel.get_statistics(), serial.get_statistics())
+
+    def test_parallel_perm_error_counts_skipped(self):
+        if hasattr(os, "geteuid") and os.geteuid() == 0:
+            self.skipTest("running as root, chmod 0o000 is bypassable")
+        if platform.system() == "Windows":
+            self.skipTest("POSIX-only chmod test")
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write(root / "a.txt", b"x")
+            locked = root / "locked"
+            locked.mkdir()
+            _write(locked / "secret.txt", b"y")
+            os.chmod(locked, 0o000)
+            try:
+                indexer = FileIndexer()
+                indexer.index_directory(str(root), workers=3)
+                stats = indexer.get_statistics()
+                self.assertEqual(stats["total_files"], 1)
+                self.assertEqual(stats["skipped_paths"], 1)
+            finally:
+                os.chmod(locked, 0o700)
+
+
+class FileIndexerIncrementalTests(unittest.TestCase):
+    """``index_incremental`` must reuse unchanged directories and write only deltas."""
+
+    @staticmethod
+    def _bump_mtime(path: Path) -> None:
+        # Guarantee a visible mtime change even on coarse-grained clocks.
+        st = os.stat(str(path))
+        os.utime(str(path), ns=(st.st_atime_ns, st.st_mtime_ns + 10 ** 9))
+
+    @staticmethod
+    def _age(*paths: Path) -> None:
+        # Fresh directories have racy mtimes and are never reused.
+        for path in paths:
+            st = os.stat(str(path))
+            os.utime(str(path), ns=(st.st_atime_ns, st.st_mtime_ns - 3600 * 10 ** 9))
+
+    def _rows(self, db: Path) -> dict:
+        with sqlite3.connect(str(db)) as conn:
+            return {
+                r[0]: r[1:]
+                for r in conn.execute("SELECT filepath, id, size FROM files")
+            }
+
+    def test_unchanged_tree_reuses_every_directory(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            _write(data / "a.txt", b"a")
+            _write(data / "sub" / "b.txt", b"bb")
+            self._age(data, data / "sub")
+            db = Path(tmp) / "index.db"
+
+            first = FileIndexer()
+            first.index_directory(str(data))
+            ok, err = first.export_to_sqlite(str(db))
+            self.assertTrue(ok, msg=err)
+            before = self._rows(db)
+
+            second = FileIndexer()
+            ok, err = second.index_incremental(str(data), str(db))
+            self.assertTrue(ok, msg=err)
+            self.assertEqual(
+                second.changes,
+                {"added": 0, "changed": 0, "removed": 0, "reused_dirs": 2},
+            )
+            self.assertEqual(self._rows(db), before)
+            self.assertEqual(
+                second.get_statistics(), first.get_statistics()
+            )
+
+    def test_racy_directory_is_rescanned(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            _write(data / "a.txt", b"a")
+            _write(data / "sub" / "b.txt", b"bb")
+            self._age(data)
+            db = Path(tmp) / "index.db"
+
+            first = FileIndexer()
+            ok, err = first.index_incremental(str(data), str(db))
+            self.assertTrue(ok, msg=err)
+            sub = (data / "sub").as_posix()
+            self.assertIsNone(first.dirs[sub])
+            self.assertIsNotNone(first.dirs[data.as_posix()])
+
+            # A file created in the same clock tick as the last change
+            # leaves the directory mtime as it was.
+            st = os.stat(str(data / "sub"))
+            _write(data / "sub" / "c.txt", b"c")
+            os.utime(str(data / "sub"), ns=(st.st_atime_ns, st.st_mtime_ns))
+
+            second = FileIndexer()
+            ok, err = second.index_incremental(str(data), str(db))
+            self.assertTrue(ok, msg=err)
+            self.assertEqual(second.changes["added"], 1)
+            self.assertEqual(second.changes["reused_dirs"], 1)
+            self.assertIn((data / "sub" / "c.txt").as_posix(), second.files)
+
+    def test_added_changed_removed_counts(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            _write(data / "keep" / "k.txt", b"k")
+            _write(data / "grow" / "g.txt", b"g")
+            _write(data / "gone" / "x.txt", b"x")
+            db = Path(tmp) / "index.db"
+
+            indexer = FileIndexer()
+            ok, err = indexer.index_incremental(str(data), str(db))
+            self.assertTrue(ok, msg=err)
+            self.assertEqual(indexer.changes["added"], 3)
+
+            # Replace g.txt through a rename (new inode, dir mtime moves),
+            # delete x.txt, add a new file.
+            _write(data / "grow" / "g.tmp", b"g" * 50)
+            os.replace(str(data / "grow" / "g.tmp"), str(data / "grow" / "g.txt"))
+            os.remove(str(data / "gone" / "x.txt"))
+            _write(data / "keep" / "new" / "n.txt", b"n")
+            for d in ("grow", "gone", "keep"):
+                self._bump_mtime(data / d)
+
+            indexer = FileIndexer()
+            ok, err = indexer.index_incremental(str(data), str(db))
+            self.assertTrue(ok, msg=err)
+            self.assertEqual(indexer.changes["added"], 1)
+            self.assertEqual(indexer.changes["changed"], 1)
+            self.assertEqual(indexer.changes["removed"], 1)
+
+            rows = self._rows(db)
+            self.assertEqual(len(rows), 3)
+            self.assertEqual(rows[(data / "grow" / "g.txt").as_posix()][1], 50)
+            self.assertNotIn((data / "gone" / "x.txt").as_posix(), rows)
+            with sqlite3.connect(str(db)) as conn:
+                total = conn.execute(
+                    "SELECT value FROM statistics WHERE key = 'total_files'"
+                ).fetchone()[0]
+            self.assertEqual(total, "3")
+
+
+class FileIndexerCompactStoreTests(unittest.TestCase):
+    """``compact=True`` must expose the same mapping, search and export."""
+
+    @staticmethod
+    def _without_indexed_at(files) -> dict:
+        return {
+            path: {k: v for k, v in info.items() if k != "indexed_at"}
+            for path, info in files.items()
+        }
+
+    def test_compact_matches_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            _write(data / "a.txt", b"hello")
+            _write(data / "sub" / "B.TXT", b"world!")
+            _write(data / "sub" / "deeper" / "c.md", b"abc")
+            _write(data / "noext", b"")
+
+            default = FileIndexer()
+            default.index_directory(str(data))
+            compact = FileIndexer(compact=True)
+            compact.index_directory(str(data))
+
+            self.assertEqual(len(compact.files), 4)
+            self.assertEqual(
+                self._without_indexed_at(compact.files),
+                self._without_indexed_at(default.files),
+            )
+            self.assertEqual(compact.get_statistics(), default.get_statistics())
+            self.assertEqual(
+                compact.search("txt", extensions=["txt"]),
+                default.search("txt", extensions=["txt"]),
+            )
+
+            db = Path(tmp) / "compact.db"
+            ok, err = compact.export_to_sqlite(str(db))
+            self.assertTrue(ok, msg=err)
+            with sqlite3.connect(str(db)) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            self.assertEqual(count, 4)
+
+    def test_compact_store_mapping_semantics(self):
+        from specs.disk.store import CompactFileStore
+
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp)
+            _write(data / "a.txt", b"1")
+            _write(data / "b.txt", b"22")
+            indexer = FileIndexer()
+            indexer.index_directory(str(data))
+
+        store = CompactFileStore()
+        for info in indexer.files.values():
+            store.add(info)
+        a, b = sorted(indexer.files)
+        self.assertIn(a, store)
+        self.assertEqual(store[a]["size"], 1)
+
+        store[a] = dict(indexer.files[a], size=99)
+        self.assertEqual(store[a]["size"], 99)
+        self.assertEqual(len(store), 2)
+
+        del store[b]
+        self.assertNotIn(b, store)
+        self.assertEqual(list(store), [a])
+        with self.assertRaises(KeyError):
+            store[b]
+
+
+class FileIndexerSearchIndexTests(unittest.TestCase):
+    """``build_search_index()`` must not change what ``search()`` returns."""
+
+    QUERIES = [
+        dict(pattern="report"),
+        dict(pattern="^rep.*2024"),
+        dict(pattern="REPORT", exact_match=False),
+        dict(pattern="report_2024.TXT", exact_match=True),
+        dict(pattern="ort", extensions=["txt", ".MD"]),
+        dict(pattern="", min_size=3, max_size=10),
+        dict(pattern="", max_size=0),
+        dict(pattern="[unclosed"),
+        dict(pattern="i"),
+        dict(pattern="no-such-name"),
+    ]
+
+    def test_indexed_search_matches_linear_scan(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp)
+            _write(data / "report_2024.txt", b"0123456789")
+            _write(data / "sub" / "Report_2023.md", b"abc")
+            _write(data / "sub" / "[unclosed].log", b"")
+            _write(data / "sub" / "deeper" / "summary.txt", b"x" * 50)
+            _write(data / "\u0131ndex.txt", b"12345")  # dotless i
+            indexer = FileIndexer()
+            indexer.index_directory(str(data))
+
+        expected = [indexer.search(**q) for q in self.QUERIES]
+        index = indexer.build_search_index()
+        self.assertEqual(len(index), 5)
+        for query, want in zip(self.QUERIES, expected):
+            self.assertEqual(indexer.search(**query), want, msg=query)
+        self.assertEqual(len(expected[0]), 2)
+
+    def test_new_walk_drops_search_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp)
+            _write(data / "a.txt", b"1")
+            indexer = FileIndexer()
+            indexer.index_directory(str(data))
+            indexer.build_search_index()
+            _write(data / "b.txt", b"2")
+            indexer.index_directory(str(data))
+        self.assertEqual(len(indexer.search("txt")), 2)
+
+
+class FileIndexerOpenTests(unittest.TestCase):
+    """``FileIndexer.open`` answers queries from the exported database."""
+
+    def test_reader_matches_in_memory_index(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            _write(data / "report_2024.txt", b"0123456789")
+            _write(data / "sub" / "Report_2023.md", b"abc")
+            _write(data / "sub" / "50%_off.txt", b"")
+            _write(data / "\u0131ndex.txt", b"12345")
+            indexer = FileIndexer()
+            indexer.index_directory(str(data))
+            db = Path(tmp) / "index.db"
+            ok, err = indexer.export_to_sqlite(str(db))
+            self.assertTrue(ok, msg=err)
+
+            queries = FileIndexerSearchIndexTests.QUERIES + [
+                dict(pattern="50%"),
+                dict(pattern="report", extensions=["TXT"], min_size=1),
+            ]
+            with FileIndexer.open(str(db)) as reader:
+                for query in queries:
+                    self.assertEqual(
+                        reader.search(**query), indexer.search(**query), msg=query
+                    )
+                self.assertEqual(reader.get_statistics(), indexer.get_statistics())
+                info = indexer.files[(data / "report_2024.txt").as_posix()]
+                self.assertEqual(
+                    reader.paths_for_inode(info["device"], info["inode"]),
+                    [info["filepath"]],
+                )
+                with self.assertRaises(sqlite3.OperationalError):
+                    reader.conn.execute("DELETE FROM files")
+
+    def test_functions_without_deterministic_flag(self):
+        # Python < 3.8 has no ``deterministic`` argument.
+        from specs.disk.reader import _create_function
+
+        class OldConnection:
+            def __init__(self):
+                self.functions = {}
+
+            def create_function(self, name, n_args, func):
+                self.functions[name] = func
+
+        conn = OldConnection()
+        _create_function(conn, "PY_LOWER", 1, str.lower)
+        self.assertEqual(conn.functions, {"PY_LOWER": str.lower})
+
+    def test_open_missing_database(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            with self.assertRaises(FileNotFoundError):
+                FileIndexer.open(str(Path(tmp) / "missing.db"))
+
+
+class FileIndexerDirRollupTests(unittest.TestCase):
+    """``dir_totals`` are du-style subtree sums, deduped by inode per subtree."""
+
+    def _tree(self, root: Path) -> None:
+        _write(root / "x" / "y" / "f.bin", b"F" * 10000)
+        _write(root / "z" / "a.txt", b"a")
+        try:
+            os.link(str(root / "x" / "y" / "f.bin"), str(root / "x" / "g.bin"))
+            os.link(str(root / "x" / "y" / "f.bin"), str(root / "z" / "h.bin"))
+        except (OSError, NotImplementedError) as e:
+            self.skipTest(f"hardlinks unsupported on this FS: {e}")
+
+    def test_rollups_dedup_hardlinks_per_subtree(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "data"
+            self._tree(root)
+            indexer = FileIndexer()
+            indexer.index_directory(str(root))
+            f_on_disk = os.stat(root / "x" / "y" / "f.bin").st_blocks * 512
+            a_on_disk = os.stat(root / "z" / "a.txt").st_blocks * 512
+
+        totals = indexer.dir_totals
+        stats = indexer.get_statistics()
+        key = root.as_posix()
+        self.assertEqual(
+            totals[key],
+            [stats["logical_size"], stats["on_disk_size"], stats["total_files"]],
+        )
+        self.assertEqual(totals[key + "/x"], [10000, f_on_disk, 2])
+        self.assertEqual(totals[key + "/x/y"], [10000, f_on_disk, 1])
+        self.assertEqual(totals[key + "/z"], [10001, f_on_disk + a_on_disk, 2])
+
+    def test_stream_and_export_store_same_rollups(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp) / "data"
+            self._tree(root)
+            exported = Path(tmp) / "export.db"
+            streamed = Path(tmp) / "stream.db"
+            indexer = FileIndexer()
+            indexer.index_directory(str(root))
+            ok, err = indexer.export_to_sqlite(str(exported))
+            self.assertTrue(ok, msg=err)
+            ok, err = FileIndexer().stream_to_sqlite(str(root), str(streamed))
+            self.assertTrue(ok, msg=err)
+
+            with FileIndexer.open(str(exported)) as a, FileIndexer.open(str(streamed)) as b:
+                self.assertEqual(a.top_dirs(10), b.top_dirs(10))
+                top = a.top_dirs(1)[0]
+                self.assertEqual(top[0], root.as_posix())
+                self.assertEqual(
+                    [row[0] for row in a.subdirs(root.as_posix())],
+                    [root.as_posix() + "/z", root.as_posix() + "/x"],
+                )
+
+
+class FileIndexerObserverTests(unittest.TestCase):
+    """An ``observer`` sees every directory and receives the errors."""
+
+    def test_metrics_cover_the_walk(self):
+        import json
+        from specs.disk.progress import WalkMetrics
+
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write(root / "a.txt", b"x")
+            _write(root / "sub" / "b.txt", b"yy")
+            _write(root / "sub" / "deeper" / "c.txt", b"zzz")
+            real_record = FileIndexer._record_file
+
+            def flaky(self, filepath, entry, follow_symlinks=False):
+                if entry.name == "c.txt":
+                    raise PermissionError("denied")
+                return real_record(self, filepath, entry, follow_symlinks)
+
+            for workers in (1, 4):
+                metrics = WalkMetrics(slowest=2)
+                indexer = FileIndexer(observer=metrics)
+                with mock.patch.object(FileIndexer, "_record_file", flaky), \
+                        mock.patch("builtins.print") as printed:
+                    indexer.index_directory(str(root), workers=workers)
+                printed.assert_not_called()
+
+                report = json.loads(json.dumps(metrics.to_dict()))
+                self.assertEqual(report["dirs"], 3)
+                self.assertEqual(report["files"], 2)
+                self.assertEqual(report["bytes"], 3)
+                self.assertEqual(report["stat_latency"]["count"], 2)
+                self.assertEqual(sum(report["stat_latency"]["histogram"].values()), 2)
+                self.assertEqual(report["error_count"], 1)
+                self.assertIn("c.txt", report["errors"][0])
+                self.assertEqual(len(report["slowest_dirs"]), 2)
+                self.assertGreaterEqual(report["queue_depth"]["max"], 1)
+                self.assertIsNotNone(metrics.finished)
+                self.assertEqual(indexer.get_statistics()["skipped_paths"], 1)
+
+    def test_progress_printer_writes_final_line(self):
+        import io
+        from specs.disk.progress import ProgressPrinter
+
+        with tempfile.TemporaryDirectory() as tmp:
+            _write(Path(tmp) / "a.txt", b"x")
+            out = io.StringIO()
+            FileIndexer(observer=ProgressPrinter(stream=out)).index_directory(tmp)
+        self.assertTrue(out.getvalue().endswith("\n"))
+        self.assertIn("1 files in 1 dirs", out.getvalue())
+
+
+class FileIndexerFastRecordsTests(unittest.TestCase):
+    """``fast_records=True`` must index and export the same data."""
+
+    def test_fast_records_match_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            _write(data / "a.txt", b"hello")
+            _write(data / "sub" / "b.md", b"world!")
+            _write(data / "sub" / "deeper" / "c", b"")
+
+            default = FileIndexer()
+            default.index_directory(str(data))
+            fast = FileIndexer(fast_records=True)
+            # A trailing separator must not change the keys.
+            fast.index_directory(str(data) + os.sep)
+            compact = FileIndexer(compact=True, fast_records=True)
+            compact.index_directory(str(data))
+
+            self.assertEqual(sorted(fast.files), sorted(default.files))
+            self.assertEqual(sorted(compact.files), sorted(default.files))
+            self.assertEqual(fast.get_statistics(), default.get_statistics())
+            self.assertEqual(fast.dir_totals, default.dir_totals)
+            indexed_at = {info["indexed_at"] for info in fast.files.values()}
+            self.assertEqual(len(indexed_at), 1)
+
+            rows = {}
+            for name, indexer in (("default", default), ("fast", fast), ("compact", compact)):
+                db = Path(tmp) / f"{name}.db"
+                ok, err = indexer.export_to_sqlite(str(db))
+                self.assertTrue(ok, msg=err)
+                with sqlite3.connect(str(db)) as conn:
+                    rows[name] = conn.execute(
+                        "SELECT filepath, size, on_disk, inode, last_modified "
+                        "FROM files ORDER BY filepath"
+                    ).fetchall()
+            self.assertEqual(rows["fast"], rows["compact"])
+            for slow, quick in zip(rows["default"], rows["fast"]):
+                self.assertEqual(slow[:4], quick[:4])
+                delta = datetime.fromisoformat(slow[4]) - datetime.fromisoformat(quick[4])
+                self.assertLessEqual(abs(delta.total_seconds()), 1e-6)
+
+    def test_dot_root_keys_match_default(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            _write(Path(tmp) / "a.txt", b"hello")
+            _write(Path(tmp) / "sub" / "b.md", b"world!")
+            cwd = os.getcwd()
+            os.chdir(tmp)
+            try:
+                default = FileIndexer()
+                default.index_directory(".")
+                fast = FileIndexer(fast_records=True)
+                fast.index_directory(".")
+            finally:
+                os.chdir(cwd)
+            self.assertEqual(sorted(default.files), ["a.txt", "sub/b.md"])
+            self.assertEqual(sorted(fast.files), sorted(default.files))
+            self.assertEqual(sorted(fast.dirs), sorted(default.dirs))
+            self.assertEqual(fast.dir_totals, default.dir_totals)
+
+
+class _NoStatEntry:
+    """``DirEntry`` stand-in that fails the test if ``stat`` is called."""
+
+    def __init__(self, entry):
+        self._entry = entry
+        self.name = entry.name
+        self.path = entry.path
+
+    def is_symlink(self):
+        return self._entry.is_symlink()
+
+    def is_file(self, follow_symlinks=True):
+        return self._entry.is_file(follow_symlinks=follow_symlinks)
+
+    def is_dir(self, follow_symlinks=True):
+        return self._entry.is_dir(follow_symlinks=follow_symlinks)
+
+    def stat(self, follow_symlinks=True):
+        raise AssertionError(f"stat() called for {self.name}")
+
+
+_REAL_SCANDIR = os.scandir
+
+
+class _NoStatScandir:
+    def __init__(self, path):
+        self._it = _REAL_SCANDIR(path)
+
+    def __enter__(self):
+        return (_NoStatEntry(entry) for entry in self._it)
+
+    def __exit__(self, *exc):
+        self._it.close()
+
+
+class FileIndexerMetadataLevelTests(unittest.TestCase):
+    """``metadata="names"`` / ``"size"`` record less and stat less."""
+
+    def _tree(self, root: Path) -> None:
+        _write(root / "a.TXT", b"hello")
+        _write(root / "sub" / "b.md", b"world!")
+        _write(root / "sub" / "c", b"")
+
+    def test_names_level_never_stats(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            self._tree(Path(tmp))
+            indexer = FileIndexer(metadata="names")
+            with mock.patch("os.scandir", _NoStatScandir):
+                self.assertEqual(indexer.index_directory(tmp), 3)
+            db = Path(tmp) / "names.db"
+            ok, err = indexer.export_to_sqlite(str(db))
+            self.assertTrue(ok, msg=err)
+
+        info = indexer.files[(Path(tmp) / "a.TXT").as_posix()]
+        self.assertEqual(info["extension"], ".txt")
+        for field in ("size", "on_disk", "inode", "device", "last_modified"):
+            self.assertIsNone(info[field])
+        stats = indexer.get_statistics()
+        self.assertEqual(stats["total_files"], 3)
+        self.assertEqual(stats["unique_files"], 3)
+        self.assertEqual(stats["total_size"], 0)
+        self.assertEqual(stats["unique_extensions"], 3)
+        self.assertEqual(indexer.search("", min_size=0), [])
+        self.assertEqual(len(indexer.search("b")), 1)
+
+    def test_size_level_records_sizes_only(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            self._tree(data)
+            full = FileIndexer()
+            full.index_directory(str(data))
+            sized = FileIndexer(metadata="size")
+            sized.index_directory(str(data))
+            streamed = FileIndexer(metadata="size")
+            ok, err = streamed.stream_to_sqlite(str(data), str(Path(tmp) / "s.db"))
+            self.assertTrue(ok, msg=err)
+
+        key = (data / "sub" / "b.md").as_posix()
+        self.assertEqual(sized.files[key]["size"], 6)
+        self.assertEqual(sized.files[key]["last_modified"], full.files[key]["last_modified"])
+        self.assertIsNone(sized.files[key]["inode"])
+        self.assertEqual(sized.get_statistics(), full.get_statistics())
+        self.assertEqual(streamed.get_statistics()["logical_size"], 11)
+
+    def test_unknown_level_rejected(self):
+        with self.assertRaises(ValueError):
+            FileIndexer(metadata="everything")
+
+
+class FileIndexerStreamingTests(unittest.TestCase):
+    """``stream_to_sqlite`` must match the in-memory export without keeping records."""
+
+    def _rows(self, db: Path) -> set:
+        with sqlite3.connect(str(db)) as conn:
+            return set(
+                conn.execute(
+                    "SELECT filepath, filename, extension, size, on_disk, "
+                    "blocks, nlinks, inode, device, last_modified FROM files"
+                ).fetchall()
+            )
+
+    def test_stream_matches_export(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            for i in range(7):
+                _write(data / f"d{i % 3}" / f"f{i}.bin", b"z" * (i * 100))
+            try:
+                os.link(str(data / "d0" / "f0.bin"), str(data / "d1" / "hl.bin"))
+            except (OSError, NotImplementedError):
+                pass
+
+            memory = FileIndexer()
+            memory.index_directory(str(data))
+            ok, err = memory.export_to_sqlite(str(Path(tmp) / "memory.db"))
+            self.assertTrue(ok, msg=err)
+
+            streamed = FileIndexer()
+            db = Path(tmp) / "stream.db"
+            ok, err = streamed.stream_to_sqlite(str(data), str(db), batch_size=2)
+            self.assertTrue(ok, msg=err)
+
+            self.assertEqual(len(streamed.files), 0)
+            self.assertEqual(streamed.get_statistics(), memory.get_statistics())
+            self.assertEqual(self._rows(db), self._rows(Path(tmp) / "memory.db"))
+
+            # A second run drops rows for paths that disappeared.
+            os.remove(str(data / "d2" / "f2.bin"))
+            ok, err = FileIndexer().stream_to_sqlite(str(data), str(db))
+            self.assertTrue(ok, msg=err)
+            paths = {row[0] for row in self._rows(db)}
+            self.assertNotIn((data / "d2" / "f2.bin").as_posix(), paths)
+            self.assertEqual(len(paths), len(memory.files) - 1)
+
+    def test_failure_midway_keeps_committed_batches(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            data = Path(tmp) / "data"
+            for d in range(3):
+                for f in range(2):
+                    _write(data / f"d{d}" / f"f{f}.txt", b"x")
+            db = Path(tmp) / "partial.db"
+
+            real = FileIndexer._record_file
+            calls = []
+
+            def flaky(self, *args, **kwargs):
+                calls.append(1)
+                if len(calls) == 5:
+                    raise RuntimeError("simulated crash")
+                return real(self, *args, **kwargs)
+
+            with mock.patch.object(FileIndexer, "_record_file", flaky):
+                ok, err = FileIndexer().stream_to_sqlite(
+                    str(data), str(db), batch_size=1
+                )
+            self.assertFalse(ok)
+            self.assertIn("simulated crash", err)
+            # The crash hits the third directory; the first two were
+            # already committed batch by batch.
+            with sqlite3.connect(str(db)) as conn:
+                count = conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            self.assertEqual(count, 4)
+
+
 class FileIndexerMigrationTests(unittest.TestCase):
     """A pre-0.4.1 DB must be migrated in place by ``export_to_sqlite``."""
 
@@ -0,0 +1,147 @@
+"""Tests for specs.disk.multiroot and FileIndexer(one_filesystem=True)."""
+import contextlib
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+import unittest
+from collections import namedtuple
+from pathlib import Path
+from unittest import mock
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk import drive  # noqa: E402
+from specs.disk.multiroot import MultiRootIndexer, _index_device, select_mounts  # noqa: E402
+
+Partition = namedtuple("Partition", "device mountpoint fstype opts")
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+class SelectMountsTests(unittest.TestCase):
+    def test_skips_pseudo_and_repeated_devices(self):
+        partitions = [
+            Partition("/dev/sda1", "/", "ext4", "rw"),
+            Partition("/dev/loop0", "/snap/core/1", "squashfs", "ro"),
+            Partition("/dev/sdb1", "/data", "xfs", "rw"),
+            Partition("/dev/sdb1", "/data/bind", "xfs", "rw"),
+        ]
+        self.assertEqual(select_mounts(partitions), ["/", "/data"])
+
+
+class MultiRootIndexerTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        self.a = tmp / "a"
+        self.b = tmp / "b"
+        _write(self.a / "one.txt", b"1" * 10)
+        _write(self.a / "sub" / "two.py", b"2" * 20)
+        _write(self.b / "three.txt", b"3" * 30)
+        self.db = str(tmp / "index.db")
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _index(self, roots):
+        indexer = MultiRootIndexer([str(r) for r in roots], processes=2)
+        ok, err = indexer.index_to_sqlite(self.db)
+        self.assertTrue(ok, msg=err)
+        return indexer
+
+    def test_plan_drops_nested_roots_only(self):
+        prefix_twin = Path(self._tmp.name) / "ab"
+        prefix_twin.mkdir()
+        plan = MultiRootIndexer([str(self.a / "sub"), str(self.a), str(prefix_twin)]).plan()
+        roots = sorted(root for group in plan.values() for root in group)
+        self.assertEqual(roots, sorted([str(self.a), str(prefix_twin)]))
+
+    def test_merged_statistics_cover_every_root(self):
+        indexer = self._index([self.a, self.b, self.a / "sub"])
+        stats = indexer.get_statistics()
+        self.assertEqual(stats["total_files"], 3)
+        self.assertEqual(stats["logical_size"], 60)
+        self.assertEqual(dict(stats["top_extensions"]), {".txt": 2, ".py": 1})
+        with FileIndexer.open(self.db) as index:
+            self.assertEqual(index.get_statistics(), stats)
+            self.assertEqual(
+                [row[1] for row in index.search("^t")],
+                ["three.txt", "two.py"],
+            )
+            totals = {row[0]: row[3] for row in index.top_dirs(10)}
+        self.assertEqual(totals[self.a.as_posix()], 2)
+        self.assertEqual(totals[self.b.as_posix()], 1)
+
+    def test_rerun_drops_rows_of_removed_roots(self):
+        self._index([self.a, self.b])
+        stats = self._index([self.b]).get_statistics()
+        self.assertEqual(stats["total_files"], 1)
+        with sqlite3.connect(self.db) as conn:
+            paths = [row[0] for row in conn.execute("SELECT filepath FROM files")]
+        self.assertEqual(paths, [(self.b / "three.txt").as_posix()])
+
+    def test_missing_root_is_reported(self):
+        indexer = self._index([self.a, self.b.parent / "missing"])
+        self.assertEqual(len(indexer.errors), 1)
+        self.assertEqual(indexer.get_statistics()["skipped_paths"], 1)
+
+    def test_workers_reach_every_shard_walk(self):
+        shard = str(Path(self._tmp.name) / "shard.db")
+        with mock.patch.object(
+            FileIndexer, "stream_to_sqlite", return_value=(True, None)
+        ) as stream:
+            _index_device([(str(self.a), shard)], {}, workers=4)
+        stream.assert_called_once_with(str(self.a), shard, workers=4)
+
+    def test_drive_passes_workers_to_the_shards(self):
+        argv = ["drive", "--dir", str(self.a), "--dir", str(self.b),
+                "--db", self.db, "--workers", "4"]
+        with mock.patch.object(drive, "MultiRootIndexer") as cls:
+            cls.return_value.errors = []
+            cls.return_value.index_to_sqlite.return_value = (False, "stop")
+            with mock.patch.object(sys, "argv", argv):
+                with contextlib.redirect_stderr(io.StringIO()):
+                    self.assertEqual(drive.main(), 1)
+        self.assertEqual(cls.call_args[1]["workers"], 4)
+
+
+class OneFilesystemTests(unittest.TestCase):
+    def test_other_device_subtree_is_skipped(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            root = Path(tmp)
+            _write(root / "here.txt", b"x")
+            _write(root / "mnt" / "there.txt", b"y")
+            real_stat = os.stat
+            mount = str(root / "mnt")
+
+            def fake_stat(path, *args, **kwargs):
+                st = real_stat(path, *args, **kwargs)
+                if os.fspath(path) == mount:
+                    fields = list(st)
+                    fields[2] = st.st_dev + 1  # st_dev
+                    return os.stat_result(fields)
+                return st
+
+            with mock.patch("specs.disk.indexer.os.stat", fake_stat):
+                indexer = FileIndexer(one_filesystem=True)
+                indexer.index_directory(tmp)
+                self.assertEqual(
+                    [Path(p).name for p in indexer.files], ["here.txt"]
+                )
+                indexer = FileIndexer()
+                indexer.index_directory(tmp)
+                self.assertEqual(len(indexer.files), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
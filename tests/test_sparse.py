@@ -0,0 +1,97 @@
+"""Tests for specs.disk.sparse."""
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk.sparse import analyze_allocation, file_allocation, probe_extents  # noqa: E402
+
+MiB = 1024 * 1024
+
+
+class FileAllocationTests(unittest.TestCase):
+    def test_ratio_and_slack(self):
+        self.assertEqual(file_allocation(8192, 2048), (0.75, 0))
+        self.assertEqual(file_allocation(10, 4096), (0.0, 4086))
+        self.assertEqual(file_allocation(0, 0), (0.0, 0))
+        self.assertEqual(file_allocation(None, None), (0.0, 0))
+
+
+class AnalyzeAllocationTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self._tmp.name)
+        self.sparse = self.root / "disk.img"
+        with open(self.sparse, "wb") as f:
+            f.write(b"head")
+            f.seek(4 * MiB)
+            f.write(b"tail")
+        with open(self.root / "small.txt", "wb") as f:
+            f.write(b"x")
+        st = os.stat(self.sparse)
+        self.holes_supported = st.st_blocks * 512 < st.st_size
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_report(self):
+        indexer = FileIndexer()
+        indexer.index_directory(str(self.root))
+        report = analyze_allocation(indexer, top=5, probe=1)
+        self.assertEqual(report["files"], 2)
+        self.assertEqual(report["logical_size"], 4 * MiB + 5)
+        if self.holes_supported:
+            self.assertEqual(report["sparse_files"], 1)
+            path, size, on_disk, ratio = report["top_sparse"][0]
+            self.assertEqual(path, self.sparse.as_posix())
+            self.assertEqual(report["sparse_bytes"], size - on_disk)
+            self.assertGreater(ratio, 0.9)
+        if report["probed"]:
+            probed = report["probed"][0]
+            self.assertEqual(probed["path"], self.sparse.as_posix())
+            self.assertEqual(probed["data"] + probed["holes"], 4 * MiB + 4)
+            self.assertGreaterEqual(probed["data"], 8)
+
+    def test_names_level_records_are_skipped(self):
+        indexer = FileIndexer(metadata="names")
+        indexer.index_directory(str(self.root))
+        report = analyze_allocation(indexer)
+        self.assertEqual(report["files"], 0)
+        self.assertEqual(report["efficiency"], 1.0)
+
+    def test_symlinked_file_counts_once(self):
+        try:
+            os.symlink("disk.img", str(self.root / "link.img"))
+        except (AttributeError, NotImplementedError, OSError) as e:
+            self.skipTest(f"symlinks unsupported here: {e}")
+        indexer = FileIndexer()
+        indexer.index_directory(str(self.root))
+        self.assertEqual(len(indexer.files), 3)
+        report = analyze_allocation(indexer, top=5, probe=5)
+        self.assertEqual(report["files"], 2)
+        self.assertEqual(report["logical_size"], 4 * MiB + 5)
+        self.assertEqual(report["on_disk_size"], indexer.stats["on_disk_size"])
+        self.assertLessEqual(len(report["top_sparse"]), 1)
+        self.assertEqual(len({p["path"] for p in report["probed"]}), len(report["probed"]))
+        self.assertLessEqual(len(report["probed"]), 2)
+
+    @unittest.skipUnless(hasattr(os, "SEEK_DATA"), "no SEEK_DATA on this platform")
+    def test_probe_empty_and_dense(self):
+        empty = self.root / "empty"
+        empty.touch()
+        self.assertEqual(
+            probe_extents(str(empty)), {"size": 0, "data": 0, "holes": 0, "data_runs": 0}
+        )
+        dense = probe_extents(str(self.root / "small.txt"))
+        self.assertEqual((dense["data"], dense["holes"], dense["data_runs"]), (1, 0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
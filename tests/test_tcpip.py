@@ -0,0 +1,582 @@
+"""Loopback tests for specs.communicate.tcpip."""
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.communicate.tcpip import client, framing  # noqa: E402
+from specs.communicate.tcpip.aserver import AsyncFileServer  # noqa: E402
+from specs.communicate.tcpip.protocol import receive_body, receive_file_header, recv_all  # noqa: E402
+from specs.communicate.tcpip.server import receive_files  # noqa: E402
+
+
+def _receive_one(listener, out):
+    conn, _ = listener.accept()
+    with conn:
+        name, size = receive_file_header(conn)
+        out.append((name, size, recv_all(conn, size) if size else b""))
+
+
+class SendFileTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self._tmp.name, "payload.bin")
+        self.payload = os.urandom(3 * 1024 * 1024 + 17)
+        with open(self.path, "wb") as f:
+            f.write(self.payload)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _send(self, **options):
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(1)
+        out = []
+        receiver = threading.Thread(target=_receive_one, args=(listener, out))
+        receiver.start()
+        try:
+            with socket.create_connection(listener.getsockname()) as sock:
+                client.send_file(sock, self.path, **options)
+        finally:
+            receiver.join(10)
+            listener.close()
+        return out[0]
+
+    def test_sendfile_and_buffered_paths(self):
+        for use_sendfile in (True, False):
+            with self.subTest(use_sendfile=use_sendfile):
+                name, size, data = self._send(use_sendfile=use_sendfile, chunk_size=1024 * 1024)
+                self.assertEqual((name, size), ("payload.bin", len(self.payload)))
+                self.assertEqual(data, self.payload)
+
+    def test_progress_sees_every_byte(self):
+        seen = []
+        a, b = socket.socketpair()
+        try:
+            reader = threading.Thread(target=recv_all, args=(b, len(self.payload)))
+            reader.start()
+            with open(self.path, "rb") as f:
+                client.send_body(a, f, len(self.payload), chunk_size=1024 * 1024, progress=seen.append)
+            reader.join(10)
+        finally:
+            a.close()
+            b.close()
+        self.assertEqual(sum(seen), len(self.payload))
+        self.assertEqual(len(seen), 4)
+
+    def test_short_file_raises(self):
+        small = os.path.join(self._tmp.name, "small.bin")
+        with open(small, "wb") as f:
+            f.write(b"x" * 100)
+        a, b = socket.socketpair()
+        try:
+            for use_sendfile in (True, False):
+                with open(small, "rb") as f, self.assertRaises(EOFError):
+                    client.send_body(a, f, 200, use_sendfile=use_sendfile)
+        finally:
+            a.close()
+            b.close()
+
+
+class ReceiveTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, "src")
+        self.dst = os.path.join(self._tmp.name, "dst")
+        os.makedirs(self.src)
+        os.makedirs(self.dst)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_receive_body_reuses_small_buffer(self):
+        payload = os.urandom(100_000)
+        a, b = socket.socketpair()
+        try:
+            sender = threading.Thread(target=a.sendall, args=(payload,))
+            sender.start()
+            out = os.path.join(self.dst, "x")
+            with open(out, "wb") as f:
+                self.assertEqual(receive_body(b, f, len(payload), bytearray(4096)), len(payload))
+            sender.join(10)
+            a.close()
+            with open(out, "wb") as f, self.assertRaises(EOFError):
+                receive_body(b, f, 1, bytearray(16))
+        finally:
+            a.close()
+            b.close()
+
+    def test_receive_files_saves_each_file(self):
+        contents = {"a.txt": b"alpha" * 1000, "empty": b"", "b.bin": os.urandom(70_000)}
+        for name, data in contents.items():
+            with open(os.path.join(self.src, name), "wb") as f:
+                f.write(data)
+        a, b = socket.socketpair()
+
+        def send_all():
+            try:
+                for name in contents:
+                    client.send_file(a, os.path.join(self.src, name))
+            finally:
+                a.close()
+
+        sender = threading.Thread(target=send_all)
+        sender.start()
+        try:
+            # A disconnect between files is the normal end of a v1 stream.
+            receive_files(b, self.dst, bytearray(8192))
+        finally:
+            sender.join(10)
+            b.close()
+        for name, data in contents.items():
+            with open(os.path.join(self.dst, name), "rb") as f:
+                self.assertEqual(f.read(), data)
+
+
+    def test_receive_files_still_fails_mid_file(self):
+        a, b = socket.socketpair()
+        try:
+            a.sendall((5).to_bytes(4, "big") + b"x.bin" + (10).to_bytes(8, "big") + b"abc")
+            a.close()
+            with self.assertRaises(EOFError):
+                receive_files(b, self.dst, bytearray(64))
+        finally:
+            b.close()
+
+
+def _write_tree(root, contents):
+    for name, data in contents.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+
+def _bad_batch_session(sock):
+    """Run a v2 session whose BATCH head claims one byte more than its files hold."""
+    sock.sendall(framing.HELLO.pack(framing.MAGIC, framing.VERSION, framing.CAP_BATCH))
+    recv_all(sock, framing.HELLO.size)
+    bodies = [(b"one.txt", b"abc"), (b"two.txt", b"defgh")]
+    table = b"".join(framing.ENTRY.pack(len(n), len(d), 0) + n for n, d in bodies)
+    head = framing.BATCH_HEAD.pack(framing.FRAME_BATCH, len(bodies), len(table), 8 + 1)
+    framing.send_buffers(sock, [head, table] + [d for _n, d in bodies] + [b"x"])
+    try:
+        sock.sendall(bytes([framing.FRAME_END]))
+        return sock.recv(framing.ACK.size)
+    except ConnectionResetError:  # the server closed with our bytes unread
+        return b""
+
+
+class FramingTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, "src")
+        self.dst = os.path.join(self._tmp.name, "dst")
+        self.contents = {f"small/{i:03d}.txt": os.urandom(i * 31) for i in range(50)}
+        self.contents["big.bin"] = os.urandom(framing.SMALL_FILE + 12345)
+        _write_tree(self.src, self.contents)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _session(self, send, **writer_options):
+        a, b = socket.socketpair()
+        result = {}
+
+        def serve():
+            try:
+                result["served"] = receive_files(b, self.dst, bytearray(4096))
+            except Exception as e:
+                result["error"] = e
+
+        server = threading.Thread(target=serve)
+        server.start()
+        try:
+            writer = framing.FrameWriter(a, **writer_options)
+            send(writer)
+            result["ack"] = writer.close()
+        finally:
+            a.close()
+            server.join(10)
+            b.close()
+        return writer, result
+
+    def _send_all(self, writer):
+        for name in self.contents:
+            writer.send(os.path.join(self.src, *name.split("/")), name)
+
+    def test_batched_session_round_trip(self):
+        writer, result = self._session(self._send_all, batch_files=16)
+        self.assertNotIn("error", result)
+        self.assertEqual(writer.capabilities, framing.SUPPORTED_CAPABILITIES)
+        self.assertEqual(result["ack"], (len(self.contents), sum(map(len, self.contents.values()))))
+        for name, data in self.contents.items():
+            with open(os.path.join(self.dst, *name.split("/")), "rb") as f:
+                self.assertEqual(f.read(), data, msg=name)
+
+    def test_without_checksums_or_batches(self):
+        writer, result = self._session(self._send_all, capabilities=0)
+        self.assertEqual(writer.capabilities, 0)
+        self.assertEqual(result["ack"][0], len(self.contents))
+
+    def test_crc_mismatch_drops_the_file(self):
+        name = "small/001.txt"
+
+        def send(writer):
+            writer.send(os.path.join(self.src, *name.split("/")), name)
+            encoded, data, crc = writer._batch[0]
+            writer._batch[0] = (encoded, data, crc ^ 1)
+            writer.flush()
+
+        a, b = socket.socketpair()
+        errors = []
+
+        def serve():
+            try:
+                receive_files(b, self.dst, bytearray(4096))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                b.close()
+
+        server = threading.Thread(target=serve)
+        server.start()
+        try:
+            writer = framing.FrameWriter(a)
+            send(writer)
+            with self.assertRaises((EOFError, OSError)):
+                writer.close()
+        finally:
+            a.close()
+            server.join(10)
+        self.assertIsInstance(errors[0], framing.ProtocolError)
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "small", "001.txt")))
+
+    def test_batch_sizes_must_match_body_len(self):
+        a, b = socket.socketpair()
+        errors = []
+
+        def serve():
+            try:
+                receive_files(b, self.dst, bytearray(4096))
+            except Exception as e:
+                errors.append(e)
+            finally:
+                b.close()
+
+        server = threading.Thread(target=serve)
+        server.start()
+        try:
+            self.assertEqual(_bad_batch_session(a), b"")
+        finally:
+            a.close()
+            server.join(10)
+        self.assertIsInstance(errors[0], framing.ProtocolError)
+        self.assertIn("add up to 8", str(errors[0]))
+        self.assertFalse(os.path.exists(os.path.join(self.dst, "one.txt")))
+
+    def test_send_buffers_handles_partial_sends(self):
+        class Sock:
+            def __init__(self):
+                self.out = bytearray()
+
+            def sendmsg(self, buffers):
+                first = bytes(buffers[0])[:3]
+                self.out += first
+                return len(first)
+
+        sock = Sock()
+        framing.send_buffers(sock, [b"hello", b"", b"world", b"!"])
+        self.assertEqual(bytes(sock.out), b"helloworld!")
+
+
+class AsyncFileServerTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, "src")
+        self.dst = os.path.join(self._tmp.name, "dst")
+        os.makedirs(self.src)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+        self._tmp.cleanup()
+
+    def _upload(self, address, names):
+        with socket.create_connection(address) as sock:
+            for name in names:
+                client.send_file(sock, os.path.join(self.src, name))
+
+    async def _settle(self, server, files, errors=0):
+        # The server may still be writing the last chunks.
+        for _ in range(500):
+            stats = server.stats
+            if (stats["files"], stats["errors"], stats["active"]) == (files, errors, 0):
+                return
+            await asyncio.sleep(0.01)
+
+    async def _run(self, server, batches):
+        address = await server.start()
+        try:
+            await asyncio.gather(*(
+                self.loop.run_in_executor(None, self._upload, address, names)
+                for names in batches
+            ))
+            await self._settle(server, sum(map(len, batches)))
+        finally:
+            await server.close()
+
+    def test_concurrent_uploads_under_small_budget(self):
+        payloads = {}
+        batches = []
+        for client_id in range(6):
+            names = []
+            for i in range(3):
+                name = f"c{client_id}_{i}.bin"
+                payloads[name] = os.urandom(50_000 * (i + 1))
+                with open(os.path.join(self.src, name), "wb") as f:
+                    f.write(payloads[name])
+                names.append(name)
+            batches.append(names)
+        server = AsyncFileServer(
+            self.dst, host="127.0.0.1", port=0,
+            max_in_flight=64 * 1024, chunk_size=16 * 1024, verbose=False,
+        )
+        self.loop.run_until_complete(self._run(server, batches))
+        for name, data in payloads.items():
+            with open(os.path.join(self.dst, name), "rb") as f:
+                self.assertEqual(f.read(), data, msg=name)
+        self.assertEqual(server.stats["connections"], 6)
+        self.assertEqual(server.stats["files"], 18)
+        self.assertEqual(server.stats["bytes"], sum(map(len, payloads.values())))
+        self.assertEqual(server.stats["errors"], 0)
+        self.assertEqual(server.budget.available, server.budget.capacity)
+
+    def test_v2_sessions(self):
+        contents = {f"d/{i}.bin": os.urandom(i * 101) for i in range(30)}
+        contents["large.bin"] = os.urandom(framing.SMALL_FILE * 2)
+        _write_tree(self.src, contents)
+        server = AsyncFileServer(
+            self.dst, host="127.0.0.1", port=0,
+            max_in_flight=64 * 1024, chunk_size=16 * 1024, verbose=False,
+        )
+
+        def upload(address, capabilities):
+            with socket.create_connection(address) as sock:
+                writer = framing.FrameWriter(sock, capabilities, batch_files=8)
+                for name in contents:
+                    writer.send(os.path.join(self.src, *name.split("/")), name)
+                return writer.close()
+
+        async def run():
+            address = await server.start()
+            try:
+                acks = await asyncio.gather(*(
+                    self.loop.run_in_executor(None, upload, address, capabilities)
+                    for capabilities in (framing.SUPPORTED_CAPABILITIES, framing.CAP_BATCH, 0)
+                ))
+                await self._settle(server, 3 * len(contents))
+                return acks
+            finally:
+                await server.close()
+
+        acks = self.loop.run_until_complete(run())
+        total = sum(map(len, contents.values()))
+        self.assertEqual(acks, [(len(contents), total)] * 3)
+        self.assertEqual(server.stats["errors"], 0)
+        for name, data in contents.items():
+            with open(os.path.join(self.dst, *name.split("/")), "rb") as f:
+                self.assertEqual(f.read(), data, msg=name)
+
+    def test_v2_batch_sizes_must_match_body_len(self):
+        server = AsyncFileServer(self.dst, host="127.0.0.1", port=0, verbose=False)
+
+        def bad_session(address):
+            with socket.create_connection(address) as sock:
+                return _bad_batch_session(sock)
+
+        async def run():
+            address = await server.start()
+            try:
+                reply = await self.loop.run_in_executor(None, bad_session, address)
+                await self._settle(server, 0, 1)
+                return reply
+            finally:
+                await server.close()
+
+        self.assertEqual(self.loop.run_until_complete(run()), b"")
+        self.assertEqual((server.stats["files"], server.stats["errors"]), (0, 1))
+
+    def test_names_stay_inside_save_path(self):
+        server = AsyncFileServer(self.dst, host="127.0.0.1", port=0, verbose=False)
+
+        async def send(host, port, name):
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(len(name).to_bytes(4, "big") + name + (3).to_bytes(8, "big") + b"abc")
+            await writer.drain()
+            writer.close()
+            await writer.wait_closed()
+
+        async def run():
+            host, port = await server.start()
+            try:
+                await send(host, port, b"../escape.txt")
+                await send(host, port, b"sub/dir/kept.txt")
+                await self._settle(server, 1, 1)
+            finally:
+                await server.close()
+
+        self.loop.run_until_complete(run())
+        self.assertEqual((server.stats["files"], server.stats["errors"]), (1, 1))
+        self.assertTrue(os.path.exists(os.path.join(self.dst, "sub", "dir", "kept.txt")))
+        self.assertFalse(os.path.exists(os.path.join(self._tmp.name, "escape.txt")))
+
+
+class ClientdTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, "src")
+        self.dst = os.path.join(self._tmp.name, "dst")
+        self.payloads = {}
+        for i in range(40):
+            name = f"f{i:02d}.txt" if i % 2 else f"sub/deeper/f{i:02d}.txt"
+            self.payloads[name] = os.urandom(1000 + i * 997)
+            path = os.path.join(self.src, *name.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as f:
+                f.write(self.payloads[name])
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def test_iter_upload_files(self):
+        top = [name for _path, name in client.iter_upload_files(self.src)]
+        self.assertEqual(top, sorted(n for n in self.payloads if "/" not in n))
+        everything = sorted(name for _path, name in client.iter_upload_files(self.src, recursive=True))
+        self.assertEqual(everything, sorted(self.payloads))
+
+    def test_parallel_recursive_upload(self):
+        for protocol in (1, 2):
+            with self.subTest(protocol=protocol):
+                self._parallel_recursive_upload(protocol)
+
+    def _parallel_recursive_upload(self, protocol):
+        loop = asyncio.new_event_loop()
+        server = AsyncFileServer(self.dst, host="127.0.0.1", port=0, verbose=False)
+
+        async def run():
+            host, port = await server.start()
+            try:
+                stats = await loop.run_in_executor(
+                    None,
+                    lambda: client.clientd(
+                        host, port, self.src, prg=False, connections=3,
+                        recursive=True, queue_size=4, protocol=protocol,
+                    ),
+                )
+                for _ in range(500):
+                    if server.stats["files"] == len(self.payloads) and not server.stats["active"]:
+                        break
+                    await asyncio.sleep(0.01)
+                return stats
+            finally:
+                await server.close()
+
+        try:
+            stats = loop.run_until_complete(run())
+        finally:
+            loop.close()
+        self.assertEqual(stats["files"], len(self.payloads))
+        self.assertEqual(stats["bytes"], sum(map(len, self.payloads.values())))
+        self.assertEqual(stats["errors"], 0)
+        self.assertEqual(server.stats["connections"], 3)
+        for name, data in self.payloads.items():
+            with open(os.path.join(self.dst, *name.split("/")), "rb") as f:
+                self.assertEqual(f.read(), data, msg=name)
+
+
+class UploadV2FailureTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.src = os.path.join(self._tmp.name, "src")
+        self.dst = os.path.join(self._tmp.name, "dst")
+        self.contents = {f"f{i:02d}.txt": os.urandom(100 + i) for i in range(12)}
+        _write_tree(self.src, self.contents)
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(16)
+        self.listener.settimeout(0.1)
+        self.stop = threading.Event()
+        self.thread = None
+        self._timeout = framing.HANDSHAKE_TIMEOUT
+        framing.HANDSHAKE_TIMEOUT = 0.2
+
+    def tearDown(self):
+        framing.HANDSHAKE_TIMEOUT = self._timeout
+        self.stop.set()
+        if self.thread is not None:
+            self.thread.join(10)
+        self.listener.close()
+        self._tmp.cleanup()
+
+    def _serve(self, handle):
+        def loop():
+            while not self.stop.is_set():
+                try:
+                    conn, _ = self.listener.accept()
+                except socket.timeout:
+                    continue
+                handle(conn)
+
+        self.thread = threading.Thread(target=loop, daemon=True)
+        self.thread.start()
+
+    def _jobs(self, delay=0.0):
+        for name in self.contents:
+            yield os.path.join(self.src, name), name
+            time.sleep(delay)
+
+    def test_unanswered_handshake_counts_every_file(self):
+        held = []
+        self._serve(held.append)  # accepts, never answers HELLO
+        host, port = self.listener.getsockname()
+        try:
+            stats = client.upload_files(
+                host, self._jobs(), server_port=port, connections=3, protocol=2
+            )
+        finally:
+            for conn in held:
+                conn.close()
+        self.assertEqual(stats["files"], 0)
+        self.assertEqual(stats["errors"], len(self.contents))
+
+    def test_serial_server_with_several_connections(self):
+        def handle(conn):
+            with conn:
+                receive_files(conn, self.dst, bytearray(4096))
+
+        self._serve(handle)
+        host, port = self.listener.getsockname()
+        # The jobs trickle in for longer than the handshake timeout, so
+        # the queued connections wait while the first session runs.
+        stats = client.upload_files(
+            host, self._jobs(delay=0.05), server_port=port, connections=3, protocol=2
+        )
+        self.assertEqual((stats["files"], stats["errors"]), (len(self.contents), 0))
+        for name, data in self.contents.items():
+            with open(os.path.join(self.dst, name), "rb") as f:
+                self.assertEqual(f.read(), data, msg=name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,145 @@
+"""Tests for specs.disk.watch.IndexWatcher."""
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SRC = os.path.join(HERE, "..", "src")
+if SRC not in sys.path:
+    sys.path.insert(0, SRC)
+
+from specs.disk import FileIndexer  # noqa: E402
+from specs.disk.filters import PathFilter  # noqa: E402
+from specs.disk.watch import IN_Q_OVERFLOW, IndexWatcher, inotify_available  # noqa: E402
+
+
+def _write(path: Path, data: bytes) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+@unittest.skipUnless(inotify_available(), "inotify is Linux-only")
+class _NoPathScan(dict):
+    """``files`` mapping that fails if anything iterates over its paths."""
+
+    scans_allowed = False
+
+    def __iter__(self):
+        if not self.scans_allowed:
+            raise AssertionError("iterated over every indexed path")
+        return super().__iter__()
+
+    def keys(self):
+        return iter(self)
+
+
+class IndexWatcherTests(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        tmp = Path(self._tmp.name)
+        self.root = tmp / "data"
+        _write(self.root / "keep.txt", b"keep")
+        _write(self.root / "old.txt", b"old")
+        _write(self.root / "sub" / "deep" / "a.py", b"a" * 10)
+        self.db = str(tmp / "index.db")
+        self.watcher = IndexWatcher(str(self.root), self.db, delay=0.05, stats_interval=0)
+        ok, err = self.watcher.start()
+        self.assertTrue(ok, msg=err)
+
+    def tearDown(self):
+        self.watcher.close()
+        self._tmp.cleanup()
+
+    def _settle(self):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            if not self.watcher.poll(timeout=0.2):
+                return
+
+    def _assert_matches_fresh_walk(self):
+        fresh = FileIndexer()
+        fresh.index_directory(str(self.root))
+        watched = self.watcher.indexer
+        self.assertEqual(sorted(watched.files), sorted(fresh.files))
+        for path, info in fresh.files.items():
+            self.assertEqual(watched.files[path]["size"], info["size"], msg=path)
+        self.assertEqual(sorted(watched.dirs), sorted(fresh.dirs))
+        self.assertEqual(watched.get_statistics(), fresh.get_statistics())
+        self.assertEqual(watched.dir_totals, fresh.dir_totals)
+        conn = sqlite3.connect(self.db)
+        try:
+            rows = dict(conn.execute("SELECT filepath, size FROM files"))
+        finally:
+            conn.close()
+        self.assertEqual(rows, {p: i["size"] for p, i in fresh.files.items()})
+
+    def test_file_and_directory_events(self):
+        _write(self.root / "new.bin", b"n" * 100)
+        _write(self.root / "keep.txt", b"keep, but longer")
+        os.remove(self.root / "old.txt")
+        os.rename(self.root / "sub" / "deep", self.root / "moved")
+        _write(self.root / "fresh" / "x" / "y.txt", b"y")
+        self._settle()
+        self.assertGreater(self.watcher.changes["upserted"], 0)
+        self._assert_matches_fresh_walk()
+
+        shutil.rmtree(self.root / "fresh")
+        _write(self.root / "moved" / "b.py", b"bb")
+        self._settle()
+        self._assert_matches_fresh_walk()
+
+    def test_subtree_events_do_not_scan_every_path(self):
+        for i in range(50):
+            _write(self.root / "bulk" / f"f{i}.txt", b"x")
+        self._settle()
+        files = _NoPathScan(self.watcher.indexer.files)
+        self.watcher.indexer.files = files
+        os.rename(self.root / "sub", self.root / "sub2")
+        shutil.rmtree(self.root / "bulk")
+        self._settle()
+        self.watcher._handle(-1, IN_Q_OVERFLOW, 0, "")
+        _write(self.root / "sub2" / "deep" / "z.txt", b"z")
+        self.watcher.apply_pending()
+        self._settle()
+        files.scans_allowed = True
+        self._assert_matches_fresh_walk()
+
+    def test_path_filter_applies_to_events(self):
+        self.watcher.close()
+        rules = PathFilter(exclude=["node_modules", "*.tmp"])
+        self.watcher = IndexWatcher(
+            str(self.root), self.db, indexer=FileIndexer(path_filter=rules),
+            delay=0.05, stats_interval=0,
+        )
+        ok, err = self.watcher.start()
+        self.assertTrue(ok, msg=err)
+        _write(self.root / "node_modules" / "pkg" / "index.js", b"js")
+        _write(self.root / "scratch.tmp", b"tmp")
+        _write(self.root / "kept.md", b"md")
+        self._settle()
+        files = self.watcher.indexer.files
+        self.assertIn(self.watcher.root + "/kept.md", files)
+        self.assertFalse(any("node_modules" in p or p.endswith(".tmp") for p in files))
+        self.assertFalse(any("node_modules" in d for d in self.watcher.indexer.dirs))
+
+    def test_overflow_relists_changed_directories(self):
+        _write(self.root / "sub" / "added.txt", b"added")
+        os.remove(self.root / "old.txt")
+        _write(self.root / "sub" / "deep" / "newdir" / "c.txt", b"c")
+        # Drop the real events and pretend the kernel queue overflowed.
+        self.watcher._inotify.read_events()
+        self.watcher._handle(-1, IN_Q_OVERFLOW, 0, "")
+        self.watcher.apply_pending()
+        self._settle()
+        self.assertEqual(self.watcher.changes["overflows"], 1)
+        self._assert_matches_fresh_walk()
+
+
+if __name__ == "__main__":
+    unittest.main()